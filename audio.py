@@ -1,33 +1,71 @@
 import sounddevice as sd
-import numpy as np
+from time import perf_counter
+
+try:
+    from audio_features import AudioRing, AudioAnalyzer
+except ImportError:
+    from src.audio_features import AudioRing, AudioAnalyzer
 
 class AudioProcessor:
-    def __init__(self, rate=44100, chunk=1024):
+    def __init__(self, rate=44100, chunk=1024, buffer_seconds=1.0, latency_offset=0.0):
         self.rate = rate
         self.chunk = chunk
-        self.volume = 0.0
         self.stream = None
+        # Extra audio delay (s) not reported by the device; added to frame times on lookup
+        self.latency_offset = latency_offset
+        # Written by the PortAudio thread, analyzed on the render thread
+        self.ring = AudioRing(int(rate * buffer_seconds))
+        self.analyzer = AudioAnalyzer(rate)
 
     def callback(self, indata, frames, time, status):
         """
         Audio callback function.
+        Runs on the PortAudio thread: only copies the block into the
+        preallocated ring, no analysis and no allocation.
+        The block is stamped on the perf_counter clock (same as camera
+        frames) using PortAudio's ADC time when the host API provides it.
         """
-        # Calculate RMS amplitude
-        rms = np.sqrt(np.mean(indata**2))
-        # Normalize roughly to 0-1 range (with some gain)
-        self.volume = np.clip(rms * 5, 0, 1)
+        now = perf_counter()
+        if time.inputBufferAdcTime > 0:
+            stamp = now - (time.currentTime - time.inputBufferAdcTime)
+        else:
+            # No ADC time: assume the block just finished recording
+            stamp = now - frames / self.rate
+        self.ring.write(indata[:, 0], stamp)
 
     def start(self):
         """Starts the audio stream."""
         try:
-            self.stream = sd.InputStream(callback=self.callback, channels=1, samplerate=self.rate, blocksize=self.chunk)
+            self.stream = sd.InputStream(callback=self.callback, channels=1, samplerate=self.rate,
+                                         blocksize=self.chunk, dtype="float32")
             self.stream.start()
         except Exception as e:
             print(f"Warning: Could not start audio stream: {e}")
 
-    def get_volume(self):
-        """Returns the current volume level (0.0 to 1.0)."""
-        return self.volume
+    def update(self):
+        """Analyzes audio captured since the last call (cheap if nothing new)."""
+        self.analyzer.update(self.ring)
+
+    @property
+    def volume(self):
+        return self.analyzer.volume
+
+    def get_volume(self, t=None):
+        """
+        Returns the volume level (0.0 to 1.0), the latest one or, given a
+        perf_counter capture time t, the one aligned to it.
+        """
+        self.update()
+        if t is None:
+            return self.analyzer.volume
+        return self.analyzer.at(t + self.latency_offset)[0]
+
+    def get_visemes(self, t=None):
+        """Returns the smoothed viseme weights (see audio_features.VISEMES), optionally aligned to time t."""
+        self.update()
+        if t is None:
+            return self.analyzer.visemes
+        return self.analyzer.at(t + self.latency_offset)[1]
 
     def stop(self):
         """Stops the audio stream."""
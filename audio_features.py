@@ -0,0 +1,204 @@
+import numpy as np
+
+# Mouth shapes driven by audio, in the order of the weight vectors
+VISEMES = ("rest", "open", "wide", "round")
+VISEME_INDEX = {name: i for i, name in enumerate(VISEMES)}
+
+# Frequency bands (Hz) whose share of the energy picks the mouth shape:
+# low (rounded vowels: o, u), mid (open vowels: a), high (spread vowels and sibilants: e, i, s)
+BANDS = ((80.0, 500.0), (500.0, 2000.0), (2000.0, 8000.0))
+BAND_VISEMES = (VISEME_INDEX["round"], VISEME_INDEX["open"], VISEME_INDEX["wide"])
+
+
+def visemes_from_volume(volume, out=None):
+    """Viseme weights from a bare loudness value (e.g. replayed recordings)."""
+    out = np.zeros(len(VISEMES), dtype=np.float32) if out is None else out
+    out[:] = 0.0
+    out[VISEME_INDEX["open"]] = volume
+    out[VISEME_INDEX["rest"]] = 1.0 - volume
+    return out
+
+
+class AudioRing:
+    """
+    Preallocated single-producer / single-consumer sample ring.
+    The audio callback only copies into the existing buffer and advances
+    a sample counter, so it never allocates. The consumer reads by
+    absolute sample position and can tell when it has been lapped.
+    Blocks can carry a capture time, kept in a small ring of
+    (sample position, time) stamps.
+    """
+    def __init__(self, capacity, max_stamps=64):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=np.float32)
+        # Total samples written; only the producer assigns it
+        self.written = 0
+        self.stamp_pos = np.zeros(max_stamps, dtype=np.int64)
+        self.stamp_time = np.zeros(max_stamps, dtype=np.float64)
+        self.stamp_count = 0
+
+    def write(self, samples, timestamp=None):
+        """Appends a block; `timestamp` is the capture time of its first sample."""
+        if timestamp is not None:
+            slot = self.stamp_count % len(self.stamp_pos)
+            self.stamp_pos[slot] = self.written
+            self.stamp_time[slot] = timestamp
+            self.stamp_count += 1
+        n = len(samples)
+        if n > self.capacity:
+            samples = samples[-self.capacity:]
+            self.written += n - self.capacity
+            n = self.capacity
+        start = self.written % self.capacity
+        first = min(n, self.capacity - start)
+        self.buffer[start:start + first] = samples[:first]
+        if first < n:
+            self.buffer[:n - first] = samples[first:]
+        # Publish only after the samples are in place
+        self.written += n
+
+    def read(self, start, out):
+        """
+        Copies samples [start, start + len(out)) into `out`.
+        Returns False if they were already overwritten.
+        """
+        n = len(out)
+        if self.written - start > self.capacity or start + n > self.written:
+            return False
+        first_pos = start % self.capacity
+        first = min(n, self.capacity - first_pos)
+        out[:first] = self.buffer[first_pos:first_pos + first]
+        if first < n:
+            out[first:] = self.buffer[:n - first]
+        # The producer may have lapped us while we copied
+        return self.written - start <= self.capacity
+
+    def times(self, positions, rate):
+        """
+        Capture times of absolute sample positions, extrapolated from the
+        newest stamped block at or before each one (NaN before any stamp).
+        """
+        count = min(self.stamp_count, len(self.stamp_pos))
+        if count == 0:
+            return np.full(len(positions), np.nan)
+        # Oldest to newest; the producer may add one while we copy, which is harmless
+        order = (np.arange(self.stamp_count - count, self.stamp_count)) % len(self.stamp_pos)
+        pos, stamp = self.stamp_pos[order], self.stamp_time[order]
+        idx = np.clip(np.searchsorted(pos, positions, side="right") - 1, 0, count - 1)
+        return stamp[idx] + (positions - pos[idx]) / rate
+
+
+class AudioAnalyzer:
+    """
+    Short-time spectral analysis of an AudioRing.
+    Every hop of new samples is windowed and transformed in one batched
+    rfft; band energies and loudness become target viseme weights, which
+    are smoothed with separate attack and release rates.
+    Each hop's features are kept in a short history, stamped with the
+    capture time of the hop's center, for lookup by video frame time.
+    """
+    def __init__(self, rate, window=1024, hop=512, max_hops=16, attack=0.5, release=0.15,
+                 floor_db=-50.0, range_db=35.0, history=256):
+        self.rate = rate
+        self.window = window
+        self.hop = hop
+        self.max_hops = max_hops
+        self.attack = attack
+        self.release = release
+        self.floor_db = floor_db
+        self.range_db = range_db
+
+        self._hann = np.hanning(window).astype(np.float32)
+        freqs = np.fft.rfftfreq(window, 1.0 / rate)
+        self._bands = np.stack([(freqs >= lo) & (freqs < hi) for lo, hi in BANDS]).astype(np.float32).T
+        self._scratch = np.zeros(window + (max_hops - 1) * hop, dtype=np.float32)
+        self._next_end = None  # Sample position where the next hop ends
+
+        self.volume = 0.0
+        self.band_energy = np.zeros(len(BANDS), dtype=np.float32)
+        self.visemes = visemes_from_volume(0.0)
+
+        # Per-hop history, oldest first once full (ring indexed by _hist_count)
+        self._hist_time = np.full(history, np.nan)
+        self._hist_volume = np.zeros(history, dtype=np.float32)
+        self._hist_visemes = np.zeros((history, len(VISEMES)), dtype=np.float32)
+        self._hist_count = 0
+        self._aligned = visemes_from_volume(0.0)
+
+    def update(self, ring):
+        """Analyzes every complete hop written since the last call. Returns the number of hops."""
+        written = ring.written
+        if self._next_end is None:
+            self._next_end = max(written, self.window)
+        hops = (written - self._next_end) // self.hop + 1
+        if hops <= 0:
+            return 0
+        if hops > self.max_hops:
+            # Fell behind (e.g. a stall): only the newest hops matter
+            self._next_end += (hops - self.max_hops) * self.hop
+            hops = self.max_hops
+
+        span = self.window + (hops - 1) * self.hop
+        samples = self._scratch[:span]
+        first_start = self._next_end - self.window
+        if not ring.read(first_start, samples):
+            self._next_end = written
+            return 0
+        self._next_end += hops * self.hop
+        # Each hop is stamped at the center of its window
+        centers = first_start + self.window // 2 + np.arange(hops) * self.hop
+        times = ring.times(centers, self.rate)
+
+        # (hops, window) view of the span, no copy
+        frames = np.lib.stride_tricks.sliding_window_view(samples, self.window)[::self.hop]
+        power = np.abs(np.fft.rfft(frames * self._hann, axis=1)) ** 2
+        bands = power @ self._bands
+        rms = np.sqrt(np.mean(frames ** 2, axis=1))
+
+        # Loudness in dB mapped to 0-1 speech activity
+        db = 20.0 * np.log10(rms + 1e-9)
+        activity = np.clip((db - self.floor_db) / self.range_db, 0.0, 1.0)
+        shares = bands / np.maximum(bands.sum(axis=1, keepdims=True), 1e-12)
+        targets = np.zeros((hops, len(VISEMES)), dtype=np.float32)
+        targets[:, BAND_VISEMES] = shares * activity[:, None]
+        targets[:, VISEME_INDEX["rest"]] = 1.0 - activity
+
+        # Same scale as the original per-block RMS volume
+        volumes = np.clip(rms * 5, 0, 1)
+        size = len(self._hist_time)
+        for i, target in enumerate(targets):
+            rate = np.where(target > self.visemes, self.attack, self.release)
+            self.visemes += (target - self.visemes) * rate
+            slot = self._hist_count % size
+            self._hist_time[slot] = times[i]
+            self._hist_volume[slot] = volumes[i]
+            self._hist_visemes[slot] = self.visemes
+            self._hist_count += 1
+        self.band_energy[:] = bands[-1]
+        self.volume = float(volumes[-1])
+        return hops
+
+    def at(self, t):
+        """
+        (volume, visemes) as they were at capture time t, interpolated
+        between hops and clamped to the history. The visemes array is
+        reused by the next call.
+        """
+        count = min(self._hist_count, len(self._hist_time))
+        if count == 0:
+            return self.volume, self.visemes
+        order = np.arange(self._hist_count - count, self._hist_count) % len(self._hist_time)
+        times = self._hist_time[order]
+        if np.isnan(times[-1]):
+            # Unstamped input: only the latest state is known
+            return self.volume, self.visemes
+        i = int(np.searchsorted(times, t))
+        if i <= 0 or i >= count:
+            slot = order[0 if i <= 0 else -1]
+            self._aligned[:] = self._hist_visemes[slot]
+            return float(self._hist_volume[slot]), self._aligned
+        a, b = order[i - 1], order[i]
+        w = (t - times[i - 1]) / max(times[i] - times[i - 1], 1e-9)
+        self._aligned[:] = self._hist_visemes[a] + (self._hist_visemes[b] - self._hist_visemes[a]) * w
+        volume = self._hist_volume[a] + (self._hist_volume[b] - self._hist_volume[a]) * w
+        return float(volume), self._aligned
@@ -1,217 +1,251 @@
 import pygame
 import numpy as np
+import math
+import time
 try:
-    from utils import EMASmoother
+    from utils import BatchSmoother
+    from landmarks import RIG
+    from render_backend import RENDERERS, px
+    from audio_features import VISEME_INDEX
 except ImportError:
-    from src.utils import EMASmoother
+    from src.utils import BatchSmoother
+    from src.landmarks import RIG
+    from src.render_backend import RENDERERS, px
+    from src.audio_features import VISEME_INDEX
+
+# Smoothed point array layout (see Rig): pose joints + derived joints, both hands, face outlines and centers
+NUM_SLOTS = RIG.num_slots
+
+# Named colour schemes (rig.json): body core, glow, joints, shoes
+COLOR_SCHEMES = RIG.color_schemes
+
+_MOUTH_ANGLES = np.linspace(0.0, 2.0 * np.pi, 16, endpoint=False)
 
 class Avatar:
-    def __init__(self, screen_width, screen_height):
-        self.width = screen_width
-        self.height = screen_height
-        self.smoother = EMASmoother(alpha=0.6) # Balanced smoothing
+    def __init__(self, screen_width, screen_height, smoothing="one_euro", backend="primitives", rig=None):
+        # Region (x, y, w, h) of the display the normalized [0, 1] coordinates map to
+        self.viewport = (0, 0, screen_width, screen_height)
+        # Size of the surface drawn on relative to the display (see set_render_scale)
+        self.render_scale = 1.0
+        self._place()
+        # Bones, features and styles; the tracked points must match the LandmarkFrame layout
+        self.rig = RIG if rig is None else rig
+        if (self.rig.pose_index, self.rig.face_indices) != (RIG.pose_index, RIG.face_indices):
+            raise ValueError("The avatar rig must track the same points as the landmark layout (rig.json)")
+        # "primitives" (one draw call per shape) or "sprites" (batched, additive glow). Sprites
+        # make far fewer draw calls and are faster once their caches are warm (benchmark.py --suite avatar)
+        self.renderer = RENDERERS[backend]()
+        self.renderer.scale = self.render_scale
+        # All tracked points are smoothed together in one vectorized update
+        self.smoother = BatchSmoother(self.rig.num_slots, dims=2, mode=smoothing)
+        self._raw = np.zeros((self.rig.num_slots, 2), dtype=np.float32)
+        self._present = np.zeros(self.rig.num_slots, dtype=bool)
+        self._last_seq = None
+        # Optional FrameProfiler for the "smooth" and "draw" stages
+        self.profiler = None
         
-        # Style configuration
-        self.body_color = (255, 255, 255) # White core
-        self.glow_color = (0, 255, 255)   # Cyan glow
-        self.joint_color = (0, 200, 255)
-        self.shoe_color = (255, 50, 50)   # Red shoes for style
+        # Style configuration (White core, Cyan glow, Red shoes for style)
+        self.set_color_scheme(next(iter(self.rig.color_schemes)))
+        self._mouth_shapes = np.zeros((len(VISEME_INDEX), 2), dtype=np.float32)
+        for name, size in self.rig.mouth["visemes"].items():
+            self._mouth_shapes[VISEME_INDEX[name]] = size
         
-        self.stroke_width = 10  # Nice thick stickman
+        # Padding around tracked points that covers strokes, joints and shoes
+        self.dirty_margin = 24
+        self.dirty_rect = None
         
-    def _to_screen(self, norm_pt):
-        """Converts normalized (x,y,z) to screen (x,y)."""
-        if norm_pt is None:
-            return None
-        return (int(norm_pt[0] * self.width), int(norm_pt[1] * self.height))
-
-    def draw_rounded_line(self, surface, start, end, color, width):
-        """Draws a line with rounded caps."""
-        pygame.draw.line(surface, color, start, end, width)
-        pygame.draw.circle(surface, color, start, width // 2)
-        pygame.draw.circle(surface, color, end, width // 2)
-
-    def draw_neon_stick_limb(self, surface, start, end, width):
-        """Draws a stickman limb with a glow."""
-        # Outer Glow
-        self.draw_rounded_line(surface, start, end, (0, 100, 100), width + 6)
-        # Core
-        self.draw_rounded_line(surface, start, end, self.body_color, width)
-
-    def update_and_draw(self, surface, data, volume):
-        if not data or not data.get("pose"):
+    def set_viewport(self, rect):
+        """Places the avatar in a sub-region (x, y, w, h) of the screen."""
+        self.viewport = tuple(rect)
+        self._place()
+
+    def set_render_scale(self, scale):
+        """
+        Draws onto a surface `scale` times the display size (an offscreen
+        scene, see SceneCompositor). Positions, strokes and radii scale
+        with it; dirty_rect stays in display pixels.
+        """
+        self.render_scale = scale
+        self.renderer.scale = scale
+        self._place()
+
+    def _place(self):
+        # Viewport in render pixels: top-left and size the normalized points map to
+        s = self.render_scale
+        x, y, w, h = self.viewport
+        self.x, self.y, self.width, self.height = x * s, y * s, w * s, h * s
+
+    def set_color_scheme(self, name):
+        self.body_color, self.glow_color, self.joint_color, self.shoe_color = self.rig.color_schemes[name]
+
+    def _color(self, value):
+        """A rig colour: a role ("body", "glow", "joint", "shoe") or an RGB triple."""
+        return getattr(self, f"{value}_color") if isinstance(value, str) else tuple(value)
+
+    def _smooth(self, data):
+        """
+        Gathers every tracked point of a LandmarkFrame into one array and
+        smooths it. Only runs when a new frame arrives; repeated renders of
+        the same frame reuse the previous result.
+        """
+        if data.seq == self._last_seq:
+            return self.smoother.value
+        self._last_seq = data.seq
+
+        raw, present = self._raw, self._present
+        self.rig.gather(data, raw, present)
+
+        timestamp = data.timestamp if data.timestamp else time.perf_counter()
+        return self.smoother.update(raw, timestamp, present)
+
+    def _viseme_mouth(self, head_center, head_radius, visemes):
+        """Screen polygon of an audio-driven mouth inside the head circle."""
+        # Attack/release smoothing lets the weights drift off a sum of 1
+        width, height = (visemes @ self._mouth_shapes) / max(float(visemes.sum()), 1e-6) * head_radius
+        cx, cy = head_center[0], head_center[1] + 0.45 * head_radius
+        xs = cx + 0.5 * width * np.cos(_MOUTH_ANGLES)
+        ys = cy + 0.5 * max(height, 1.0) * np.sin(_MOUTH_ANGLES)
+        return list(zip(xs.astype(int).tolist(), ys.astype(int).tolist()))
+
+    def update_and_draw(self, surface, data, volume, visemes=None):
+        """
+        Smooths and draws one LandmarkFrame.
+        `visemes` (weights from audio_features) shape the mouth when the
+        face itself is not tracked.
+        """
+        self.dirty_rect = None
+        if data is None or not data.has_pose:
             return
 
-        pose = data["pose"]
-        face = data.get("face")
-        
-        smoothed_pose = {}
-        for key, val in pose.items():
-            s_val = self.smoother.update(f"pose_{key}", (val[0], val[1]))
-            smoothed_pose[key] = s_val
+        face = data.has_face
+        t0 = time.perf_counter()
+        smoothed = self._smooth(data)
+        if self.profiler:
+            t1 = time.perf_counter()
+            self.profiler.record("smooth", t0, t1)
+            t0 = t1
+        rig = self.rig
+        s = self.render_scale
 
-        # --- DRAW BODY (Stickman Style) ---
-        structure = [
-            ("left_shoulder", "right_shoulder"),
-            ("left_shoulder", "left_hip"),
-            ("right_shoulder", "right_hip"),
-            ("left_shoulder", "left_elbow"),
-            ("left_elbow", "left_wrist"),
-            ("right_shoulder", "right_elbow"),
-            ("right_elbow", "right_wrist"),
-            ("left_hip", "right_hip"),
-            ("left_hip", "left_knee"),
-            ("left_knee", "left_ankle"),
-            ("right_hip", "right_knee"),
-            ("right_knee", "right_ankle"),
-            # Neck
-            ("neck", "left_shoulder"),
-            ("neck", "right_shoulder"),
-        ]
-        
-        # If neck is missing in smoothed (rare), calculate it
-        if "neck" not in smoothed_pose and "left_shoulder" in smoothed_pose and "right_shoulder" in smoothed_pose:
-             smoothed_pose["neck"] = (np.array(smoothed_pose["left_shoulder"]) + np.array(smoothed_pose["right_shoulder"])) / 2
+        # Screen region touched this frame (for dirty-rectangle presentation)
+        screen = (smoothed * (self.width, self.height) + (self.x, self.y)).astype(int)
+        screen_pts = screen.tolist()
+        pts = screen[self._present]
+        lo = pts.min(axis=0)
+        hi = pts.max(axis=0)
+        self.dirty_rect = pygame.Rect(int(lo[0]), int(lo[1]), int(hi[0] - lo[0]) + 1, int(hi[1] - lo[1]) + 1)
+        margin = px(self.dirty_margin, s)
+        self.dirty_rect.inflate_ip(2 * margin, 2 * margin)
+
+        # Every bone point in one gather; chains are slices of it
+        bone_pts = screen[rig.bone_slots].tolist()
+        visible = rig.visible_bones(self._present)
 
-        # Draw Limbs
-        for p1_name, p2_name in structure:
-            if p1_name in smoothed_pose and p2_name in smoothed_pose:
-                start = self._to_screen(smoothed_pose[p1_name])
-                end = self._to_screen(smoothed_pose[p2_name])
-                self.draw_neon_stick_limb(surface, start, end, self.stroke_width)
+        # --- DRAW BODY (Stickman Style) ---
+        self._draw_layer(surface, "back", bone_pts, visible, screen)
 
         # --- DRAW SHOES ---
-        # We use ankle and foot_index to define the shoe
-        for side in ["left", "right"]:
-            ankle = smoothed_pose.get(f"{side}_ankle")
-            foot = smoothed_pose.get(f"{side}_foot_index")
-            
-            if ankle is not None:
-                ankle_pt = self._to_screen(ankle)
-                if foot is not None:
-                    foot_pt = self._to_screen(foot)
-                    # Draw oval along the vector from ankle to foot
-                    # Simplified: Draw a large oval at the foot index
-                    pygame.draw.circle(surface, (50, 0, 0), foot_pt, 18) # Darker sole
-                    pygame.draw.circle(surface, self.shoe_color, foot_pt, 14) # Shoe
-                    # Connect ankle to shoe
-                    pygame.draw.line(surface, self.body_color, ankle_pt, foot_pt, 8)
-                else:
-                    # Fallback: Just a circle at ankle
-                    pygame.draw.circle(surface, self.shoe_color, ankle_pt, 15)
+        shoes = []
+        for slot in rig.shoe_slots:
+            foot_pt = tuple(screen_pts[slot])
+            shoes.extend((foot_pt, px(disc["radius"], s), self._color(disc["color"])) for disc in rig.shoe_discs)
+        self.renderer.discs(surface, shoes)
 
         # --- DRAW HEAD (Dynamic Size) ---
         # Calculate head bounds based on Face Landmarks to prevent clipping
-        head_center = None
-        head_radius = 40 # Default
+        head = rig.head
+        head_radius = px(head["radius"], s) # Default
         
-        # Gather all face points to find the bounding box
-        all_face_pts = []
         if face:
-            for key in ["left_eye", "right_eye", "lips", "jaw"]:
-                pts = face.get(key)
-                if pts: all_face_pts.extend(pts)
-        
-        if all_face_pts:
-            # Project all to screen
-            screen_face_pts = np.array([self._to_screen(pt) for pt in all_face_pts])
-            min_x, min_y = np.min(screen_face_pts, axis=0)
-            max_x, max_y = np.max(screen_face_pts, axis=0)
+            # Bounding box of the tracked face subset, projected to screen
+            face_xy = data.face[:, :2]
+            min_x, min_y = face_xy.min(axis=0) * (self.width, self.height) + (self.x, self.y)
+            max_x, max_y = face_xy.max(axis=0) * (self.width, self.height) + (self.x, self.y)
             
             # Center is mid of bounds
-            center_x = int((min_x + max_x) / 2)
-            center_y = int((min_y + max_y) / 2)
-            head_center = (center_x, center_y)
+            head_center = (int((min_x + max_x) / 2), int((min_y + max_y) / 2))
             
             # Radius is half max dimension + padding
             max_dim = max(max_x - min_x, max_y - min_y)
-            head_radius = int(max_dim / 2 * 1.4) # 1.4x padding
+            head_radius = int(max_dim / 2 * head["padding"])
             
             # Clamp radius to sane limits
-            head_radius = max(35, min(head_radius, 120))
+            head_radius = max(px(head["min_radius"], s), min(head_radius, px(head["max_radius"], s)))
         else:
             # Fallback if face tracking lost but pose exists
-            if "nose" in smoothed_pose:
-                head_center = self._to_screen(smoothed_pose["nose"])
-            elif "neck" in smoothed_pose:
-                 n = self._to_screen(smoothed_pose["neck"])
-                 head_center = (n[0], n[1] - 50)
-
-        if head_center:
-            # Draw Neck connection first
-            if "neck" in smoothed_pose:
-                 pygame.draw.line(surface, self.body_color, self._to_screen(smoothed_pose["neck"]), head_center, 10)
-
-            # Draw Head Circle
-            pygame.draw.circle(surface, (0, 50, 50), head_center, head_radius + 4) # Glow
-            pygame.draw.circle(surface, (20, 20, 25), head_center, head_radius) # Dark Face Background
-            pygame.draw.circle(surface, self.body_color, head_center, head_radius, 3) # Outline
-
-            # Draw Face Features
-            if face:
-                # Eyes & Blink
-                blink_thresh = 0.18
+            head_center = tuple(screen_pts[rig.slot[head["anchor"]]])
+
+        # Draw Neck connection first
+        if "neck" in rig.slot:
+            pygame.draw.line(surface, self.body_color, tuple(screen_pts[rig.slot["neck"]]), head_center,
+                             px(head["neck_width"], s))
+
+        # Draw Head Circle (glow, dark face background, outline)
+        self.renderer.head(surface, head_center, head_radius, tuple(head["face_color"]), self.body_color, self.glow_color)
+        extent = head_radius + px(13, s)
+        self.dirty_rect.union_ip(pygame.Rect(head_center[0] - extent, head_center[1] - extent, 2 * extent, 2 * extent))
+
+        # Draw Face Features
+        if face:
+            # Eyes & Blink
+            eyes_style = rig.eyes
+            eyes = []
+            
+            for side in eyes_style["sides"]:
+                # Absolute tracking; the head circle encompasses the eyes so they land inside it
+                eye_pos = tuple(screen_pts[rig.slot[f"{side}_eye"]])
                 
-                for side in ["left", "right"]:
-                    blink = face.get(f"{side}_blink", 0.3)
-                    iris = face.get(f"{side}_iris")
-                    eye_pts = face.get(f"{side}_eye")
-                    
-                    if eye_pts:
-                        # Calculate eye center relative to head logic? 
-                        # No, use absolute tracking but ensure it's drawn on top
-                        # We just draw them. Since head_circle encompasses them, they should be inside.
-                        
-                        eye_center_raw = np.mean(np.array(eye_pts)[:,:2], axis=0)
-                        s_eye_center = self.smoother.update(f"{side}_eye_center", eye_center_raw)
-                        eye_pos = self._to_screen(s_eye_center)
-                        
-                        if blink > blink_thresh:
-                             # Open
-                             pygame.draw.circle(surface, (255, 255, 255), eye_pos, 10) # Sclera
-                             if iris:
-                                 i_raw = np.mean(np.array(iris)[:,:2], axis=0)
-                                 s_i = self.smoother.update(f"{side}_iris_pt", i_raw)
-                                 pygame.draw.circle(surface, (0, 0, 0), self._to_screen(s_i), 4) # Pupil
-                             else:
-                                 pygame.draw.circle(surface, (0, 0, 0), eye_pos, 4)
-                        else:
-                             # Closed
-                             pygame.draw.line(surface, self.body_color, (eye_pos[0]-8, eye_pos[1]), (eye_pos[0]+8, eye_pos[1]), 3)
-
-                # Mouth
-                lips = face.get("lips")
-                if lips:
-                    s_lips = []
-                    for i, pt in enumerate(lips):
-                        s_pt = self.smoother.update(f"lip_{i}", pt[:2])
-                        s_lips.append(self._to_screen(s_pt))
-                    
-                    if len(s_lips) > 2:
-                        pygame.draw.lines(surface, self.body_color, True, s_lips, 2)
+                if data.blink(side) > eyes_style["blink_threshold"]:
+                     # Open: sclera, then pupil at the iris
+                     eyes.append((eye_pos, px(eyes_style["radius"], s), (255, 255, 255)))
+                     eyes.append((tuple(screen_pts[rig.slot[f"{side}_iris"]]), px(eyes_style["pupil_radius"], s),
+                                  (0, 0, 0)))
+                else:
+                     # Closed
+                     half = px(eyes_style["closed_half_width"], s)
+                     pygame.draw.line(surface, self.body_color, (eye_pos[0] - half, eye_pos[1]),
+                                      (eye_pos[0] + half, eye_pos[1]), px(eyes_style["closed_width"], s))
+            self.renderer.discs(surface, eyes)
+
+            # Mouth
+            s_lips = screen[rig.slices[rig.mouth["outline"]]].tolist()
+            pygame.draw.lines(surface, self.body_color, True, s_lips, px(rig.mouth["width"], s))
+        elif visemes is not None:
+            # No face landmarks: lip sync from the audio alone
+            pygame.draw.polygon(surface, self.body_color, self._viseme_mouth(head_center, head_radius, visemes),
+                                px(rig.mouth["width"], s))
 
         # --- HANDS (Thicker Fingers) ---
-        hand_connections = [
-            (0, 1), (1, 2), (2, 3), (3, 4),
-            (0, 5), (5, 6), (6, 7), (7, 8),
-            (5, 9), (9, 10), (10, 11), (11, 12),
-            (9, 13), (13, 14), (14, 15), (15, 16),
-            (13, 17), (17, 18), (18, 19), (19, 20),
-            (0, 17)
-        ]
-        for hand_key in ["left_hand", "right_hand"]:
-            hand_pts = data.get(hand_key)
-            if hand_pts:
-                s_hand = []
-                for i, pt in enumerate(hand_pts):
-                    s_pt = self.smoother.update(f"{hand_key}_{i}", (pt[0], pt[1]))
-                    s_hand.append(self._to_screen(s_pt))
-                
-                # Draw connections
-                for i, j in hand_connections:
-                    if i < len(s_hand) and j < len(s_hand):
-                        self.draw_rounded_line(surface, s_hand[i], s_hand[j], self.body_color, 4) # Thicker fingers
-                
-                # Draw joints/tips
-                for pt in s_hand:
-                     pygame.draw.circle(surface, self.glow_color, pt, 3)
+        self._draw_layer(surface, "front", bone_pts, visible, screen)
+
+        if s != 1.0:
+            # Back to display pixels, rounded outwards
+            r = self.dirty_rect
+            left, top = math.floor(r.left / s), math.floor(r.top / s)
+            self.dirty_rect = pygame.Rect(left, top, math.ceil(r.right / s) - left, math.ceil(r.bottom / s) - top)
+
+        if self.profiler:
+            self.profiler.record("draw", t0, time.perf_counter())
+
+    def _draw_layer(self, surface, layer, bone_pts, visible, screen):
+        """Draws every style of one layer, in rig order, over its visible bones."""
+        rig = self.rig
+        s = self.render_scale
+        for style_id, style in enumerate(rig.styles):
+            if style["layer"] != layer:
+                continue
+            if style["kind"] == "joints":
+                slots = rig.style_slots[style_id]
+                points = screen[slots[self._present[slots]]].tolist()
+                if points:
+                    self.renderer.joints(surface, points, px(style["radius"], s), self._color(style["color"]))
+                continue
+            bones = rig.style_bones[style_id]
+            chains = [bone_pts[rig.bone_starts[b]:rig.bone_ends[b]] for b in bones[visible[bones]]]
+            if not chains:
+                continue
+            if style["kind"] == "limb":
+                self.renderer.limbs(surface, chains, px(style["width"], s), self._color(style["color"]),
+                                    self._color(style["glow"]))
+            else:
+                self.renderer.lines(surface, chains, px(style["width"], s), self._color(style["color"]))
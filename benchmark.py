@@ -0,0 +1,376 @@
+import os
+import gc
+import sys
+import json
+import time
+import types
+import platform
+import argparse
+
+# Headless: no window, no audio device
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from landmarks import LandmarkFrame, POSE_INDEX, FACE_SLICES, FACE_INDICES
+from avatar import Avatar, NUM_SLOTS
+from compositor import PreviewSurface, SceneCompositor
+from utils import EMASmoother, BatchSmoother
+
+# Timed calls after the warm-up ones
+DEFAULT_FRAMES = 300
+WARMUP = 20
+# A case regresses when its median is this much slower than the baseline...
+DEFAULT_TOLERANCE = 0.25
+# ...and by at least this much in absolute terms (timer noise on tiny cases)
+NOISE_FLOOR_MS = 0.005
+
+# Rough standing pose in normalized image coordinates
+BASE_POSE = {
+    "nose": (0.50, 0.22),
+    "left_shoulder": (0.58, 0.35), "right_shoulder": (0.42, 0.35),
+    "left_elbow": (0.66, 0.48), "right_elbow": (0.34, 0.48),
+    "left_wrist": (0.70, 0.60), "right_wrist": (0.30, 0.60),
+    "left_hip": (0.55, 0.62), "right_hip": (0.45, 0.62),
+    "left_knee": (0.56, 0.78), "right_knee": (0.44, 0.78),
+    "left_ankle": (0.56, 0.92), "right_ankle": (0.44, 0.92),
+    "left_foot_index": (0.58, 0.95), "right_foot_index": (0.42, 0.95),
+}
+
+
+def synthetic_frame(i, hands=True, face=True, frame=None, seed=0):
+    """Deterministic, gently moving LandmarkFrame for frame number i."""
+    rng = np.random.default_rng(seed + i)
+    frame = LandmarkFrame() if frame is None else frame
+    frame.clear()
+    sway = 0.02 * np.sin(i * 0.1)
+    frame.pose[:, :2] = 0.5
+    frame.pose[:, 3] = 1.0
+    for name, (x, y) in BASE_POSE.items():
+        frame.pose[POSE_INDEX[name], :2] = (x + sway, y)
+    frame.pose[:, :3] += rng.normal(0, 0.002, (len(frame.pose), 3))
+    frame.has_pose = True
+    if hands:
+        for side, wrist in enumerate(("left_wrist", "right_wrist")):
+            center = frame.pose[POSE_INDEX[wrist], :2]
+            angles = np.linspace(0, np.pi, 21)
+            radii = np.tile([0.0, 0.02, 0.035, 0.045, 0.055], 5)[:21]
+            frame.hands[side, :, 0] = center[0] + radii * np.cos(angles)
+            frame.hands[side, :, 1] = center[1] + radii * np.sin(angles)
+            frame.hands[side, :, 2] = 0.0
+            frame.has_hands[side] = True
+    if face:
+        nose = frame.pose[POSE_INDEX["nose"], :2]
+        frame.face[:, :2] = nose + rng.normal(0, 0.02, (len(frame.face), 2))
+        frame.face[FACE_SLICES["left_eye"], :2] = nose + (0.03, -0.02) + rng.normal(0, 0.004, (6, 2))
+        frame.face[FACE_SLICES["right_eye"], :2] = nose + (-0.03, -0.02) + rng.normal(0, 0.004, (6, 2))
+        frame.has_face = True
+        frame.left_blink = frame.right_blink = 0.3
+    frame.seq = i + 1
+    frame.timestamp = i / 30.0
+    return frame
+
+
+class CountingSurface(pygame.Surface):
+    """Surface that counts blit/blits calls made on it."""
+    calls = 0
+
+    def blit(self, *args, **kwargs):
+        CountingSurface.calls += 1
+        return super().blit(*args, **kwargs)
+
+    def blits(self, *args, **kwargs):
+        CountingSurface.calls += 1
+        return super().blits(*args, **kwargs)
+
+
+def _count_draw_calls():
+    """Wraps the pygame.draw functions so each call bumps CountingSurface.calls."""
+    originals = {}
+    for name in ("line", "lines", "circle", "rect", "polygon", "ellipse", "aaline", "aalines"):
+        fn = getattr(pygame.draw, name)
+        originals[name] = fn
+
+        def counted(*args, _fn=fn, **kwargs):
+            CountingSurface.calls += 1
+            return _fn(*args, **kwargs)
+        setattr(pygame.draw, name, counted)
+    return originals
+
+
+class _Landmark:
+    __slots__ = ("x", "y", "z", "visibility")
+
+    def __init__(self, x, y, z, visibility=0.0):
+        self.x, self.y, self.z, self.visibility = x, y, z, visibility
+
+
+def _landmark_list(points):
+    return types.SimpleNamespace(landmark=[_Landmark(*map(float, p)) for p in points])
+
+
+def synthetic_results(frame, refined=True):
+    """
+    MediaPipe Holistic-shaped results (pose_landmarks.landmark[i].x ...) for
+    a LandmarkFrame, with a full 478-point (or 468 unrefined) face mesh.
+    """
+    face = None
+    if frame.has_face:
+        mesh = np.empty((478 if refined else 468, 3), dtype=np.float32)
+        mesh[:] = frame.face.mean(axis=0)
+        for row, index in enumerate(FACE_INDICES):
+            if index < len(mesh):
+                mesh[index] = frame.face[row]
+        face = _landmark_list(mesh)
+    hands = [_landmark_list(frame.hands[side]) if frame.has_hands[side] else None for side in range(2)]
+    return types.SimpleNamespace(
+        pose_landmarks=_landmark_list(frame.pose) if frame.has_pose else None,
+        left_hand_landmarks=hands[0],
+        right_hand_landmarks=hands[1],
+        face_landmarks=face,
+    )
+
+
+def summarize(seconds):
+    """Per-call statistics in milliseconds."""
+    ms = np.asarray(seconds) * 1000.0
+    return {
+        "n": int(len(ms)),
+        "mean_ms": float(ms.mean()),
+        "min_ms": float(ms.min()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }
+
+
+def time_calls(fn, inputs, warmup=WARMUP):
+    """
+    Times fn(x) for every x in inputs, after `warmup` untimed calls.
+    The garbage collector is paused while timing so its pauses do not
+    land on random samples.
+    """
+    for x in inputs[:warmup]:
+        fn(x)
+    gc.collect()
+    enabled = gc.isenabled()
+    gc.disable()
+    times = []
+    try:
+        for x in inputs:
+            start = time.perf_counter()
+            fn(x)
+            times.append(time.perf_counter() - start)
+    finally:
+        if enabled:
+            gc.enable()
+    return summarize(times)
+
+
+def bench_tracker(frames=DEFAULT_FRAMES):
+    """Times HolisticTracker.extract_landmarks and _get_blink_ratio on synthetic results."""
+    try:
+        from tracker import HolisticTracker
+        # The lightest graph; only its parsing is timed
+        tracker = HolisticTracker(model_complexity=0)
+    except Exception as e:
+        # No MediaPipe, or a build without mp.solutions
+        print(f"Skipping tracker benchmarks: {e}")
+        return {}
+    out = LandmarkFrame()
+    results = {}
+    try:
+        for name, hands, face, refined in (("full", True, True, True), ("unrefined_face", True, True, False),
+                                           ("pose_only", False, False, True)):
+            data = [synthetic_results(synthetic_frame(i, hands=hands, face=face), refined) for i in range(frames)]
+            results[f"extract_landmarks/{name}"] = time_calls(lambda r: tracker.extract_landmarks(r, out=out), data)
+        eyes = [synthetic_frame(i).face[FACE_SLICES["left_eye"]].copy() for i in range(frames)]
+        results["blink_ratio"] = time_calls(tracker._get_blink_ratio, eyes)
+    finally:
+        tracker.close()
+    return results
+
+
+def bench_smoothing(frames=DEFAULT_FRAMES):
+    """
+    Times one frame of smoothing for the avatar's NUM_SLOTS points: the
+    per-key EMASmoother (one update call per point) and BatchSmoother in
+    every mode (one call for all points).
+    """
+    rng = np.random.default_rng(0)
+    points = [rng.random((NUM_SLOTS, 2), dtype=np.float32) for _ in range(frames)]
+    results = {}
+
+    ema = EMASmoother(alpha=0.5)
+
+    def per_key(values):
+        for key, value in enumerate(values):
+            ema.update(key, value)
+    results[f"ema_smoother/{NUM_SLOTS}_keys"] = time_calls(per_key, points)
+
+    for mode in BatchSmoother.MODES:
+        smoother = BatchSmoother(NUM_SLOTS, dims=2, mode=mode)
+        stamped = [(values, i / 30.0) for i, values in enumerate(points)]
+        results[f"batch_smoother/{mode}"] = time_calls(lambda item: smoother.update(*item), stamped)
+    return results
+
+
+def bench_avatar_draw(frames=DEFAULT_FRAMES, width=1280, height=720):
+    """
+    Times Avatar.update_and_draw for each render backend, with and
+    without hands and face, and counts draw calls per frame.
+    """
+    pygame.display.init()
+    pygame.display.set_mode((width, height))
+    surface = CountingSurface((width, height), 0, pygame.display.get_surface())
+    originals = _count_draw_calls()
+    results = {}
+    try:
+        for backend in ("primitives", "sprites"):
+            for name, parts in (("full", True), ("pose_only", False)):
+                avatar = Avatar(width, height, backend=backend)
+                data = [synthetic_frame(i, hands=parts, face=parts) for i in range(frames)]
+                # Warm the sprite caches on every pose first: a live session reaches
+                # that steady state within seconds
+                for frame in data:
+                    avatar.update_and_draw(surface, frame, 0.0)
+                CountingSurface.calls = 0
+                stats = time_calls(lambda frame: avatar.update_and_draw(surface, frame, 0.0), data, warmup=0)
+                stats["draw_calls"] = CountingSurface.calls / frames
+                results[f"avatar/{backend}/{name}"] = stats
+    finally:
+        for name, fn in originals.items():
+            setattr(pygame.draw, name, fn)
+    return results
+
+
+def bench_scene(frames=DEFAULT_FRAMES, width=1280, height=720, scales=(0.5, 1.0, 2.0)):
+    """
+    Times a whole scene frame (background, avatar, scale pass to the
+    window) at several internal render scales.
+    """
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((width, height))
+    data = [synthetic_frame(i) for i in range(frames)]
+    results = {}
+    for scale in scales:
+        compositor = SceneCompositor(width, height, render_scale=scale)
+        avatar = Avatar(width, height)
+        avatar.set_render_scale(scale)
+
+        def draw(frame):
+            canvas = compositor.begin_frame(screen)
+            avatar.update_and_draw(canvas, frame, 0.0)
+            compositor.end_scene(screen)
+
+        results[f"scene/{scale:g}x"] = time_calls(draw, data)
+    return results
+
+
+def bench_preview(frames=DEFAULT_FRAMES, camera=(1280, 720), width=1280, height=720):
+    """Times the webcam preview path of the render loop: PreviewSurface.update plus its blit."""
+    pygame.display.init()
+    screen = pygame.display.set_mode((width, height))
+    preview = PreviewSurface((320, 180))
+    rng = np.random.default_rng(0)
+    # A few distinct camera frames, cycled
+    images = [rng.integers(0, 256, (camera[1], camera[0], 3), dtype=np.uint8) for _ in range(4)]
+    data = [images[i % len(images)] for i in range(frames)]
+    return {"preview": time_calls(lambda image: screen.blit(preview.update(image), (20, 20)), data)}
+
+
+SUITES = {
+    "tracker": bench_tracker,
+    "smoothing": bench_smoothing,
+    "avatar": bench_avatar_draw,
+    "scene": bench_scene,
+    "preview": bench_preview,
+}
+
+
+def run(frames=DEFAULT_FRAMES, suites=None):
+    """Runs the selected suites. Returns the JSON-ready report."""
+    results = {}
+    for name in suites or SUITES:
+        results.update(SUITES[name](frames))
+    return {
+        "meta": {
+            "frames": frames,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pygame": pygame.version.ver,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compares medians against a baseline report.
+    Returns [(case, baseline ms, current ms, ratio, regressed)] for the
+    cases present in both.
+    """
+    rows = []
+    for case, stats in report["results"].items():
+        old = baseline.get("results", {}).get(case)
+        if old is None:
+            continue
+        before, now = old["p50_ms"], stats["p50_ms"]
+        ratio = now / before if before > 0 else float("inf")
+        regressed = ratio > 1.0 + tolerance and now - before > NOISE_FLOOR_MS
+        rows.append((case, before, now, ratio, regressed))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmarks: landmark parsing, smoothing, avatar rendering and preview")
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES, help="Timed calls per case")
+    parser.add_argument("--suite", action="append", choices=list(SUITES),
+                        help="Run only this suite (repeatable). Default: all")
+    parser.add_argument("--output", metavar="PATH", help="Write the results as JSON")
+    parser.add_argument("--baseline", metavar="PATH",
+                        help="Compare against a previous --output file from this machine "
+                             "(create one with --output); exits with 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed median slowdown before a case counts as a regression (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    if args.baseline and not os.path.exists(args.baseline):
+        print(f"Error: no baseline at {args.baseline}. Record one on this machine first: "
+              f"python benchmark.py --output {args.baseline}")
+        sys.exit(2)
+
+    report = run(args.frames, args.suite)
+    print(f"{'case':<32} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for case, r in report["results"].items():
+        calls = f"  {r['draw_calls']:6.1f} draw calls" if "draw_calls" in r else ""
+        print(f"{case:<32} {r['p50_ms']:9.4f} {r['p95_ms']:9.4f} {r['p99_ms']:9.4f}{calls}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.tolerance)
+        print(f"\nAgainst {args.baseline} (median, tolerance {args.tolerance:.0%}):")
+        for case, before, now, ratio, regressed in rows:
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{case:<32} {before:9.4f} -> {now:9.4f} ms  x{ratio:5.2f}{flag}")
+        regressions = [row[0] for row in rows if row[4]]
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
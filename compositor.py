@@ -0,0 +1,216 @@
+import collections
+
+import cv2
+import numpy as np
+import pygame
+
+try:
+    from render_backend import px
+except ImportError:
+    from src.render_backend import px
+
+
+class TextCache:
+    """
+    Caches fonts and rendered text surfaces.
+    SysFont lookups and font.render are slow; labels like the FPS counter
+    only take a handful of distinct values, so they are rendered once.
+    """
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._fonts = {}
+        self._surfaces = collections.OrderedDict()
+
+    def font(self, name, size, bold=False):
+        key = (name, size, bold)
+        font = self._fonts.get(key)
+        if font is None:
+            font = pygame.font.SysFont(name, size, bold=bold)
+            self._fonts[key] = font
+        return font
+
+    def render(self, text, size, color, name="Arial", bold=False):
+        key = (text, size, color, name, bold)
+        surf = self._surfaces.get(key)
+        if surf is None:
+            surf = self.font(name, size, bold).render(text, True, color)
+            self._surfaces[key] = surf
+            if len(self._surfaces) > self.max_entries:
+                self._surfaces.popitem(last=False)
+        else:
+            self._surfaces.move_to_end(key)
+        return surf
+
+
+class PreviewSurface:
+    """
+    Webcam preview backed by a persistent pixel buffer.
+    Each update is a single cv2.resize straight into the memory of a
+    pygame surface made with image.frombuffer, instead of resizing,
+    converting, transposing and building a new surface every time.
+    """
+    def __init__(self, size):
+        self.size = tuple(size)
+        w, h = self.size
+        self._bgr = np.zeros((h, w, 3), dtype=np.uint8)
+        self._rgb = None
+        try:
+            self.surface = pygame.image.frombuffer(self._bgr, self.size, "BGR")
+        except ValueError:
+            # pygame < 2.1.3 has no BGR buffers: one extra (small) conversion pass
+            self._rgb = np.zeros_like(self._bgr)
+            self.surface = pygame.image.frombuffer(self._rgb, self.size, "RGB")
+
+    def update(self, frame):
+        """Shows a BGR camera frame. Returns the (same) preview surface."""
+        cv2.resize(frame, self.size, dst=self._bgr)
+        if self._rgb is not None:
+            cv2.cvtColor(self._bgr, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        return self.surface
+
+
+class SceneCompositor:
+    """
+    Layered scene presentation.
+    The background (floor grid, horizon) and the UI (camera button,
+    preview border) are pre-rendered and only rebuilt when the window
+    size or UI state changes. With dirty_rects=True only the regions
+    marked this frame and last frame are restored and presented with
+    pygame.display.update(rects) instead of a full flip.
+
+    With a render_scale other than 1 the scene (background and avatars)
+    is drawn to an offscreen canvas of that many times the window size
+    and scaled to the display in one pass: below 1 to draw fewer pixels
+    (unfiltered), above 1 to supersample (averaged). The UI is always drawn at display resolution.
+    """
+    BG_COLOR = (10, 10, 15)       # Deep dark background
+    GRID_COLOR = (30, 30, 40)
+    HORIZON_COLOR = (0, 255, 255)
+
+    def __init__(self, width, height, dirty_rects=False, preview_size=(320, 180), render_scale=1.0):
+        self.dirty_rects = dirty_rects
+        self.render_scale = render_scale
+        self.canvas = None
+        self.preview_w, self.preview_h = preview_size
+        self.text = TextCache()
+        self.show_camera = True
+        self._dirty = []
+        self._prev_dirty = []
+        self.resize(width, height)
+
+    # --- Layers ---
+    def resize(self, width, height):
+        """Rebuilds every layer for a new window size."""
+        self.width = width
+        self.height = height
+        self.button_rect = pygame.Rect(width - 110, 10, 100, 30)
+        self.preview_rect = pygame.Rect(width - self.preview_w - 10, 50, self.preview_w, self.preview_h)
+        self._build_background()
+        self._build_ui()
+
+    def set_render_scale(self, render_scale):
+        """Changes the scene's render resolution (a multiple of the window size)."""
+        if render_scale != self.render_scale:
+            self.render_scale = render_scale
+            self._build_background()
+
+    def _surface(self, size):
+        surf = pygame.Surface(size)
+        return surf.convert() if pygame.display.get_surface() is not None else surf
+
+    def _build_background(self):
+        s = self.render_scale
+        width, height = max(1, round(self.width * s)), max(1, round(self.height * s))
+        bg = self._surface((width, height))
+        bg.fill(self.BG_COLOR)
+        # Grid floor
+        for x in range(0, self.width, 100):
+            pygame.draw.line(bg, self.GRID_COLOR, (x * s, height), (width / 2, height / 2 - 50 * s), px(1, s))
+        pygame.draw.line(bg, self.HORIZON_COLOR, (0, height - 50 * s), (width, height - 50 * s), px(2, s))
+        self.background = bg
+        # Offscreen scene surface, only when the scene is not drawn at display size
+        self.canvas = self._surface((width, height)) if s != 1.0 else None
+        self._full_redraw = True
+
+    def _build_ui(self):
+        # Camera toggle button
+        button = pygame.Surface(self.button_rect.size, pygame.SRCALPHA)
+        local = button.get_rect()
+        btn_color = (0, 200, 100) if self.show_camera else (200, 50, 50)
+        pygame.draw.rect(button, btn_color, local, 0, 5)
+        pygame.draw.rect(button, (255, 255, 255), local, 2, 5)
+        btn_txt = "Cam: ON" if self.show_camera else "Cam: OFF"
+        txt_surf = self.text.render(btn_txt, 16, (255, 255, 255))
+        button.blit(txt_surf, txt_surf.get_rect(center=local.center))
+        self.ui_items = [(button, self.button_rect.topleft)]
+
+        # Border around the camera preview
+        if self.show_camera:
+            border = pygame.Surface(self.preview_rect.size, pygame.SRCALPHA)
+            pygame.draw.rect(border, (0, 255, 255), border.get_rect(), 2)
+            self.ui_items.append((border, self.preview_rect.topleft))
+        self._full_redraw = True
+
+    def set_show_camera(self, show_camera):
+        if show_camera != self.show_camera:
+            self.show_camera = show_camera
+            self._build_ui()
+
+    # --- Per frame ---
+    def begin_frame(self, screen):
+        """
+        Restores the background under everything drawn last frame.
+        Returns the surface to draw the scene on: the screen, or the
+        offscreen canvas when render_scale is not 1.
+        """
+        if self.canvas is not None:
+            # The whole canvas is scaled to the screen every frame anyway
+            self.canvas.blit(self.background, (0, 0))
+            self._dirty = []
+            return self.canvas
+        if not self.dirty_rects or self._full_redraw:
+            screen.blit(self.background, (0, 0))
+        else:
+            screen.blits([(self.background, r, r) for r in self._prev_dirty], doreturn=False)
+        self._dirty = []
+        return screen
+
+    def end_scene(self, screen):
+        """Scales the offscreen scene onto the screen in one pass (nothing to do at render_scale 1)."""
+        if self.canvas is None:
+            return
+        size = (self.width, self.height)
+        if self.render_scale > 1.0:
+            try:
+                # Averages the supersampled pixels (anti-aliasing)
+                pygame.transform.smoothscale(self.canvas, size, screen)
+                return
+            except ValueError:
+                # smoothscale needs 24/32-bit surfaces
+                pass
+        # Upscaling a low-resolution scene: a filtered pass would cost more than the fill it saved
+        pygame.transform.scale(self.canvas, size, screen)
+
+    def mark(self, rect):
+        """Marks a screen region as changed this frame."""
+        if rect:
+            self._dirty.append(pygame.Rect(rect))
+
+    def draw_ui(self, screen):
+        """Blits the pre-rendered UI layer on top of the scene."""
+        screen.blits(self.ui_items, doreturn=False)
+        for surf, pos in self.ui_items:
+            self.mark(surf.get_rect(topleft=pos))
+
+    def draw_text(self, screen, text, pos, size=18, color=(100, 100, 100)):
+        surf = self.text.render(text, size, color)
+        self.mark(screen.blit(surf, pos))
+
+    def present(self):
+        """Flips the whole display, or updates only this frame's and last frame's regions."""
+        if not self.dirty_rects or self._full_redraw:
+            pygame.display.flip()
+            self._full_redraw = False
+        else:
+            pygame.display.update(self._prev_dirty + self._dirty)
+        self._prev_dirty = self._dirty
@@ -0,0 +1,84 @@
+import threading
+
+import numpy as np
+
+
+class BufferPool:
+    """
+    Named scratch arrays that persist across frames.
+    get() hands back the same array every time and only reallocates when
+    the requested shape or dtype changes, so per-frame OpenCV calls can
+    write into it through `dst=` instead of allocating a new image.
+    """
+    def __init__(self):
+        self._arrays = {}
+        self.allocations = 0
+
+    def get(self, name, shape, dtype=np.uint8):
+        shape = tuple(shape)
+        array = self._arrays.get(name)
+        if array is None or array.shape != shape or array.dtype != dtype:
+            array = np.empty(shape, dtype=dtype)
+            self._arrays[name] = array
+            self.allocations += 1
+        return array
+
+
+class FramePool:
+    """
+    Preallocated frames handed out with acquire() and given back with release().
+    A frame is only reused after its holder has released it, so a consumer
+    can keep one (the render loop's preview) for as long as it needs. When
+    every frame is held, acquire() allocates another rather than hand out
+    one that is still being read.
+    """
+    def __init__(self, count=6):
+        self.count = count
+        self._free = []
+        self._key = None
+        self._lock = threading.Lock()
+        self.allocations = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        key = (tuple(shape), np.dtype(dtype))
+        with self._lock:
+            if key != self._key:
+                # New camera size: frames of the old size are dropped on release
+                self._key = key
+                self._free = [np.empty(key[0], dtype=key[1]) for _ in range(self.count)]
+                self.allocations += self.count
+            if self._free:
+                return self._free.pop()
+            self.allocations += 1
+        return np.empty(key[0], dtype=key[1])
+
+    def release(self, frame):
+        with self._lock:
+            if (frame.shape, frame.dtype) == self._key:
+                self._free.append(frame)
+
+
+class ObjectPool:
+    """Like FramePool, for reusable objects built by `factory` (e.g. LandmarkFrame)."""
+    def __init__(self, factory, count=3):
+        self.factory = factory
+        self._free = [factory() for _ in range(count)]
+        self._lock = threading.Lock()
+        self.allocations = count
+
+    def acquire(self):
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+            self.allocations += 1
+        return self.factory()
+
+    def release(self, obj):
+        with self._lock:
+            self._free.append(obj)
+
+
+def scaled_size(shape, scale):
+    """(width, height) of an image of `shape` resized by `scale`, as cv2.resize rounds it."""
+    h, w = shape[:2]
+    return max(1, int(round(w * scale))), max(1, int(round(h * scale)))
@@ -0,0 +1,134 @@
+import time
+import shlex
+import threading
+import subprocess
+import collections
+
+import numpy as np
+
+try:
+    from pipeline import StageStats
+except ImportError:
+    from src.pipeline import StageStats
+
+
+def surface_pix_fmt(surface):
+    """ffmpeg pixel format matching a 32-bit surface's memory layout (None if unsupported)."""
+    if surface.get_bytesize() != 4:
+        return None
+    r, g, b, _ = surface.get_masks()
+    return {(0xFF0000, 0xFF00, 0xFF): "bgr0", (0xFF, 0xFF00, 0xFF0000): "rgb0"}.get((r, g, b))
+
+
+class FrameSink:
+    """
+    Streams rendered frames to an ffmpeg process or a named pipe.
+    The render thread copies the display surface's pixel buffer, in its
+    native layout (see surface_pix_fmt), straight into one of a few preallocated buffers (a
+    single memcpy, no colour conversion); a writer thread hands those
+    buffers to the pipe. If the writer falls behind, new frames are
+    dropped instead of blocking the render loop.
+    """
+    def __init__(self, width, height, pix_fmt="bgr0", ffmpeg_args=None, pipe_path=None, fps=60, queue_size=3):
+        if (ffmpeg_args is None) == (pipe_path is None):
+            raise ValueError("FrameSink needs exactly one of ffmpeg_args or pipe_path")
+        self.width = width
+        self.height = height
+        self.pix_fmt = pix_fmt
+        self.fps = fps
+        self.frame_bytes = width * height * 4
+        self._free = collections.deque(np.empty(self.frame_bytes, dtype=np.uint8) for _ in range(queue_size))
+        self._ready = collections.deque()
+        self._cond = threading.Condition()
+        self._running = True
+        self.written = 0
+        self.dropped = 0
+        self.error = None
+        self.write_stats = StageStats(window=120)
+
+        self._proc = None
+        if ffmpeg_args is not None:
+            cmd = ["ffmpeg", "-loglevel", "error", "-y", "-f", "rawvideo", "-pix_fmt", pix_fmt,
+                   "-s", f"{width}x{height}", "-r", str(fps), "-i", "-"] + shlex.split(ffmpeg_args)
+            self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+        self._pipe_path = pipe_path
+        self._thread = threading.Thread(target=self._write_loop, name="frame-sink", daemon=True)
+        self._thread.start()
+
+    def submit(self, surface):
+        """Copies the surface's pixels for writing. Returns False if the frame was dropped."""
+        with self._cond:
+            buf = self._free.popleft() if self._free and self.error is None else None
+        if buf is None:
+            self.dropped += 1
+            return False
+        # Raw pixel memory of the surface (locks it until released)
+        raw = surface.get_buffer()
+        try:
+            pixels = np.frombuffer(raw, dtype=np.uint8)
+            if pixels.size == self.frame_bytes:
+                buf[:] = pixels
+            else:
+                # Rows are padded (pitch > width * 4): copy the visible part of each row
+                rows = pixels.reshape(self.height, surface.get_pitch())[:, :self.width * 4]
+                buf.reshape(self.height, self.width * 4)[:] = rows
+            del pixels
+        finally:
+            raw = None  # Unlocks the surface
+        with self._cond:
+            self._ready.append(buf)
+            self._cond.notify()
+        return True
+
+    def _write_loop(self):
+        try:
+            out = self._proc.stdin if self._proc is not None else open(self._pipe_path, "wb", buffering=0)
+        except OSError as e:
+            self.error = e
+            return
+        try:
+            while True:
+                with self._cond:
+                    while not self._ready and self._running:
+                        self._cond.wait()
+                    if not self._ready:
+                        break
+                    buf = self._ready.popleft()
+                start = time.perf_counter()
+                try:
+                    out.write(memoryview(buf))
+                except (OSError, ValueError) as e:
+                    self.error = e
+                    break
+                finally:
+                    with self._cond:
+                        self._free.append(buf)
+                self.written += 1
+                self.write_stats.record(start, time.perf_counter())
+        finally:
+            try:
+                out.close()
+            except OSError:
+                pass
+
+    def stats(self):
+        """Sustained output rate (frames/s, MB/s) and frame counts."""
+        fps = self.write_stats.fps
+        return {
+            "fps": fps,
+            "mb_per_s": fps * self.frame_bytes / 1e6,
+            "written": self.written,
+            "dropped": self.dropped,
+            "queued": len(self._ready),
+        }
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout=5.0)
+        if self._proc is not None:
+            try:
+                self._proc.wait(timeout=5.0)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
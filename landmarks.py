@@ -0,0 +1,169 @@
+import numpy as np
+
+try:
+    from rig import Rig
+except ImportError:
+    from src.rig import Rig
+
+# Tracked points come from the rig definition (rig.json)
+RIG = Rig.load()
+
+# MediaPipe pose landmark indices for the joints the avatar uses
+POSE_INDEX = RIG.pose_index
+NUM_POSE = RIG.num_pose
+NUM_HAND = RIG.num_hand
+
+LEFT_HAND = 0
+RIGHT_HAND = 1
+HAND_KEYS = ("left_hand", "right_hand")
+
+# Face mesh subset (with refine_face_landmarks=True for the irises).
+# Groups are stored back to back in LandmarkFrame.face.
+FACE_GROUPS = RIG.face_groups
+FACE_INDICES = RIG.face_indices
+FACE_SLICES = RIG.face_slices
+NUM_FACE = RIG.num_face
+
+# Separately tracked parts, in the order of LandmarkFrame.part_times
+PARTS = ("pose", "left_hand", "right_hand", "face")
+PART_INDEX = {name: i for i, name in enumerate(PARTS)}
+
+
+class LandmarkFrame:
+    """
+    Preallocated landmark storage for one tracked frame.
+    Filled in place by HolisticTracker.extract_landmarks and reused
+    every frame, so no per-joint objects are created.
+    """
+    __slots__ = (
+        "pose", "hands", "face",
+        "has_pose", "has_hands", "has_face",
+        "left_blink", "right_blink",
+        "timestamp", "seq", "part_times",
+    )
+
+    def __init__(self):
+        self.pose = np.zeros((NUM_POSE, 4), dtype=np.float32)       # x, y, z, visibility
+        self.hands = np.zeros((2, NUM_HAND, 3), dtype=np.float32)   # left, right
+        self.face = np.zeros((NUM_FACE, 3), dtype=np.float32)
+        self.has_pose = False
+        self.has_hands = np.zeros(2, dtype=bool)
+        self.has_face = False
+        self.left_blink = 0.3
+        self.right_blink = 0.3
+        self.timestamp = 0.0
+        self.seq = 0
+        # When each part (see PARTS) was last measured, on the same clock as timestamp
+        self.part_times = np.zeros(len(PARTS), dtype=np.float64)
+
+    def clear(self):
+        """Marks every part as missing (array contents are left as-is)."""
+        self.has_pose = False
+        self.has_hands[:] = False
+        self.has_face = False
+
+    def copy_from(self, other):
+        """Copies another frame into this one without allocating."""
+        np.copyto(self.pose, other.pose)
+        np.copyto(self.hands, other.hands)
+        np.copyto(self.face, other.face)
+        self.has_pose = other.has_pose
+        np.copyto(self.has_hands, other.has_hands)
+        self.has_face = other.has_face
+        self.left_blink = other.left_blink
+        self.right_blink = other.right_blink
+        self.timestamp = other.timestamp
+        self.seq = other.seq
+        np.copyto(self.part_times, other.part_times)
+        return self
+
+    def copy(self):
+        return LandmarkFrame().copy_from(self)
+
+    def retime(self, timestamp):
+        """Moves the frame, part times included, onto another clock (e.g. the capture time)."""
+        self.part_times += timestamp - self.timestamp
+        self.timestamp = timestamp
+
+    def age(self, part):
+        """Seconds between the frame time and the last measurement of a part (see PARTS)."""
+        return self.timestamp - self.part_times[PART_INDEX[part]]
+
+    # --- Named views ---
+    def joint(self, name):
+        """(x, y, z, visibility) view of a named pose joint."""
+        return self.pose[POSE_INDEX[name]]
+
+    @property
+    def neck(self):
+        """Midpoint of the shoulders."""
+        return (self.pose[POSE_INDEX["left_shoulder"]] + self.pose[POSE_INDEX["right_shoulder"]]) * 0.5
+
+    def hand(self, key):
+        """(21, 3) view of 'left_hand' / 'right_hand', or None when not tracked."""
+        side = HAND_KEYS.index(key)
+        return self.hands[side] if self.has_hands[side] else None
+
+    def face_group(self, name):
+        """(N, 3) view of a face feature group, or None when the face is not tracked."""
+        return self.face[FACE_SLICES[name]] if self.has_face else None
+
+    def blink(self, side):
+        return self.left_blink if side == "left" else self.right_blink
+
+
+# --- Fixed binary layout ---
+# One LandmarkFrame as a flat record, shared by recordings and the worker pool.
+FLAG_POSE = 1
+FLAG_LEFT_HAND = 2
+FLAG_RIGHT_HAND = 4
+FLAG_FACE = 8
+
+RECORD_DTYPE = np.dtype([
+    ("seq", "<u4"),
+    ("flags", "<u4"),
+    ("timestamp", "<f8"),
+    ("volume", "<f4"),
+    ("left_blink", "<f4"),
+    ("right_blink", "<f4"),
+    ("pose", "<f4", (NUM_POSE, 4)),
+    ("hands", "<f4", (2, NUM_HAND, 3)),
+    ("face", "<f4", (NUM_FACE, 3)),
+])
+
+
+def pack_frame(rec, frame):
+    """Writes a LandmarkFrame (or None for "no person") into a RECORD_DTYPE record."""
+    flags = 0
+    if frame is not None and frame.has_pose:
+        flags |= FLAG_POSE
+        flags |= FLAG_LEFT_HAND if frame.has_hands[0] else 0
+        flags |= FLAG_RIGHT_HAND if frame.has_hands[1] else 0
+        flags |= FLAG_FACE if frame.has_face else 0
+        rec["left_blink"] = frame.left_blink
+        rec["right_blink"] = frame.right_blink
+        rec["pose"] = frame.pose
+        rec["hands"] = frame.hands
+        rec["face"] = frame.face
+    rec["flags"] = flags
+
+
+def unpack_frame(rec, out=None):
+    """Fills (and returns) a LandmarkFrame from a record, or None if it holds no pose."""
+    flags = int(rec["flags"])
+    if not flags & FLAG_POSE:
+        return None
+    frame = LandmarkFrame() if out is None else out
+    np.copyto(frame.pose, rec["pose"])
+    np.copyto(frame.hands, rec["hands"])
+    np.copyto(frame.face, rec["face"])
+    frame.has_pose = True
+    frame.has_hands[0] = bool(flags & FLAG_LEFT_HAND)
+    frame.has_hands[1] = bool(flags & FLAG_RIGHT_HAND)
+    frame.has_face = bool(flags & FLAG_FACE)
+    frame.left_blink = float(rec["left_blink"])
+    frame.right_blink = float(rec["right_blink"])
+    frame.timestamp = float(rec["timestamp"])
+    frame.part_times[:] = frame.timestamp
+    frame.seq = int(rec["seq"])
+    return frame
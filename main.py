@@ -1,41 +1,120 @@
-import cv2
 import pygame
 import sys
 import os
-import numpy as np
+import time
+import argparse
 
 # Add the directory containing the script to sys.path to allow imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from tracker import HolisticTracker
-from audio import AudioProcessor
-from avatar import Avatar
-
-def draw_gradient_loading(screen, width, height):
-    """Draws a simple gradient and loading text."""
-    # Draw Gradient (Blue to Black)
-    for y in range(height):
-        # Interpolate color
-        c = int(20 * (1 - y/height)) # Dark fade
-        color = (10, 10 + int(40 * (y/height)), 20 + int(60 * (y/height)))
-        pygame.draw.line(screen, color, (0, y), (width, y))
-    
-    # Draw Text
-    font = pygame.font.SysFont("Arial", 40, bold=True)
-    text = font.render("Launching Gaurish Realtime Avatar...", True, (0, 255, 255))
-    text_rect = text.get_rect(center=(width//2, height//2))
-    screen.blit(text, text_rect)
-    
-    # Subtext
-    font_small = pygame.font.SysFont("Arial", 20)
-    text_small = font_small.render("Initializing AI Modules...", True, (150, 150, 150))
-    text_small_rect = text_small.get_rect(center=(width//2, height//2 + 50))
-    screen.blit(text_small, text_small_rect)
-    
-    pygame.display.flip()
+from quality import QualityController, QUALITY_TIERS, tier_by_name
+from startup import Startup, LoadingScreen
+
+def _import_modules():
+    """Imports the heavy modules (NumPy, OpenCV, rendering) off the main thread."""
+    import compositor, recording, profiler, scene  # noqa: F401
+
+def _start_audio(latency_offset):
+    from audio import AudioProcessor
+    audio = AudioProcessor(latency_offset=latency_offset)
+    audio.start()
+    return audio
+
+def _start_workers(performer, width, height):
+    """Starts a performer's tracker processes and waits until their models are loaded."""
+    from scene import frame_shape
+    pool = performer.pipeline.inference.start_pool(frame_shape(performer.cap, width, height))
+    if not pool.wait_ready():
+        raise RuntimeError("tracker workers did not report ready")
+
+def _source_label(spec):
+    kind = {"camera": "Camera", "video": "Video", "replay": "Replay", "stream": "Stream"}[spec.kind]
+    target = spec.target if spec.kind in ("camera", "stream") else os.path.basename(spec.target)
+    return f"{kind} {target}"
+
+def part_rates(text):
+    """argparse type for --part-rates: 'pose=30,hands=30,face=15' -> {part: Hz}."""
+    rates = {}
+    for item in text.split(","):
+        name, _, value = item.partition("=")
+        try:
+            rates[name.strip()] = float(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"expected part=Hz, got '{item}'")
+    return rates
+
+def render_scale(text):
+    """argparse type for --render-scale: a positive multiple of the window size."""
+    try:
+        scale = float(text)
+    except ValueError:
+        scale = 0.0
+    if not 0.1 <= scale <= 4.0:
+        raise argparse.ArgumentTypeError(f"expected a scale between 0.1 and 4, got '{text}'")
+    return scale
 
-def main():
-    pygame.init()
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Gaurish Realtime Avatar")
+    parser.add_argument("--source", action="append", default=[], metavar="SPEC",
+                        help="Input source, repeatable: camera index, video file, landmark recording (.lmk) "
+                             "or landmark stream (udp://bind-host:port, ws://host:port), "
+                             "optionally with placement, e.g. '1@x=0.25,scale=0.6,color=lime'. Default: camera 0")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="Present only changed regions instead of flipping the full window")
+    parser.add_argument("--renderer", default="primitives", choices=["primitives", "sprites"],
+                        help="Avatar drawing backend: 'primitives' (one draw call per shape, dimmed underlay) "
+                             "or 'sprites' (batched, additive glow; fastest once its sprite caches are warm)")
+    parser.add_argument("--render-scale", type=render_scale, default=1.0, metavar="SCALE",
+                        help="Draw the scene at SCALE times the window resolution and scale it to the window "
+                             "in one pass: e.g. 2 for anti-aliased output, below 1 for fill-bound machines")
+    parser.add_argument("--record", metavar="PATH",
+                        help="Record tracked landmarks (of the first source) and audio volume to a binary file")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="Replay a landmark recording instead of using the camera, tracker and microphone "
+                             "(same as --source PATH)")
+    parser.add_argument("--stream", metavar="URL",
+                        help="Publish the first source's landmarks to remote renderers: udp://host:port "
+                             "(a .255 address broadcasts to the LAN) or ws://bind-host:port")
+    parser.add_argument("--sink-ffmpeg", metavar="ARGS",
+                        help="Pipe rendered frames to ffmpeg with these output arguments, "
+                             "e.g. '-f v4l2 /dev/video10' or '-c:v libx264 -preset ultrafast out.mp4'")
+    parser.add_argument("--sink-pipe", metavar="PATH",
+                        help="Write raw rendered frames (see the printed pixel format) to a named pipe")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="Replay speed multiplier (0 = one record per rendered frame, as fast as possible)")
+    parser.add_argument("--quality", default="auto", choices=["auto"] + [t.name for t in QUALITY_TIERS],
+                        help="Fixed quality tier, or 'auto' to adapt it to --target-ms")
+    parser.add_argument("--target-ms", type=float, default=1000.0 / 30,
+                        help="Frame-time target (p95 of render frame and inference) for --quality auto")
+    parser.add_argument("--roi", action="store_true",
+                        help="Track only the region around the previous skeleton, at higher resolution")
+    parser.add_argument("--tracker", default="holistic", choices=["holistic", "parts"],
+                        help="MediaPipe Holistic, or separate pose / hands / face solutions run at their own rates")
+    parser.add_argument("--parts", default="pose,hands,face", metavar="LIST",
+                        help="Parts tracked with --tracker parts (pose always runs), e.g. 'pose,face'")
+    parser.add_argument("--part-rates", type=part_rates, default={}, metavar="RATES",
+                        help="Per-part rates in Hz for --tracker parts (0 = every frame), "
+                             "e.g. 'pose=30,hands=15,face=10'. Default: face at 15 Hz, the rest every frame")
+    parser.add_argument("--predict", action="store_true",
+                        help="Extrapolate landmarks to the expected display time to hide capture/inference latency")
+    parser.add_argument("--display-latency-ms", type=float, default=1000.0 / 60,
+                        help="Extra time from render to photons that --predict compensates for")
+    parser.add_argument("--inference-every", type=int, default=1, metavar="N",
+                        help="Run inference at most every Nth display frame (use with --predict)")
+    parser.add_argument("--audio-offset-ms", type=float, default=0.0,
+                        help="Audio device latency not reported by the driver; increase if the mouth leads the sound")
+    parser.add_argument("--workers", type=int, default=0, metavar="N",
+                        help="Run the tracker in N worker processes fed through shared memory (0 = in-process)")
+    parser.add_argument("--profile-export", metavar="PATH",
+                        help="On exit, write per-stage timings as a Chrome trace (.json) or CSV (.csv)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    startup = Startup()
+    # Only the pygame modules the app uses (no mixer or joystick start-up)
+    pygame.display.init()
+    pygame.font.init()
     
     # Settings
     WIDTH, HEIGHT = 1280, 720
@@ -45,40 +124,154 @@ def main():
     clock = pygame.time.Clock()
 
     # --- SHOW LOADING SCREEN ---
-    draw_gradient_loading(screen, WIDTH, HEIGHT)
-    
+    loading = LoadingScreen(screen)
+    startup.mark("window", "Window", startup.origin)
+    loading.draw(startup)
     # Allow the event loop to pump once so the window appears
     pygame.event.pump()
 
-    print("Initializing Tracker... (High Accuracy Mode)")
-    tracker = HolisticTracker()
-    
-    print("Initializing Audio...")
-    audio = AudioProcessor()
-    audio.start()
-    
-    avatar = Avatar(WIDTH, HEIGHT)
-    
-    print("Opening Camera...")
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("Error: Could not open webcam.")
+    # --- BACKGROUND STARTUP ---
+    # Imports, model loading, camera negotiation and audio run on startup
+    # threads while the loading screen reports their progress
+    startup.run("modules", "Loading modules", _import_modules)
+    if not loading.wait(startup, ["modules"], status="Loading modules..."):
+        pygame.quit()
+        return
+    if startup.steps["modules"].error is not None:
+        raise startup.steps["modules"].error
+    from compositor import SceneCompositor, PreviewSurface
+    from recording import LandmarkRecorder
+    from profiler import FrameProfiler, LatencyHUD
+    from scene import parse_source, open_source, open_performers, load_tracker, tracker_workers, TRACKED_KINDS
+
+    # Per-stage timing (toggle the HUD with H); startup steps share its time origin
+    profiler = FrameProfiler(origin=startup.origin)
+    audio = None
+
+    sources = args.source + ([args.replay] if args.replay else [])
+    try:
+        specs = [parse_source(text) for text in sources or ["0"]]
+    except ValueError as e:
+        print(f"Error: {e}")
         sys.exit(1)
-    
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, WIDTH)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, HEIGHT)
+    live = any(spec.kind in TRACKED_KINDS for spec in specs)
+    replaying = any(spec.kind == "replay" for spec in specs)
+
+    start_tier = QUALITY_TIERS[tier_by_name("high" if args.quality == "auto" else args.quality)]
+    tracker_settings = dict(model_complexity=start_tier.model_complexity,
+                            refine_face_landmarks=start_tier.refine_face,
+                            roi=args.roi)
+    if args.tracker == "parts":
+        parts = ("pose",) + tuple(p.strip() for p in args.parts.split(",") if p.strip() and p.strip() != "pose")
+        unknown = set(parts) - {"pose", "hands", "face"}
+        if unknown:
+            print(f"Error: unknown tracked parts: {', '.join(sorted(unknown))}")
+            sys.exit(1)
+        tracker_settings.update(mode="parts", parts=parts, rates=args.part_rates)
+
+    workers = tracker_workers(specs, args.workers)
+    if live:
+        print(f"Initializing Tracker... (Quality: {args.quality}, starting at {start_tier.name})")
+    trackers = []
+    for i, spec in enumerate(specs):
+        startup.run(f"source{i}", _source_label(spec), open_source, spec, WIDTH, HEIGHT, args.replay_speed)
+        if spec.kind in TRACKED_KINDS and workers == 0:
+            # Model load plus one blank-frame inference, concurrent with opening the camera
+            startup.run(f"tracker{i}", "Tracker model + warm-up", load_tracker,
+                        tracker_settings, (HEIGHT, WIDTH, 3), start_tier.input_scale)
+            trackers.append(i)
+    if live:
+        print("Initializing Audio...")
+        startup.run("audio", "Audio", _start_audio, args.audio_offset_ms / 1000.0)
+    if not loading.wait(startup):
+        pygame.quit()
+        return
+
+    for step in startup.failures():
+        if step.name == "audio":
+            print(f"Warning: Audio unavailable: {step.error}")
+        else:
+            print(f"Error: {step.error}")
+            sys.exit(1)
+    if live:
+        audio = startup.result("audio")
+
+    # Each source gets its own capture and inference threads (or worker
+    # processes) and its own avatar; the loop below only renders
+    performers = open_performers(specs, WIDTH, HEIGHT, profiler, tracker_settings,
+                                 scale=start_tier.input_scale, workers=workers,
+                                 inference_interval=args.inference_every / 60.0 if args.inference_every > 1 else 0.0,
+                                 replay_speed=args.replay_speed, predict=args.predict,
+                                 sources=[startup.result(f"source{i}") for i in range(len(specs))],
+                                 trackers={i: startup.result(f"tracker{i}") for i in trackers},
+                                 renderer=args.renderer)
+    if workers > 0:
+        # Worker processes load their models in parallel, still behind the loading screen
+        for i, performer in enumerate(performers):
+            if performer.live:
+                startup.run(f"workers{i}", f"Tracker workers ({workers})", _start_workers, performer, WIDTH, HEIGHT)
+        if not loading.wait(startup):
+            for performer in performers:
+                performer.close()
+            pygame.quit()
+            return
+        for step in startup.failures():
+            if step.name.startswith("workers"):
+                print(f"Warning: {step.error}; workers will start on the first frame")
+    for performer in performers:
+        performer.pipeline.start()
+    print(startup.report())
+    startup.record(profiler)
+
+    # Adaptive quality (live tracking only)
+    quality = None
+    preview_every = 1
+    if live:
+        preview_every = start_tier.preview_every
+        if args.quality == "auto":
+            quality = QualityController(profiler, target_ms=args.target_ms, start_tier=start_tier.name,
+                                        render_scale=args.render_scale)
+
+    recorder = LandmarkRecorder(args.record) if args.record else None
+    sink = None
+    if args.sink_ffmpeg or args.sink_pipe:
+        from frame_sink import FrameSink, surface_pix_fmt
+        pix_fmt = surface_pix_fmt(screen)
+        if pix_fmt is None:
+            print("Warning: Display surface is not 32-bit RGB; frame output disabled.")
+        else:
+            try:
+                sink = FrameSink(WIDTH, HEIGHT, pix_fmt, ffmpeg_args=args.sink_ffmpeg, pipe_path=args.sink_pipe)
+                print(f"Writing {WIDTH}x{HEIGHT} {pix_fmt} frames to {args.sink_ffmpeg and 'ffmpeg' or args.sink_pipe}")
+            except OSError as e:
+                # e.g. ffmpeg not on PATH
+                print(f"Warning: Frame output unavailable: {e}")
+    publisher = None
+    if args.stream:
+        from streaming import LandmarkPublisher
+        publisher = LandmarkPublisher(args.stream)
+        print(f"Streaming landmarks to {args.stream}")
+    display_latency = args.display_latency_ms / 1000.0
+    # The camera preview and the pipeline stats line follow the first live source
+    main_performer = next((p for p in performers if p.live), performers[0])
     
     print("System Ready. Press ESC to exit.")
     
     show_camera = True
-    # Preview geometry
-    preview_w = 320
-    preview_h = 180
-    button_rect = pygame.Rect(WIDTH - 110, 10, 100, 30)
-    font_ui = pygame.font.SysFont("Arial", 16)
+    # Pre-rendered background/UI layers
+    compositor = SceneCompositor(WIDTH, HEIGHT, dirty_rects=args.dirty_rects, render_scale=args.render_scale)
+    for performer in performers:
+        performer.avatar.set_render_scale(args.render_scale)
+    preview_rect = compositor.preview_rect
+    preview = PreviewSurface(preview_rect.size)
+    button_rect = compositor.button_rect
+    hud = LatencyHUD(profiler, compositor.text)
 
+    preview_surf = None
+    frame_count = 0
     running = True
     while running:
+        render_start = time.perf_counter()
         # Event Handling
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -88,79 +281,124 @@ def main():
                     running = False
                 if event.key == pygame.K_v: # Keyboard shortcut
                     show_camera = not show_camera
+                if event.key == pygame.K_h:
+                    hud.toggle()
+                if replaying and event.key in (pygame.K_LEFT, pygame.K_RIGHT): # Seek 5 s
+                    step = 5.0 if event.key == pygame.K_RIGHT else -5.0
+                    for performer in performers:
+                        if performer.spec.kind == "replay":
+                            performer.pipeline.seek(performer.pipeline.position() + step)
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1: # Left click
                     if button_rect.collidepoint(event.pos):
                         show_camera = not show_camera
 
-        # Video Capture
-        ret, frame = cap.read()
-        if not ret:
-            print("Camera frame lost.")
-            continue
-            
-        frame = cv2.flip(frame, 1)
-        
-        # Tracking (Optimized input)
-        small_frame = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
-        results = tracker.process(small_frame)
-        data = tracker.extract_landmarks(results)
-        
-        vol = audio.get_volume()
-        
         # Render
-        screen.fill((10, 10, 15)) # Deep dark background
-        
-        # Grid floor
-        for i in range(0, WIDTH, 100):
-             pygame.draw.line(screen, (30, 30, 40), (i, HEIGHT), (WIDTH/2, HEIGHT/2 - 50), 1)
-        pygame.draw.line(screen, (0, 255, 255), (0, HEIGHT - 50), (WIDTH, HEIGHT - 50), 2)
-        
-        avatar.update_and_draw(screen, data, vol)
+        compositor.set_show_camera(show_camera)
+        canvas = compositor.begin_frame(screen)
+
+        for performer in performers:
+            # Newest tracked frame (if any). Otherwise keep drawing the last one.
+            latest = performer.poll()
+            # Predicted for when this frame reaches the screen (with --predict)
+            draw_data = performer.draw_data(display_latency)
+            # Audio from the moment the drawn pose was captured, not just the newest block
+            # (the capture time: a predicted pose is stamped with a future display time)
+            at = performer.data.timestamp if performer.data is not None else None
+            vol = performer.volume(audio, at)
+            if latest is not None and performer is performers[0] and (recorder or publisher):
+                # Capture time of this result, also for frames with no person tracked
+                data, stamp = performer.data, latest[1]
+                data_vol = performer.volume(audio, stamp)
+                if recorder is not None:
+                    recorder.write(data, data_vol, stamp)
+                if publisher is not None:
+                    publisher.publish(data, data_vol, stamp)
+            performer.avatar.update_and_draw(canvas, draw_data, vol, performer.visemes(audio, at))
+            compositor.mark(performer.avatar.dirty_rect)
+        if canvas is not screen:
+            with profiler.stage("scale"):
+                compositor.end_scene(screen)
+        frame = main_performer.frame
         
         # --- Webcam Preview (FIXED) ---
-        if show_camera:
-            # 1. Resize
-            preview_img = cv2.resize(frame, (preview_w, preview_h))
-            # 2. Convert BGR to RGB
-            preview_img = cv2.cvtColor(preview_img, cv2.COLOR_BGR2RGB)
-            # 3. Transpose (Swap axes to match Pygame's (width, height, colors))
-            # OpenCV is (Height, Width, Colors), Pygame surface expects (Width, Height, Colors)
-            preview_img = np.transpose(preview_img, (1, 0, 2))
-            # 4. Make Surface
-            preview_surf = pygame.surfarray.make_surface(preview_img)
-            
-            screen.blit(preview_surf, (WIDTH - preview_w - 10, 50))
-            
-            # Draw border around preview
-            pygame.draw.rect(screen, (0, 255, 255), (WIDTH - preview_w - 10, 50, preview_w, preview_h), 2)
-
-        # --- UI Button ---
-        # Draw Button Background
-        btn_color = (0, 200, 100) if show_camera else (200, 50, 50)
-        pygame.draw.rect(screen, btn_color, button_rect, 0, 5)
-        pygame.draw.rect(screen, (255, 255, 255), button_rect, 2, 5)
-        
-        # Draw Button Text
-        btn_txt = "Cam: ON" if show_camera else "Cam: OFF"
-        txt_surf = font_ui.render(btn_txt, True, (255, 255, 255))
-        # Center text
-        txt_rect = txt_surf.get_rect(center=button_rect.center)
-        screen.blit(txt_surf, txt_rect)
+        # Refreshed every `preview_every` frames; the last preview is reused in between
+        if show_camera and frame is not None and (preview_surf is None or frame_count % preview_every == 0):
+            preview_start = time.perf_counter()
+            preview_surf = preview.update(frame)
+            profiler.record("preview", preview_start, time.perf_counter())
+        if show_camera and preview_surf is not None:
+            compositor.mark(screen.blit(preview_surf, preview_rect))
+
+        # --- UI Button / Preview Border ---
+        compositor.draw_ui(screen)
 
         # Debug Info (FPS)
         fps = int(clock.get_fps())
-        font = pygame.font.SysFont("Arial", 18)
-        fps_text = font.render(f"FPS: {fps}", True, (100, 100, 100))
-        screen.blit(fps_text, (10, 10))
+        compositor.draw_text(screen, f"FPS: {fps}", (10, 10))
+        
+        # Pipeline Info
+        st = main_performer.pipeline.stats()
+        compositor.draw_text(screen,
+            f"Cap: {st['capture_fps']:.0f}  Inf: {st['inference_fps']:.0f} ({st['inference_ms']:.0f} ms)  "
+            f"Q: {st['frame_queue']}/{st['result_queue']}  Drop: {st['dropped_frames']}"
+            + (f"  Sources: {len(performers)}" if len(performers) > 1 else "")
+            + (f"  Out: {sink.stats()['fps']:.0f} fps, drop {sink.dropped}" if sink is not None else "")
+            + (f"  Tier: {quality.tier.name}" if quality is not None else "")
+            + (f"  Render: {compositor.render_scale:g}x" if compositor.render_scale != 1.0 else ""),
+            (10, 32))
+        
+        compositor.mark(hud.draw(screen))
+
+        if sink is not None:
+            # The finished frame, straight from the display surface
+            with profiler.stage("sink"):
+                sink.submit(screen)
+        
+        present_start = time.perf_counter()
+        compositor.present()
+        render_end = time.perf_counter()
+        profiler.record("present", present_start, render_end)
+        profiler.record("frame", render_start, render_end)
+        for performer in performers:
+            performer.pipeline.render_stats.record(render_start, render_end)
+        frame_count += 1
         
-        pygame.display.flip()
+        if quality is not None:
+            tier = quality.update(render_end)
+            if tier is not None:
+                print(f"Quality -> {tier.name} (p95 {quality.measured_ms:.1f} ms, target {quality.target_ms:.1f} ms)")
+                for performer in performers:
+                    if performer.live:
+                        performer.pipeline.apply_quality(tier)
+                preview_every = tier.preview_every
+            if quality.render_scale != compositor.render_scale:
+                print(f"Render scale -> {quality.render_scale:g}x (p95 {quality.measured_ms:.1f} ms)")
+                compositor.set_render_scale(quality.render_scale)
+                for performer in performers:
+                    performer.avatar.set_render_scale(quality.render_scale)
         clock.tick(60)
 
     # Cleanup
     print("Shutting down...")
-    cap.release()
-    audio.stop()
+    for performer in performers:
+        performer.close()
+    if args.profile_export:
+        profiler.export(args.profile_export)
+        print(f"Wrote stage timings to {args.profile_export}")
+    if sink is not None:
+        sink.close()
+        st = sink.stats()
+        print(f"Frame output: {st['written']} written, {st['dropped']} dropped"
+              + (f" (stopped: {sink.error})" if sink.error else ""))
+    if publisher is not None:
+        publisher.close()
+        print(f"Streamed {publisher.packets} packets ({publisher.bytes / max(publisher.packets, 1):.0f} bytes each)")
+    if recorder is not None:
+        recorder.close()
+        print(f"Recorded {recorder.count} frames to {args.record}")
+    if audio is not None:
+        audio.stop()
     pygame.quit()
     sys.exit()
 
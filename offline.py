@@ -0,0 +1,203 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+
+# Headless: no window, no audio device
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+class VideoFrames:
+    """Frames of a video file, readable by index range."""
+    def __init__(self, path):
+        self.path = path
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise IOError(f"Could not open video '{path}'")
+        self.count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        cap.release()
+
+    def read(self, start, stop):
+        cap = cv2.VideoCapture(self.path)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        try:
+            for _ in range(start, stop):
+                ret, frame = cap.read()
+                if not ret:
+                    return
+                yield frame
+        finally:
+            cap.release()
+
+
+class ImageDirFrames:
+    """Frames stored as image files in a directory, in name order."""
+    def __init__(self, path, fps=30.0):
+        self.path = path
+        self.files = sorted(f for f in os.listdir(path) if f.lower().endswith(IMAGE_EXTENSIONS))
+        if not self.files:
+            raise IOError(f"No image frames found in '{path}'")
+        self.count = len(self.files)
+        self.fps = fps
+
+    def read(self, start, stop):
+        for name in self.files[start:stop]:
+            frame = cv2.imread(os.path.join(self.path, name))
+            if frame is None:
+                return
+            yield frame
+
+
+def open_frames(path, fps=30.0):
+    if os.path.isdir(path):
+        return ImageDirFrames(path, fps)
+    return VideoFrames(path)
+
+
+def render_chunk(job):
+    """
+    Worker: tracks and renders frames [start, stop) into PNGs in out_dir.
+    Runs `warmup` frames before `start` through the tracker and smoother
+    without writing them, so the chunk boundary is seamless.
+    """
+    input_path, fps, start, stop, warmup, out_dir, size, scale, mirror = job
+    import pygame
+    from tracker import HolisticTracker
+    from avatar import Avatar
+    from compositor import SceneCompositor
+
+    width, height = size
+    pygame.display.init()
+    pygame.font.init()
+    pygame.display.set_mode((width, height))
+    surface = pygame.Surface((width, height)).convert()
+    background = SceneCompositor(width, height).background
+
+    tracker = HolisticTracker()
+    avatar = Avatar(width, height)
+    frames = open_frames(input_path, fps)
+    first = max(0, start - warmup)
+
+    written = 0
+    for index, frame in enumerate(frames.read(first, stop), first):
+        if mirror:
+            frame = cv2.flip(frame, 1)
+        data = tracker.extract_landmarks(tracker.process(frame, scale=scale))
+        if data is not None:
+            # Video time base, so the smoother sees the real frame spacing
+            data.retime(index / fps)
+
+        surface.blit(background, (0, 0))
+        avatar.update_and_draw(surface, data, 0.0)
+        if index < start:
+            continue
+
+        rgb = pygame.surfarray.pixels3d(surface)
+        bgr = cv2.cvtColor(np.ascontiguousarray(rgb.transpose(1, 0, 2)), cv2.COLOR_RGB2BGR)
+        del rgb  # Unlock the surface
+        cv2.imwrite(os.path.join(out_dir, f"{index:06d}.png"), bgr, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        written += 1
+
+    tracker.close()
+    pygame.quit()
+    return start, written
+
+
+def stitch_video(png_dir, output, fps, size):
+    """Encodes the numbered PNGs, in order, into one video file."""
+    fourcc = cv2.VideoWriter_fourcc(*("mp4v" if output.lower().endswith(".mp4") else "XVID"))
+    writer = cv2.VideoWriter(output, fourcc, fps, size)
+    if not writer.isOpened():
+        raise IOError(f"Could not open video writer for '{output}'")
+    try:
+        # Every rendered frame, even if a short chunk left a gap in the numbering
+        for name in sorted(f for f in os.listdir(png_dir) if f.endswith(".png")):
+            frame = cv2.imread(os.path.join(png_dir, name))
+            if frame is not None:
+                writer.write(frame)
+    finally:
+        writer.release()
+
+
+def render_offline(input_path, output, size=(1280, 720), workers=None, chunk=300, warmup=30,
+                   scale=0.5, mirror=False, fps=30.0):
+    """
+    Renders a recorded video (or directory of frames) to a video file or,
+    if `output` has no video extension, a directory of PNG frames.
+    Chunks are rendered in parallel by a process pool and written in order.
+    """
+    frames = open_frames(input_path, fps)
+    if frames.count <= 0:
+        raise IOError(f"No frames to render in '{input_path}' (empty, or the container reports no frame count)")
+    fps = frames.fps
+    to_video = os.path.splitext(output)[1].lower() in (".mp4", ".avi", ".mkv", ".mov")
+    png_dir = tempfile.mkdtemp(prefix="stickman_") if to_video else output
+    os.makedirs(png_dir, exist_ok=True)
+
+    jobs = [
+        (input_path, fps, start, min(start + chunk, frames.count), warmup, png_dir, size, scale, mirror)
+        for start in range(0, frames.count, chunk)
+    ]
+    workers = workers or os.cpu_count() or 1
+    print(f"Rendering {frames.count} frames in {len(jobs)} chunks on {workers} workers...")
+
+    t0 = time.perf_counter()
+    done = 0
+    try:
+        # Spawn: MediaPipe and SDL do not survive fork()
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(min(workers, len(jobs))) as pool:
+            for start, written in pool.imap_unordered(render_chunk, jobs):
+                done += written
+                print(f"  chunk @{start}: {written} frames ({done}/{frames.count})")
+        if done < frames.count:
+            # The container's frame count is only an estimate for some formats
+            print(f"Warning: rendered {done} of {frames.count} expected frames; "
+                  f"the input ended early or some frames could not be read")
+        if to_video:
+            stitch_video(png_dir, output, fps, size)
+    finally:
+        if to_video:
+            shutil.rmtree(png_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - t0
+    print(f"Done: {done} frames in {elapsed:.1f} s ({done / max(elapsed, 1e-6):.1f} FPS) -> {output}")
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless offline avatar renderer")
+    parser.add_argument("input", help="Video file or directory of image frames")
+    parser.add_argument("-o", "--output", required=True, help="Output video (.mp4/.avi/.mkv/.mov) or PNG directory")
+    parser.add_argument("--size", default="1280x720", help="Render size WIDTHxHEIGHT")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--chunk", type=int, default=300, help="Frames per chunk")
+    parser.add_argument("--warmup", type=int, default=30, help="Frames tracked before each chunk to settle the smoother")
+    parser.add_argument("--scale", type=float, default=0.5, help="Tracker input scale")
+    parser.add_argument("--fps", type=float, default=30.0, help="Frame rate for image directories")
+    parser.add_argument("--mirror", action="store_true", help="Mirror input like the live webcam view")
+    args = parser.parse_args(argv)
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    try:
+        render_offline(args.input, args.output, (width, height), args.workers, args.chunk,
+                       args.warmup, args.scale, args.mirror, args.fps)
+    except IOError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
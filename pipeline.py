@@ -0,0 +1,304 @@
+import threading
+import time
+import collections
+
+import cv2
+import numpy as np
+
+try:
+    from landmarks import LandmarkFrame
+    from frame_pool import BufferPool, FramePool, ObjectPool, scaled_size
+except ImportError:
+    from src.landmarks import LandmarkFrame
+    from src.frame_pool import BufferPool, FramePool, ObjectPool, scaled_size
+
+
+class LatestQueue:
+    """
+    Bounded queue where the newest item always wins.
+    When the queue is full, putting a new item drops the oldest one,
+    so consumers never work on stale frames. `on_drop` is called with each
+    dropped item so its buffers can be released.
+    """
+    def __init__(self, maxsize=1, on_drop=None):
+        self.maxsize = maxsize
+        self.on_drop = on_drop
+        self._items = collections.deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        dropped = None
+        with self._cond:
+            if len(self._items) == self.maxsize:
+                self.dropped += 1
+                dropped = self._items.popleft()
+            self._items.append(item)
+            self._cond.notify()
+        if dropped is not None and self.on_drop:
+            self.on_drop(dropped)
+
+    def get(self, timeout=None):
+        """Blocks until an item is available. Returns None on timeout."""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def get_latest(self):
+        """Non-blocking. Returns the newest item (discarding older ones) or None."""
+        with self._cond:
+            if not self._items:
+                return None
+            item = self._items.pop()
+            dropped = list(self._items)
+            self.dropped += len(dropped)
+            self._items.clear()
+        if self.on_drop:
+            for old in dropped:
+                self.on_drop(old)
+        return item
+
+    def __len__(self):
+        return len(self._items)
+
+
+class StageStats:
+    """Rolling throughput and latency for one pipeline stage."""
+    def __init__(self, window=60):
+        self._stamps = collections.deque(maxlen=window)
+        self._durations = collections.deque(maxlen=window)
+        self.count = 0
+
+    def record(self, start, end):
+        self._stamps.append(end)
+        self._durations.append(end - start)
+        self.count += 1
+
+    @property
+    def fps(self):
+        if len(self._stamps) < 2:
+            return 0.0
+        span = self._stamps[-1] - self._stamps[0]
+        if span <= 0:
+            return 0.0
+        return (len(self._stamps) - 1) / span
+
+    @property
+    def latency_ms(self):
+        if not self._durations:
+            return 0.0
+        return 1000.0 * sum(self._durations) / len(self._durations)
+
+
+class PipelineStage(threading.Thread):
+    """Base class for a worker thread that repeatedly calls step()."""
+    def __init__(self, name):
+        super().__init__(name=name, daemon=True)
+        self.stats = StageStats()
+        self._stop_event = threading.Event()
+
+    def step(self):
+        """Does one unit of work. Returns False if nothing was done."""
+        raise NotImplementedError
+
+    def run(self):
+        while not self._stop_event.is_set():
+            start = time.perf_counter()
+            if self.step():
+                self.stats.record(start, time.perf_counter())
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class CaptureStage(PipelineStage):
+    """
+    Reads and mirrors camera frames as fast as the device delivers them.
+    The camera decodes into one reused buffer and the mirror pass writes
+    into a frame from a pool of preallocated ones, so capture allocates
+    nothing per frame. Whoever ends up holding a frame releases it to `frames`.
+    """
+    def __init__(self, cap, out_queue, profiler=None, mirror=True, num_buffers=6):
+        super().__init__("capture")
+        self.cap = cap
+        self.out_queue = out_queue
+        self.profiler = profiler
+        self.mirror = mirror
+        self.frames = FramePool(num_buffers)
+        self._raw = None
+        self.seq = 0
+
+    def step(self):
+        t0 = time.perf_counter()
+        ret, raw = self.cap.read(self._raw)
+        if not ret:
+            time.sleep(0.005)
+            return False
+        self._raw = raw
+        t1 = time.perf_counter()
+        # One pass from the decode buffer into a frame downstream stages can keep
+        frame = self.frames.acquire(raw.shape)
+        if self.mirror:
+            cv2.flip(raw, 1, dst=frame)
+        else:
+            np.copyto(frame, raw)
+        if self.profiler:
+            self.profiler.record("capture", t0, t1)
+            self.profiler.record("flip", t1, time.perf_counter())
+        self.seq += 1
+        # Stamped when the camera delivered the frame
+        self.out_queue.put((self.seq, t1, frame))
+        return True
+
+
+class InferenceStage(PipelineStage):
+    """Runs the tracker on the newest captured frame."""
+    def __init__(self, tracker, in_queue, out_queue, scale=0.5, num_buffers=3, profiler=None, min_interval=0.0):
+        super().__init__("inference")
+        self.tracker = tracker
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.scale = scale
+        self.profiler = profiler
+        # Minimum time between inference runs (0 = as fast as possible)
+        self.min_interval = min_interval
+        self._last_start = 0.0
+        self._pending = None
+        # Landmark frames come back once the render loop has copied them
+        self.landmarks = ObjectPool(LandmarkFrame, num_buffers)
+        self.pool = BufferPool()
+
+    def configure(self, scale=None, **tracker_settings):
+        """Requests new settings; applied on the inference thread before the next frame."""
+        self._pending = (scale, tracker_settings)
+
+    def step(self):
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            scale, tracker_settings = pending
+            if scale is not None:
+                self.scale = scale
+            if tracker_settings:
+                self.tracker.reconfigure(**tracker_settings)
+        wait = self._last_start + self.min_interval - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        item = self.in_queue.get(timeout=0.1)
+        if item is None:
+            return False
+        seq, stamp, frame = item
+        t0 = time.perf_counter()
+        self._last_start = t0
+        if getattr(self.tracker, "wants_full_frame", False):
+            # The tracker crops the full-resolution frame itself
+            small_frame = frame
+        else:
+            size = scaled_size(frame.shape, self.scale)
+            small_frame = cv2.resize(frame, size, dst=self.pool.get("small", (size[1], size[0], 3)))
+        t1 = time.perf_counter()
+        results = self.tracker.process(small_frame, scale=self.scale if small_frame is frame else 1.0)
+        t2 = time.perf_counter()
+        out = self.landmarks.acquire()
+        data = self.tracker.extract_landmarks(results, out=out)
+        if self.profiler:
+            self.profiler.record("resize", t0, t1)
+            self.profiler.record("process", t1, t2)
+            self.profiler.record("extract", t2, time.perf_counter())
+        if data is not None:
+            data.seq = seq
+            data.retime(stamp)
+        else:
+            self.landmarks.release(out)
+        self.out_queue.put((seq, stamp, frame, data))
+        return True
+
+
+class TrackingPipeline:
+    """
+    Capture -> inference pipeline running on background threads.
+    The render loop polls latest() at display rate and always gets the
+    newest tracked frame; anything older is dropped.
+    With workers > 0, inference runs in a pool of tracker processes built
+    from `tracker_settings` instead of the in-process `tracker`.
+    """
+    def __init__(self, cap, tracker, scale=0.5, profiler=None, inference_interval=0.0,
+                 workers=0, tracker_settings=None, mirror=True):
+        self.frame_queue = LatestQueue(maxsize=1, on_drop=self._release)
+        self.result_queue = LatestQueue(maxsize=1, on_drop=self._release)
+        # Frames usually in flight: both queues, inference (or one per worker) and the render loop's preview
+        self.capture = CaptureStage(cap, self.frame_queue, profiler=profiler, mirror=mirror,
+                                    num_buffers=6 + workers)
+        if workers > 0:
+            try:
+                from tracker_pool import PoolInferenceStage
+            except ImportError:
+                from src.tracker_pool import PoolInferenceStage
+            self.inference = PoolInferenceStage(self.frame_queue, self.result_queue, workers, scale,
+                                                tracker_settings, profiler=profiler,
+                                                min_interval=inference_interval,
+                                                frames=self.capture.frames)
+        else:
+            self.inference = InferenceStage(tracker, self.frame_queue, self.result_queue, scale,
+                                            profiler=profiler, min_interval=inference_interval)
+        self.render_stats = StageStats()
+        self._render_frame = LandmarkFrame()
+        self._shown = None
+
+    def start(self):
+        self.capture.start()
+        self.inference.start()
+
+    def stop(self):
+        self.capture.stop()
+        self.inference.stop()
+        # Also called when startup was aborted before start()
+        for stage in (self.capture, self.inference):
+            if stage.ident is not None:
+                stage.join(timeout=1.0)
+        if hasattr(self.inference, "close"):
+            self.inference.close()
+
+    def apply_quality(self, tier):
+        """Applies a QualityTier's tracker settings (input scale, model, refinement)."""
+        self.inference.configure(scale=tier.input_scale, model_complexity=tier.model_complexity,
+                                 refine_face_landmarks=tier.refine_face)
+
+    def latest(self):
+        """
+        Returns (seq, capture_time, frame, data) or None if nothing new.
+        `data` is a LandmarkFrame owned by the render thread (or None if no pose).
+        `frame` stays untouched by capture until the next frame is returned.
+        """
+        item = self.result_queue.get_latest()
+        if item is None:
+            return None
+        seq, stamp, frame, data = item
+        if data is not None:
+            data = self._render_frame.copy_from(data)
+            self.inference.landmarks.release(item[3])
+        # The previous frame is no longer shown
+        if self._shown is not None:
+            self.capture.frames.release(self._shown)
+        self._shown = frame
+        return seq, stamp, frame, data
+
+    def _release(self, item):
+        """Gives the buffers of an item dropped from a queue back to their pools."""
+        self.capture.frames.release(item[2])
+        if len(item) > 3 and item[3] is not None:
+            self.inference.landmarks.release(item[3])
+
+    def stats(self):
+        """Per-stage throughput (FPS), latency (ms) and queue depth."""
+        return {
+            "capture_fps": self.capture.stats.fps,
+            "inference_fps": self.inference.stats.fps,
+            "inference_ms": self.inference.stats.latency_ms,
+            "render_fps": self.render_stats.fps,
+            "frame_queue": len(self.frame_queue),
+            "result_queue": len(self.result_queue),
+            "dropped_frames": self.frame_queue.dropped,
+        }
@@ -0,0 +1,81 @@
+import numpy as np
+
+try:
+    from landmarks import LandmarkFrame
+except ImportError:
+    from src.landmarks import LandmarkFrame
+
+
+class LandmarkPredictor:
+    """
+    Extrapolates landmarks forward in time.
+    Tracks a smoothed per-point velocity from consecutive timestamped
+    LandmarkFrames and predicts every point to the expected display time,
+    so the avatar does not trail the performer by the capture + inference
+    delay, and stays fluid between sub-rate inference results.
+    """
+    def __init__(self, velocity_alpha=0.5, max_horizon=0.1):
+        self.velocity_alpha = velocity_alpha
+        # Never extrapolate further than this (seconds); guards against stalls
+        self.max_horizon = max_horizon
+        self._last = LandmarkFrame()
+        self._prediction = LandmarkFrame()
+        self._pose_v = np.zeros_like(self._last.pose[:, :3])
+        self._hands_v = np.zeros_like(self._last.hands)
+        self._face_v = np.zeros_like(self._last.face)
+        self._has_last = False
+        self._seq = 0
+
+    @property
+    def ready(self):
+        return self._has_last
+
+    def reset(self):
+        """Forgets the tracked person (e.g. tracking lost)."""
+        self._has_last = False
+
+    def observe(self, frame):
+        """Feeds a new tracked LandmarkFrame (timestamped at capture time)."""
+        if frame is None or not frame.has_pose:
+            self.reset()
+            return
+        last = self._last
+        if self._has_last and frame.timestamp > last.timestamp:
+            dt = frame.timestamp - last.timestamp
+            self._update_velocity(self._pose_v, frame.pose[:, :3], last.pose[:, :3], dt, True)
+            for side in range(2):
+                self._update_velocity(self._hands_v[side], frame.hands[side], last.hands[side], dt,
+                                      frame.has_hands[side] and last.has_hands[side])
+            self._update_velocity(self._face_v, frame.face, last.face, dt, frame.has_face and last.has_face)
+        else:
+            self._pose_v[:] = 0.0
+            self._hands_v[:] = 0.0
+            self._face_v[:] = 0.0
+        last.copy_from(frame)
+        self._has_last = True
+
+    def _update_velocity(self, velocity, current, previous, dt, continuous):
+        if not continuous:
+            # Part just (re)appeared: no motion history yet
+            velocity[:] = 0.0
+            return
+        velocity += ((current - previous) / dt - velocity) * self.velocity_alpha
+
+    def predict(self, t):
+        """
+        Returns a LandmarkFrame predicted for time t (same clock as the
+        observed timestamps), or None before the first observation.
+        The returned frame is reused by the next call.
+        """
+        if not self._has_last:
+            return None
+        horizon = min(max(t - self._last.timestamp, 0.0), self.max_horizon)
+        out = self._prediction.copy_from(self._last)
+        out.pose[:, :3] += self._pose_v * horizon
+        out.hands += self._hands_v * horizon
+        out.face += self._face_v * horizon
+        out.timestamp = t
+        # Every prediction is a new frame as far as the smoother is concerned
+        self._seq += 1
+        out.seq = self._seq
+        return out
@@ -0,0 +1,160 @@
+import os
+import csv
+import json
+import time
+import threading
+import contextlib
+import collections
+
+import numpy as np
+import pygame
+
+
+class FrameProfiler:
+    """
+    Thread-safe per-stage timing.
+    Keeps a rolling window of durations per stage for p50/p95/p99, and a
+    bounded log of timed events that can be exported as a Chrome trace
+    (chrome://tracing, Perfetto) or CSV.
+    """
+    STAGE_ORDER = ("capture", "flip", "resize", "process", "extract",
+                   "smooth", "draw", "scale", "preview", "sink", "present", "frame")
+
+    def __init__(self, window=300, max_events=200000, origin=None):
+        self.window = window
+        self._durations = {}
+        self._events = collections.deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter() if origin is None else origin
+
+    def record(self, name, start, end):
+        """Records one timed interval (perf_counter seconds) for stage `name`."""
+        thread = threading.current_thread().name
+        with self._lock:
+            durations = self._durations.get(name)
+            if durations is None:
+                durations = self._durations[name] = collections.deque(maxlen=self.window)
+            durations.append(end - start)
+            self._events.append((name, start, end, thread))
+
+    def reset(self, names=None):
+        """Clears the rolling windows of the given stages (or all of them)."""
+        with self._lock:
+            for name in (self._durations if names is None else names):
+                if name in self._durations:
+                    self._durations[name].clear()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def percentiles(self, name, q=(50, 95, 99)):
+        """Rolling percentiles of a stage in milliseconds (zeros if never recorded)."""
+        with self._lock:
+            durations = list(self._durations.get(name, ()))
+        if not durations:
+            return tuple(0.0 for _ in q)
+        return tuple(np.percentile(np.array(durations) * 1000.0, q))
+
+    def stages(self):
+        """Recorded stage names, in pipeline order."""
+        with self._lock:
+            names = list(self._durations)
+        order = {name: i for i, name in enumerate(self.STAGE_ORDER)}
+        return sorted(names, key=lambda n: order.get(n, len(order)))
+
+    def recent(self, name, count):
+        """Last `count` durations of a stage in milliseconds."""
+        with self._lock:
+            durations = list(self._durations.get(name, ()))[-count:]
+        return [d * 1000.0 for d in durations]
+
+    def summary(self):
+        return {name: dict(zip(("p50", "p95", "p99"), self.percentiles(name))) for name in self.stages()}
+
+    # --- Export ---
+    def export(self, path):
+        """Writes the event log; format chosen by extension (.json trace or .csv)."""
+        if path.lower().endswith(".csv"):
+            self.export_csv(path)
+        else:
+            self.export_chrome_trace(path)
+
+    def export_chrome_trace(self, path):
+        with self._lock:
+            events = list(self._events)
+        pid = os.getpid()
+        trace = [{
+            "name": name,
+            "ph": "X",
+            "ts": (start - self._origin) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": pid,
+            "tid": thread,
+        } for name, start, end, thread in events]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+    def export_csv(self, path):
+        with self._lock:
+            events = list(self._events)
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["stage", "thread", "start_ms", "duration_ms"])
+            for name, start, end, thread in events:
+                writer.writerow([name, thread, f"{(start - self._origin) * 1000.0:.3f}", f"{(end - start) * 1000.0:.3f}"])
+
+
+class LatencyHUD:
+    """On-screen table of stage percentiles plus a frame-time graph."""
+    def __init__(self, profiler, text_cache, budget_ms=1000.0 / 60, history=240, refresh=0.5):
+        self.profiler = profiler
+        self.text = text_cache
+        self.budget_ms = budget_ms
+        self.history = history
+        self.refresh = refresh
+        self.visible = False
+        self._rows = []
+        self._last_refresh = 0.0
+
+    def toggle(self):
+        self.visible = not self.visible
+
+    def draw(self, surface, pos=(10, 60)):
+        """Draws the HUD and returns the screen rect it covered (or None if hidden)."""
+        if not self.visible:
+            return None
+        now = time.perf_counter()
+        # Percentiles are recomputed a couple of times a second, not every frame
+        if now - self._last_refresh > self.refresh:
+            self._rows = [
+                f"{name:<8}{p50:6.1f}{p95:7.1f}{p99:7.1f}"
+                for name in self.profiler.stages()
+                for p50, p95, p99 in (self.profiler.percentiles(name),)
+            ]
+            self._last_refresh = now
+
+        x, y = pos
+        graph_w, graph_h = self.history, 80
+        panel = pygame.Rect(x, y, max(graph_w, 230) + 12, 24 + 16 * len(self._rows) + graph_h + 12)
+        pygame.draw.rect(surface, (0, 0, 0), panel)
+        pygame.draw.rect(surface, (60, 60, 70), panel, 1)
+
+        surface.blit(self.text.render("stage      p50    p95    p99 (ms)", 14, (0, 255, 255), name="Courier New"), (x + 6, y + 4))
+        for i, row in enumerate(self._rows):
+            surface.blit(self.text.render(row, 14, (200, 200, 200), name="Courier New"), (x + 6, y + 22 + 16 * i))
+
+        # Frame-time graph, scaled so twice the budget fills the height
+        gx, gy = x + 6, panel.bottom - graph_h - 6
+        scale = graph_h / (2.0 * self.budget_ms)
+        budget_y = gy + graph_h - int(self.budget_ms * scale)
+        pygame.draw.line(surface, (0, 120, 60), (gx, budget_y), (gx + graph_w, budget_y), 1)
+        frames = self.profiler.recent("frame", graph_w)
+        if len(frames) > 1:
+            pts = [(gx + i, gy + graph_h - int(min(ms * scale, graph_h))) for i, ms in enumerate(frames)]
+            pygame.draw.lines(surface, (255, 200, 0), False, pts, 1)
+        return panel
@@ -0,0 +1,118 @@
+import time
+import collections
+
+# One rung of the quality ladder.
+# input_scale: tracker input downscale, model_complexity: MediaPipe 0-2,
+# refine_face: iris/lip refinement, preview_every: webcam preview update interval in frames
+QualityTier = collections.namedtuple("QualityTier", "name input_scale model_complexity refine_face preview_every")
+
+QUALITY_TIERS = [
+    QualityTier("ultra", 0.75, 2, True, 1),
+    QualityTier("high", 0.5, 1, True, 1),      # Original fixed settings
+    QualityTier("medium", 0.5, 1, False, 2),
+    QualityTier("low", 0.4, 0, False, 3),
+    QualityTier("minimal", 0.3, 0, False, 6),
+]
+
+
+def tier_by_name(name):
+    for index, tier in enumerate(QUALITY_TIERS):
+        if tier.name == name:
+            return index
+    raise ValueError(f"Unknown quality tier '{name}', expected one of {[t.name for t in QUALITY_TIERS]}")
+
+
+class QualityController:
+    """
+    Closed-loop quality control.
+    Watches the p95 latency of the slowest measured stage and steps down a
+    tier when it stays over the frame-time target, or up a tier when it
+    stays comfortably under it. Separate thresholds, hold times and a
+    cooldown after every change keep it from oscillating.
+
+    When the render frame is over budget and avatar drawing makes up at
+    least `draw_share` of it, the render scale is stepped down
+    `render_scales` (multiples of the base `render_scale`) instead of the
+    tracking tier. Stepping back up restores the render scale first.
+    """
+    def __init__(self, profiler, target_ms=1000.0 / 30, start_tier="high",
+                 stages=("frame", "process"), degrade_ratio=1.0, upgrade_ratio=0.6,
+                 degrade_hold=1.0, upgrade_hold=5.0, cooldown=3.0, interval=0.5,
+                 render_scale=1.0, render_scales=(1.0, 0.75, 0.5), draw_share=0.5):
+        self.profiler = profiler
+        self.target_ms = target_ms
+        self.stages = stages
+        self.degrade_ratio = degrade_ratio
+        self.upgrade_ratio = upgrade_ratio
+        self.degrade_hold = degrade_hold
+        self.upgrade_hold = upgrade_hold
+        self.cooldown = cooldown
+        self.interval = interval
+        self.index = tier_by_name(start_tier)
+        self.base_render_scale = render_scale
+        self.render_scales = render_scales
+        self.draw_share = draw_share
+        self.scale_index = 0
+        self.measured_ms = 0.0
+        self._over_since = None
+        self._under_since = None
+        self._last_change = None
+        self._last_check = 0.0
+
+    @property
+    def tier(self):
+        return QUALITY_TIERS[self.index]
+
+    @property
+    def render_scale(self):
+        return self.base_render_scale * self.render_scales[self.scale_index]
+
+    def update(self, now=None):
+        """
+        Checks the measured latency. Returns the new QualityTier if it changed, else None.
+        A render scale change is only reflected in `render_scale`.
+        """
+        now = time.perf_counter() if now is None else now
+        if self._last_change is None:
+            # Start-up counts as a change: let the first measurements settle
+            self._last_change = now
+        if now - self._last_check < self.interval:
+            return None
+        self._last_check = now
+
+        self.measured_ms = max(self.profiler.percentiles(name, (95,))[0] for name in self.stages)
+        if self.measured_ms <= 0.0 or now - self._last_change < self.cooldown:
+            return None
+
+        over = self.measured_ms > self.target_ms * self.degrade_ratio
+        under = self.measured_ms < self.target_ms * self.upgrade_ratio
+        self._over_since = (self._over_since or now) if over else None
+        self._under_since = (self._under_since or now) if under else None
+
+        tier_step = scale_step = 0
+        if over and now - self._over_since >= self.degrade_hold:
+            if self._draw_bound() and self.scale_index < len(self.render_scales) - 1:
+                scale_step = 1
+            elif self.index < len(QUALITY_TIERS) - 1:
+                tier_step = 1
+        elif under and now - self._under_since >= self.upgrade_hold:
+            if self.scale_index > 0:
+                scale_step = -1
+            elif self.index > 0:
+                tier_step = -1
+        if not (tier_step or scale_step):
+            return None
+
+        self.index += tier_step
+        self.scale_index += scale_step
+        self._last_change = now
+        self._over_since = self._under_since = None
+        # Old samples describe the previous settings
+        self.profiler.reset(tuple(self.stages) + ("draw",))
+        return self.tier if tier_step else None
+
+    def _draw_bound(self):
+        """True if the render frame is over budget mostly because of avatar drawing."""
+        frame_ms, = self.profiler.percentiles("frame", (95,))
+        draw_ms, = self.profiler.percentiles("draw", (95,))
+        return frame_ms > self.target_ms * self.degrade_ratio and draw_ms >= self.draw_share * frame_ms
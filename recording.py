@@ -0,0 +1,159 @@
+import time
+import struct
+
+import numpy as np
+
+try:
+    from landmarks import LandmarkFrame, NUM_POSE, NUM_HAND, NUM_FACE, RECORD_DTYPE, pack_frame, unpack_frame
+    from pipeline import StageStats
+except ImportError:
+    from src.landmarks import LandmarkFrame, NUM_POSE, NUM_HAND, NUM_FACE, RECORD_DTYPE, pack_frame, unpack_frame
+    from src.pipeline import StageStats
+
+# File layout: a fixed 64-byte header followed by fixed-stride records.
+MAGIC = b"STKLMK01"
+HEADER = struct.Struct("<8sHHHHII")  # magic, version, pose, hand, face points, record size, reserved
+HEADER_SIZE = 64
+VERSION = 1
+
+
+class LandmarkRecorder:
+    """Streams LandmarkFrames, timestamps and audio volume to a fixed-stride binary file."""
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "wb")
+        header = HEADER.pack(MAGIC, VERSION, NUM_POSE, NUM_HAND, NUM_FACE, RECORD_DTYPE.itemsize, 0)
+        self._file.write(header.ljust(HEADER_SIZE, b"\0"))
+        self._record = np.zeros(1, dtype=RECORD_DTYPE)
+        self._start = None
+        self.count = 0
+
+    def write(self, frame, volume=0.0, timestamp=None):
+        """
+        Appends one record. `frame` may be None (no person tracked).
+        `timestamp` is the capture time; pass it for empty frames, which
+        carry none. Timestamps are stored relative to the first record.
+        """
+        if timestamp is None:
+            timestamp = frame.timestamp if frame is not None else time.perf_counter()
+        if self._start is None:
+            self._start = timestamp
+
+        rec = self._record[0]
+        rec["seq"] = self.count
+        rec["timestamp"] = timestamp - self._start
+        rec["volume"] = volume
+        pack_frame(rec, frame)
+        self._file.write(self._record.data)
+        self.count += 1
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class LandmarkReplay:
+    """Memory-mapped, randomly seekable view of a landmark recording."""
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, n_pose, n_hand, n_face, record_size, _ = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"'{path}' is not a landmark recording")
+        if (version, n_pose, n_hand, n_face, record_size) != (VERSION, NUM_POSE, NUM_HAND, NUM_FACE, RECORD_DTYPE.itemsize):
+            raise ValueError(f"'{path}' has an incompatible record layout (version {version})")
+        self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE)
+        self.timestamps = self.records["timestamp"]
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def duration(self):
+        return float(self.timestamps[-1]) if len(self.records) else 0.0
+
+    def index_at(self, t):
+        """Index of the last record at or before time t (seconds from start)."""
+        return max(int(np.searchsorted(self.timestamps, t, side="right")) - 1, 0)
+
+    def volume(self, index):
+        return float(self.records["volume"][index])
+
+    def frame(self, index, out=None):
+        """Fills (and returns) a LandmarkFrame from record `index`, or None if no pose."""
+        frame = unpack_frame(self.records[index], out)
+        if frame is not None:
+            # Offset so the first record does not look like "no new frame" (seq 0)
+            frame.seq += 1
+        return frame
+
+
+class ReplayPlayer:
+    """
+    Plays a LandmarkReplay against the wall clock, as a drop-in for
+    TrackingPipeline in the render loop (no camera, MediaPipe or mic).
+    speed > 1 plays faster than real time; speed=None advances one
+    record per latest() call, as fast as the renderer can go.
+    """
+    def __init__(self, replay, speed=1.0, loop=True):
+        self.replay = replay
+        self.speed = speed
+        self.loop = loop
+        self.volume = 0.0
+        self.render_stats = StageStats()
+        self._frame = LandmarkFrame()
+        self._index = -1
+        self._position = 0.0
+        self._clock = None
+
+    def start(self):
+        self._clock = time.perf_counter()
+
+    def stop(self):
+        pass
+
+    def seek(self, seconds):
+        """Jumps to a position in the recording (clamped to its length)."""
+        self._position = min(max(seconds, 0.0), self.replay.duration)
+        self._clock = time.perf_counter()
+        self._index = self.replay.index_at(self._position) - 1 if self.speed is None else -1
+
+    def position(self):
+        if self.speed is None:
+            return float(self.replay.timestamps[max(self._index, 0)])
+        return self._position + (time.perf_counter() - self._clock) * self.speed
+
+    def latest(self):
+        """Returns (seq, timestamp, None, data) when a new record is due, else None."""
+        if not len(self.replay):
+            return None
+        if self.speed is None:
+            index = self._index + 1
+        else:
+            t = self.position()
+            if t > self.replay.duration and self.loop:
+                self.seek(0.0)
+                t = 0.0
+            index = self.replay.index_at(t)
+        if index >= len(self.replay):
+            if not self.loop:
+                return None
+            index = 0
+        if index == self._index:
+            return None
+        self._index = index
+        self.volume = self.replay.volume(index)
+        data = self.replay.frame(index, out=self._frame)
+        return index, float(self.replay.timestamps[index]), None, data
+
+    def stats(self):
+        return {
+            "capture_fps": 0.0,
+            "inference_fps": 0.0,
+            "inference_ms": 0.0,
+            "render_fps": self.render_stats.fps,
+            "frame_queue": 0,
+            "result_queue": 0,
+            "dropped_frames": 0,
+        }
@@ -0,0 +1,213 @@
+import collections
+
+import pygame
+import numpy as np
+
+
+def dim(color, level):
+    """Scales an RGB colour to `level` out of 255."""
+    return tuple(c * level // 255 for c in color)
+
+
+def px(size, scale):
+    """A stroke width or radius in pixels at render scale `scale` (at least 1)."""
+    return max(1, int(round(size * scale)))
+
+
+def _alpha_sprite(size):
+    surf = pygame.Surface((size, size), pygame.SRCALPHA)
+    return surf.convert_alpha() if pygame.display.get_surface() is not None else surf
+
+
+class SpriteCache:
+    """Pre-rendered joint, glow, bone glow and head sprites keyed by size and colour."""
+    def __init__(self, length_step=4, angle_step=5, max_bone_glows=256):
+        self._joints = {}
+        self._glows = {}
+        self._heads = {}
+        # Bone glows are quantized to length_step pixels and angle_step degrees
+        self.length_step = length_step
+        self.angle_step = angle_step
+        self.max_bone_glows = max_bone_glows
+        self._capsules = {}
+        self._bone_glows = collections.OrderedDict()
+
+    def joint(self, radius, color):
+        """Solid disc used for joints and rounded line caps."""
+        key = (radius, color)
+        surf = self._joints.get(key)
+        if surf is None:
+            surf = _alpha_sprite(2 * radius + 1)
+            pygame.draw.circle(surf, color, (radius, radius), radius)
+            self._joints[key] = surf
+        return surf
+
+    def glow(self, radius, color, intensity=0.6):
+        """
+        Radial falloff on black, meant to be blitted with BLEND_ADD so
+        overlapping glows brighten each other like real light.
+        """
+        key = (radius, color, intensity)
+        surf = self._glows.get(key)
+        if surf is None:
+            size = 2 * radius + 1
+            yy, xx = np.mgrid[0:size, 0:size]
+            dist = np.sqrt((xx - radius) ** 2 + (yy - radius) ** 2) / max(radius, 1)
+            falloff = np.clip(1.0 - dist, 0.0, 1.0) ** 2 * intensity
+            rgb = (falloff[..., None] * np.array(color, dtype=np.float32)).astype(np.uint8)
+            surf = pygame.Surface((size, size))
+            if pygame.display.get_surface() is not None:
+                surf = surf.convert()
+            # surfarray is indexed (x, y)
+            pygame.surfarray.blit_array(surf, rgb.transpose(1, 0, 2))
+            self._glows[key] = surf
+        return surf
+
+    def _capsule(self, length, radius, color, intensity):
+        """Horizontal glow around a segment of `length`: the same falloff as glow(), stretched."""
+        key = (length, radius, color, intensity)
+        surf = self._capsules.get(key)
+        if surf is None:
+            w, h = length + 2 * radius + 1, 2 * radius + 1
+            yy, xx = np.mgrid[0:h, 0:w].astype(np.float32)
+            along = np.clip(xx, radius, radius + length)
+            dist = np.sqrt((xx - along) ** 2 + (yy - radius) ** 2) / max(radius, 1)
+            falloff = np.clip(1.0 - dist, 0.0, 1.0) ** 2 * intensity
+            rgb = (falloff[..., None] * np.array(color, dtype=np.float32)).astype(np.uint8)
+            surf = pygame.Surface((w, h))
+            if pygame.display.get_surface() is not None:
+                surf = surf.convert()
+            pygame.surfarray.blit_array(surf, rgb.transpose(1, 0, 2))
+            self._capsules[key] = surf
+        return surf
+
+    def bone_glow(self, length, angle, radius, color, intensity=0.6):
+        """
+        Additive glow for a whole bone of `length` pixels at `angle`
+        degrees (counter-clockwise on screen), centered on the bone's
+        midpoint. Rotations are cached, least recently used first out.
+        """
+        length = int(round(length / self.length_step)) * self.length_step
+        # A capsule looks the same turned by 180 degrees
+        angle = int(round(angle / self.angle_step)) * self.angle_step % 180
+        key = (length, angle, radius, color, intensity)
+        surf = self._bone_glows.get(key)
+        if surf is None:
+            surf = pygame.transform.rotate(self._capsule(length, radius, color, intensity), angle)
+            self._bone_glows[key] = surf
+            if len(self._bone_glows) > self.max_bone_glows:
+                self._bone_glows.popitem(last=False)
+        else:
+            self._bone_glows.move_to_end(key)
+        return surf
+
+    def head(self, radius, face_color, outline_color, glow_color, ring=4, outline=3):
+        """Head disc with glow ring, dark face and outline."""
+        key = (radius, face_color, outline_color, glow_color, ring, outline)
+        surf = self._heads.get(key)
+        if surf is None:
+            c = radius + ring
+            surf = _alpha_sprite(2 * c + 1)
+            pygame.draw.circle(surf, glow_color, (c, c), radius + ring)
+            pygame.draw.circle(surf, face_color, (c, c), radius)
+            pygame.draw.circle(surf, outline_color, (c, c), radius, outline)
+            self._heads[key] = surf
+        return surf
+
+
+class PrimitiveRenderer:
+    """Draws every bone as separate pygame.draw lines and circles (reference backend)."""
+    # Render scale for the renderer's own fixed sizes (glow margins, outlines)
+    scale = 1.0
+
+    def draw_rounded_line(self, surface, start, end, color, width):
+        pygame.draw.line(surface, color, start, end, width)
+        pygame.draw.circle(surface, color, start, width // 2)
+        pygame.draw.circle(surface, color, end, width // 2)
+
+    def limbs(self, surface, chains, width, core_color, glow_color):
+        """Neon limbs: a dark glow underlay and a core line per bone."""
+        underlay = dim(glow_color, 100)
+        for chain in chains:
+            for start, end in zip(chain[:-1], chain[1:]):
+                self.draw_rounded_line(surface, start, end, underlay, width + px(6, self.scale))
+                self.draw_rounded_line(surface, start, end, core_color, width)
+
+    def lines(self, surface, chains, width, color):
+        for chain in chains:
+            for start, end in zip(chain[:-1], chain[1:]):
+                self.draw_rounded_line(surface, start, end, color, width)
+
+    def joints(self, surface, points, radius, color):
+        for pt in points:
+            pygame.draw.circle(surface, color, pt, radius)
+
+    def discs(self, surface, discs):
+        """Filled circles given as (center, radius, color), drawn in order."""
+        for center, radius, color in discs:
+            pygame.draw.circle(surface, color, center, radius)
+
+    def head(self, surface, center, radius, face_color, outline_color, glow_color):
+        pygame.draw.circle(surface, dim(glow_color, 50), center, radius + px(4, self.scale))
+        pygame.draw.circle(surface, face_color, center, radius)
+        pygame.draw.circle(surface, outline_color, center, radius, px(3, self.scale))
+
+
+class SpriteRenderer:
+    """
+    Batched backend: one pygame.draw.lines per limb chain, cached sprites
+    for caps, joints and heads blitted in bulk with Surface.blits, and one
+    pre-rendered additive glow capsule per bone.
+    """
+    def __init__(self):
+        self.sprites = SpriteCache()
+        # Render scale for the renderer's own fixed sizes (glow margins, outlines)
+        self.scale = 1.0
+
+    def limbs(self, surface, chains, width, core_color, glow_color):
+        """Neon limbs: one additive glow sprite per bone, then one polyline and rounded caps per chain."""
+        glow_radius = width // 2 + px(6, self.scale)
+        starts = np.array([p for chain in chains for p in chain[:-1]], dtype=np.float32).reshape(-1, 2)
+        ends = np.array([p for chain in chains for p in chain[1:]], dtype=np.float32).reshape(-1, 2)
+        d = ends - starts
+        lengths = np.sqrt((d * d).sum(axis=1)).tolist()
+        angles = np.degrees(np.arctan2(-d[:, 1], d[:, 0])).tolist()
+        mids = ((starts + ends) / 2).tolist()
+        bone_glow = self.sprites.bone_glow
+        blits = []
+        for length, angle, (x, y) in zip(lengths, angles, mids):
+            glow = bone_glow(length, angle, glow_radius, glow_color)
+            w, h = glow.get_size()
+            blits.append((glow, (int(x - w / 2), int(y - h / 2)), None, pygame.BLEND_ADD))
+        surface.blits(blits, doreturn=False)
+        self.lines(surface, chains, width, core_color)
+
+    def lines(self, surface, chains, width, color):
+        """Polylines with rounded caps at every vertex."""
+        for chain in chains:
+            pygame.draw.lines(surface, color, False, chain, width)
+        self.joints(surface, [p for chain in chains for p in chain], width // 2, color)
+
+    def joints(self, surface, points, radius, color):
+        sprite = self.sprites.joint(radius, color)
+        surface.blits([(sprite, (x - radius, y - radius)) for x, y in points], doreturn=False)
+
+    def discs(self, surface, discs):
+        """Filled circles given as (center, radius, color), blitted in order in one call."""
+        joint = self.sprites.joint
+        surface.blits([(joint(r, color), (x - r, y - r)) for (x, y), r, color in discs], doreturn=False)
+
+    def head(self, surface, center, radius, face_color, outline_color, glow_color):
+        halo_radius = radius + px(12, self.scale)
+        halo = self.sprites.glow(halo_radius, glow_color, intensity=0.35)
+        surface.blit(halo, (center[0] - halo_radius, center[1] - halo_radius), special_flags=pygame.BLEND_ADD)
+        ring = px(4, self.scale)
+        sprite = self.sprites.head(radius, face_color, outline_color, dim(glow_color, 50), ring, px(3, self.scale))
+        c = radius + ring
+        surface.blit(sprite, (center[0] - c, center[1] - c))
+
+
+RENDERERS = {
+    "primitives": PrimitiveRenderer,
+    "sprites": SpriteRenderer,
+}
@@ -0,0 +1,161 @@
+import os
+import json
+
+import numpy as np
+
+DEFAULT_RIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rig.json")
+
+STYLE_KINDS = ("limb", "line", "joints")
+LAYERS = ("back", "front")
+# Colour roles a style can name instead of an RGB triple (Avatar.<role>_color)
+COLOR_ROLES = ("body", "glow", "joint", "shoe")
+
+
+class GroupMeans:
+    """Means of variable-sized groups of rows, as one gather and one reduceat."""
+    def __init__(self, groups):
+        self.rows = np.array([row for group in groups for row in group], dtype=np.intp)
+        counts = np.array([len(group) for group in groups], dtype=np.intp)
+        self.starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.intp)
+        self.counts = counts[:, None].astype(np.float32)
+
+    def __call__(self, points):
+        if not len(self.rows):
+            return np.zeros((0, points.shape[1]), dtype=points.dtype)
+        return np.add.reduceat(points[self.rows], self.starts, axis=0) / self.counts
+
+
+class Rig:
+    """
+    A skeleton definition (see rig.json) compiled into index arrays.
+    The tracked points (pose joints, face groups) fix the LandmarkFrame
+    layout; the slot layout says where each point lives in the avatar's
+    smoothed array, and bones are flattened into one slot index array
+    with per-bone style ids, so gathering and drawing never walk names.
+    """
+    def __init__(self, definition):
+        self.definition = definition
+        pose, hand, face = definition["pose"], definition["hand"], definition["face"]
+
+        # --- Tracked points (LandmarkFrame layout) ---
+        self.num_pose = int(pose["points"])
+        self.num_hand = int(hand["points"])
+        self.pose_index = {name: int(i) for name, i in pose["joints"].items()}
+        self.face_groups = {name: [int(i) for i in group] for name, group in face["groups"].items()}
+        self.face_indices = tuple(i for group in self.face_groups.values() for i in group)
+        self.face_slices = {}
+        start = 0
+        for name, group in self.face_groups.items():
+            self.face_slices[name] = slice(start, start + len(group))
+            start += len(group)
+        self.num_face = len(self.face_indices)
+
+        # --- Smoothed slot layout: pose joints, derived joints, hands, face outlines, face centers ---
+        derived = pose.get("derived", {})
+        self.pose_joints = tuple(self.pose_index) + tuple(derived)
+        self.pose_src = np.array(list(self.pose_index.values()), dtype=np.intp)
+        self.derived_means = GroupMeans([[self.pose_index[j] for j in joints] for joints in derived.values()])
+        self.slices = {"pose": slice(0, len(self.pose_joints))}
+        self.slot = {name: i for i, name in enumerate(self.pose_joints)}
+        end = self.slices["pose"].stop
+        for side in ("left_hand", "right_hand"):
+            self.slices[side] = slice(end, end + self.num_hand)
+            end += self.num_hand
+        self.hand_slices = (self.slices["left_hand"], self.slices["right_hand"])
+        outline_rows = []
+        for name in face.get("outlines", ()):
+            rows = range(self.face_slices[name].start, self.face_slices[name].stop)
+            self.slices[name] = slice(end, end + len(rows))
+            outline_rows.extend(rows)
+            end += len(rows)
+        self.outline_rows = np.array(outline_rows, dtype=np.intp)
+        self.face_outline_slots = slice(end - len(outline_rows), end)
+        centers = face.get("centers", ())
+        self.center_means = GroupMeans([range(self.face_slices[n].start, self.face_slices[n].stop) for n in centers])
+        for name in centers:
+            self.slot[name] = end
+            end += 1
+        self.face_center_slots = slice(end - len(centers), end)
+        self.face_slots = slice(self.face_outline_slots.start, end)
+        self.num_slots = end
+
+        # --- Styles ---
+        self.style_names = tuple(definition["styles"])
+        self.styles = []
+        for name in self.style_names:
+            style = dict(definition["styles"][name])
+            if style["kind"] not in STYLE_KINDS:
+                raise ValueError(f"Style '{name}' has unknown kind '{style['kind']}', expected one of {STYLE_KINDS}")
+            if style.get("layer", "back") not in LAYERS:
+                raise ValueError(f"Style '{name}' has unknown layer '{style['layer']}', expected one of {LAYERS}")
+            style.setdefault("layer", "back")
+            self.styles.append(style)
+
+        # --- Bones: flat slot indices, chain starts and a style id per chain ---
+        chains, style_ids = [], []
+        for bone in definition["bones"]:
+            style_id = self.style_names.index(bone["style"])
+            if "pose" in bone:
+                chains.append([self.slot[name] for name in bone["pose"]])
+                style_ids.append(style_id)
+            else:
+                # Hand chains are defined once and used for both hands
+                for hand_slots in self.hand_slices:
+                    chains.append([hand_slots.start + int(i) for i in bone["hand"]])
+                    style_ids.append(style_id)
+        lengths = np.array([len(chain) for chain in chains], dtype=np.intp)
+        self.bone_slots = np.array([slot for chain in chains for slot in chain], dtype=np.intp)
+        self.bone_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.intp)
+        self.bone_ends = self.bone_starts + lengths
+        self.bone_style = np.array(style_ids, dtype=np.intp)
+        # Per style: its bones, and for "joints" styles the distinct slots of the bones they mark
+        self.style_bones = [np.flatnonzero(self.bone_style == i) for i in range(len(self.styles))]
+        self.style_slots = []
+        for style in self.styles:
+            slots = np.zeros(0, dtype=np.intp)
+            if style["kind"] == "joints":
+                marked = self.style_bones[self.style_names.index(style["of"])]
+                slots = np.unique(np.concatenate([self.bone_slots[self.bone_starts[b]:self.bone_ends[b]]
+                                                  for b in marked]))
+            self.style_slots.append(slots)
+
+        # --- Features and colours ---
+        self.shoe_slots = [self.slot[name] for name in definition["shoes"]["joints"]]
+        self.shoe_discs = definition["shoes"]["discs"]
+        self.head = definition["head"]
+        self.eyes = definition["eyes"]
+        self.mouth = definition["mouth"]
+        self.color_schemes = {
+            name: tuple(tuple(scheme[role]) for role in COLOR_ROLES)
+            for name, scheme in definition["color_schemes"].items()
+        }
+
+    @classmethod
+    def load(cls, path=None):
+        with open(path or DEFAULT_RIG_PATH) as f:
+            return cls(json.load(f))
+
+    def gather(self, data, raw, present):
+        """
+        Writes every point of a LandmarkFrame into its (x, y) slot in `raw`
+        and marks the tracked ones in `present`.
+        """
+        pose = self.slices["pose"]
+        direct = len(self.pose_src)
+        raw[:direct] = data.pose[self.pose_src, :2]
+        raw[direct:pose.stop] = self.derived_means(data.pose[:, :2])
+        present[:] = False
+        present[pose] = True
+        for side, slots in enumerate(self.hand_slices):
+            if data.has_hands[side]:
+                raw[slots] = data.hands[side, :, :2]
+                present[slots] = True
+        if data.has_face:
+            face = data.face[:, :2]
+            raw[self.face_outline_slots] = face[self.outline_rows]
+            raw[self.face_center_slots] = self.center_means(face)
+            present[self.face_slots] = True
+
+    def visible_bones(self, present):
+        """(num_bones,) bool: bones whose every point is tracked."""
+        return np.logical_and.reduceat(present[self.bone_slots], self.bone_starts)
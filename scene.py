@@ -0,0 +1,257 @@
+import os
+import time
+import collections
+
+import cv2
+
+try:
+    from avatar import Avatar, COLOR_SCHEMES
+    from pipeline import TrackingPipeline
+    from recording import LandmarkReplay, ReplayPlayer
+    from predictor import LandmarkPredictor
+    from audio_features import visemes_from_volume
+    from streaming import LandmarkStreamClient
+except ImportError:
+    from src.avatar import Avatar, COLOR_SCHEMES
+    from src.pipeline import TrackingPipeline
+    from src.recording import LandmarkReplay, ReplayPlayer
+    from src.predictor import LandmarkPredictor
+    from src.audio_features import visemes_from_volume
+    from src.streaming import LandmarkStreamClient
+
+REPLAY_EXTENSIONS = (".lmk",)
+STREAM_SCHEMES = ("udp://", "ws://")
+# Sources that run the tracker here (the others deliver landmarks)
+TRACKED_KINDS = ("camera", "video")
+
+# One configured input. kind: "camera" (target = device index), "video" or "replay" (target = path),
+# "stream" (target = udp:// or ws:// URL of a LandmarkPublisher).
+# x: horizontal center of the avatar (0-1 of the window), scale: avatar size relative to the window.
+SourceSpec = collections.namedtuple("SourceSpec", "kind target color x scale")
+
+
+def parse_source(text):
+    """
+    Parses a --source value: a camera index, a video file, a landmark
+    recording or a landmark stream URL, optionally followed by placement,
+    e.g. "1@x=0.25,scale=0.6,color=lime".
+    Unset placement fields are None and filled in by layout().
+    """
+    target, _, options = text.partition("@")
+    if target.isdigit():
+        kind, target = "camera", int(target)
+    elif target.lower().startswith(STREAM_SCHEMES):
+        kind = "stream"
+    elif target.lower().endswith(REPLAY_EXTENSIONS):
+        kind = "replay"
+    else:
+        kind = "video"
+    if kind in ("video", "replay") and not os.path.exists(target):
+        raise ValueError(f"Source '{target}' does not exist")
+
+    fields = {"color": None, "x": None, "scale": None}
+    for option in filter(None, options.split(",")):
+        key, _, value = option.partition("=")
+        if key not in fields:
+            raise ValueError(f"Unknown source option '{key}', expected one of {list(fields)}")
+        fields[key] = value if key == "color" else float(value)
+    if fields["color"] is not None and fields["color"] not in COLOR_SCHEMES:
+        raise ValueError(f"Unknown color scheme '{fields['color']}', expected one of {list(COLOR_SCHEMES)}")
+    return SourceSpec(kind, target, **fields)
+
+
+def layout(specs, width, height):
+    """
+    Assigns every source a colour scheme and a screen viewport (x, y, w, h).
+    By default performers stand side by side in equal columns, scaled down
+    so they fit, with their feet on the same floor line.
+    """
+    count = len(specs)
+    schemes = list(COLOR_SCHEMES)
+    placed = []
+    for i, spec in enumerate(specs):
+        scale = spec.scale if spec.scale is not None else min(1.0, 2.0 / (count + 1))
+        center = spec.x if spec.x is not None else (i + 0.5) / count
+        color = spec.color or schemes[i % len(schemes)]
+        w, h = int(width * scale), int(height * scale)
+        placed.append((color, (int(center * width - w / 2), height - h, w, h)))
+    return placed
+
+
+class VideoFileCapture:
+    """
+    cv2.VideoCapture over a file, paced to the file's frame rate and
+    looped, so a recorded performer behaves like a live camera.
+    """
+    def __init__(self, path):
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video '{path}'")
+        self.interval = 1.0 / (self.cap.get(cv2.CAP_PROP_FPS) or 30.0)
+        self._next = None
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def set(self, prop, value):
+        # Resolution requests are meant for cameras
+        return False
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def read(self, image=None):
+        now = time.perf_counter()
+        if self._next is None:
+            self._next = now
+        if self._next > now:
+            time.sleep(self._next - now)
+        # Don't try to catch up after a stall
+        self._next = max(self._next + self.interval, time.perf_counter() - self.interval)
+        ret, frame = self.cap.read(image)
+        if not ret:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read(image)
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class Performer:
+    """
+    One source and its avatar: its own capture/inference pipeline (or
+    replay), smoother state, predictor, placement and colour scheme.
+    """
+    def __init__(self, spec, pipeline, avatar, cap=None, predictor=None):
+        self.spec = spec
+        self.pipeline = pipeline
+        self.avatar = avatar
+        self.cap = cap
+        self.predictor = predictor
+        self.frame = None
+        self.data = None
+        self._visemes = visemes_from_volume(0.0)
+
+    @property
+    def live(self):
+        """True if tracked here from a camera or video (uses the microphone and quality control)."""
+        return self.spec.kind in TRACKED_KINDS
+
+    def poll(self):
+        """Takes the newest tracked frame, if any. Returns the pipeline's latest() item."""
+        latest = self.pipeline.latest()
+        if latest is not None:
+            _, _, frame, self.data = latest
+            if frame is not None:
+                self.frame = frame
+            if self.predictor is not None:
+                self.predictor.observe(self.data)
+        return latest
+
+    def draw_data(self, display_latency):
+        """The landmarks to draw this frame, predicted to display time when enabled."""
+        if self.predictor is None or self.data is None:
+            return self.data
+        # Replays are timestamped on the recording's own clock
+        now = self.pipeline.position() if self.spec.kind == "replay" else time.perf_counter()
+        return self.predictor.predict(now + display_latency)
+
+    def volume(self, audio, t=None):
+        """Audio volume, aligned to capture time t for live sources."""
+        if self.live:
+            return audio.get_volume(t) if audio is not None else 0.0
+        return self.pipeline.volume
+
+    def visemes(self, audio, t=None):
+        """Mouth-shape weights: analyzed from the microphone, or derived from a recording's volume."""
+        if self.live and audio is not None:
+            return audio.get_visemes(t)
+        return visemes_from_volume(getattr(self.pipeline, "volume", 0.0), out=self._visemes)
+
+    def close(self):
+        self.pipeline.stop()
+        if self.cap is not None:
+            self.cap.release()
+
+
+def tracker_workers(specs, workers=0):
+    """
+    Worker processes per live source. With more than one live source every
+    source gets its own tracker process (at least one worker each), so
+    inference for N performers runs on N cores instead of sharing one.
+    """
+    live = sum(spec.kind in TRACKED_KINDS for spec in specs)
+    return max(workers, 1) if live > 1 else workers
+
+
+def open_source(spec, width, height, replay_speed=1.0):
+    """
+    Opens a source's input, the slow part of starting a performer (camera
+    negotiation, file and socket setup). Returns (cap, pipeline): a capture
+    for tracked sources, a ready pipeline for replays and streams.
+    """
+    if spec.kind == "replay":
+        print(f"Replaying {spec.target}...")
+        return None, ReplayPlayer(LandmarkReplay(spec.target), speed=replay_speed or None)
+    if spec.kind == "stream":
+        print(f"Receiving {spec.target}...")
+        return None, LandmarkStreamClient(spec.target)
+    if spec.kind == "camera":
+        print(f"Opening Camera {spec.target}...")
+        cap = cv2.VideoCapture(spec.target)
+        if not cap.isOpened():
+            raise IOError(f"Could not open camera {spec.target}")
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        return cap, None
+    print(f"Opening Video {spec.target}...")
+    return VideoFileCapture(spec.target), None
+
+
+def frame_shape(cap, width, height):
+    """(h, w, 3) of the frames a capture delivers, falling back to the requested size."""
+    w, h = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    return (h, w, 3) if w > 0 and h > 0 else (height, width, 3)
+
+
+def load_tracker(tracker_settings, shape, scale):
+    """Builds an in-process tracker and warms it up on a blank frame of `shape`."""
+    from tracker import create_tracker
+    tracker = create_tracker(**tracker_settings)
+    tracker.warm_up(shape, scale)
+    return tracker
+
+
+def open_performers(specs, width, height, profiler=None, tracker_settings=None, scale=0.5,
+                    workers=0, inference_interval=0.0, replay_speed=1.0, predict=False,
+                    sources=None, trackers=None, renderer="primitives"):
+    """
+    Builds a Performer per source (see tracker_workers for how many tracker
+    processes each gets). `sources` ((cap, pipeline) per spec, from
+    open_source) and `trackers` (in-process trackers by spec index) can be
+    prepared beforehand; whatever is missing is opened here. `renderer`
+    is the avatars' render backend (see render_backend.RENDERERS).
+    """
+    workers = tracker_workers(specs, workers)
+    trackers = trackers or {}
+    performers = []
+    for i, (spec, (color, viewport)) in enumerate(zip(specs, layout(specs, width, height))):
+        avatar = Avatar(width, height, backend=renderer)
+        avatar.profiler = profiler
+        avatar.set_color_scheme(color)
+        if len(specs) > 1 or spec.x is not None or spec.scale is not None:
+            avatar.set_viewport(viewport)
+
+        cap, pipeline = sources[i] if sources is not None else open_source(spec, width, height, replay_speed)
+        if pipeline is None:
+            tracker = None
+            if workers == 0:
+                tracker = trackers.get(i) or load_tracker(tracker_settings, (height, width, 3), scale)
+            # Only the webcam view is mirrored
+            pipeline = TrackingPipeline(cap, tracker, scale=scale, profiler=profiler,
+                                        inference_interval=inference_interval, workers=workers,
+                                        tracker_settings=tracker_settings, mirror=spec.kind == "camera")
+        predictor = LandmarkPredictor() if predict else None
+        performers.append(Performer(spec, pipeline, avatar, cap, predictor))
+    return performers
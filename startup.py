@@ -0,0 +1,157 @@
+import time
+import threading
+
+import pygame
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+
+class StartupStep:
+    __slots__ = ("name", "label", "state", "start", "end", "result", "error", "finished")
+
+    def __init__(self, name, label):
+        self.name = name
+        self.label = label
+        self.state = PENDING
+        self.start = None
+        self.end = None
+        self.result = None
+        self.error = None
+        self.finished = threading.Event()
+
+    @property
+    def ms(self):
+        if self.start is None:
+            return 0.0
+        return ((self.end or time.perf_counter()) - self.start) * 1000.0
+
+
+class Startup:
+    """
+    Runs independent startup steps (imports, model load and warm-up,
+    camera negotiation, audio) on background threads so the window stays
+    responsive, and keeps a per-step timing breakdown.
+    """
+    def __init__(self, origin=None):
+        self.origin = time.perf_counter() if origin is None else origin
+        self.steps = {}
+
+    def mark(self, name, label, start, end=None):
+        """Records a step that already ran on the calling thread."""
+        step = self.steps[name] = StartupStep(name, label)
+        step.start, step.end = start, time.perf_counter() if end is None else end
+        step.state = DONE
+        step.finished.set()
+
+    def run(self, name, label, fn, *args, after=()):
+        """Starts fn(*args) on a daemon thread once the steps named in `after` have finished."""
+        step = self.steps[name] = StartupStep(name, label)
+
+        def target():
+            try:
+                for dep in after:
+                    self.steps[dep].finished.wait()
+                    if self.steps[dep].state == FAILED:
+                        raise RuntimeError(f"{self.steps[dep].label} failed")
+                step.start = time.perf_counter()
+                step.state = RUNNING
+                step.result = fn(*args)
+                step.state = DONE
+            except Exception as e:
+                step.error = e
+                step.state = FAILED
+            finally:
+                step.end = time.perf_counter()
+                step.finished.set()
+
+        threading.Thread(target=target, name=f"startup-{name}", daemon=True).start()
+        return step
+
+    def result(self, name):
+        """Waits for a step. Returns its result, or None if it failed (see .error)."""
+        step = self.steps[name]
+        step.finished.wait()
+        return step.result
+
+    def done(self, names=None):
+        return all(self.steps[name].finished.is_set() for name in (names or self.steps))
+
+    def failures(self):
+        return [step for step in self.steps.values() if step.state == FAILED]
+
+    def progress(self):
+        """Fraction of the steps that have finished."""
+        if not self.steps:
+            return 1.0
+        return sum(step.finished.is_set() for step in self.steps.values()) / len(self.steps)
+
+    def report(self):
+        """One-line breakdown, e.g. 'window 40 ms, modules 310 ms, ... ready after 1.32 s'."""
+        parts = [f"{step.label} {step.ms:.0f} ms" + (" (failed)" if step.state == FAILED else "")
+                 for step in self.steps.values()]
+        ends = [step.end for step in self.steps.values() if step.end is not None]
+        total = (max(ends) - self.origin) if ends else 0.0
+        return f"Startup: {', '.join(parts)}; ready after {total:.2f} s"
+
+    def record(self, profiler):
+        """Adds every step to a FrameProfiler as a 'startup:<name>' stage (shows up in trace exports)."""
+        for step in self.steps.values():
+            if step.start is not None and step.end is not None:
+                profiler.record(f"startup:{step.name}", step.start, step.end)
+
+
+class LoadingScreen:
+    """
+    Loading screen with live startup progress.
+    The gradient is rendered once (a one-pixel column scaled to the
+    window), so each redraw is a handful of blits.
+    """
+    def __init__(self, screen, title="Launching Gaurish Realtime Avatar..."):
+        self.screen = screen
+        width, height = screen.get_size()
+        column = pygame.Surface((1, height))
+        for y in range(height):
+            # Blue to black
+            column.set_at((0, y), (10, 10 + int(40 * (y / height)), 20 + int(60 * (y / height))))
+        self.background = pygame.transform.scale(column, (width, height)).convert()
+        # The default font needs no system font scan
+        self.title = pygame.font.Font(None, 52).render(title, True, (0, 255, 255))
+        self.font = pygame.font.Font(None, 26)
+        self.clock = pygame.time.Clock()
+
+    def draw(self, startup, status="Initializing AI Modules..."):
+        screen = self.screen
+        width, height = screen.get_size()
+        screen.blit(self.background, (0, 0))
+        screen.blit(self.title, self.title.get_rect(center=(width // 2, height // 2 - 40)))
+        text = self.font.render(status, True, (150, 150, 150))
+        screen.blit(text, text.get_rect(center=(width // 2, height // 2 + 10)))
+
+        # Progress bar
+        bar = pygame.Rect(width // 2 - 200, height // 2 + 40, 400, 6)
+        pygame.draw.rect(screen, (40, 50, 70), bar)
+        pygame.draw.rect(screen, (0, 255, 255), (bar.x, bar.y, int(bar.w * startup.progress()), bar.h))
+
+        # One line per step: state and elapsed time
+        y = bar.bottom + 20
+        for step in startup.steps.values():
+            color = {DONE: (120, 200, 140), FAILED: (255, 90, 90), RUNNING: (220, 220, 220)}.get(step.state, (110, 110, 110))
+            screen.blit(self.font.render(step.label, True, color), (bar.x, y))
+            timing = self.font.render(f"{step.state}  {step.ms:.0f} ms", True, color)
+            screen.blit(timing, timing.get_rect(topright=(bar.right, y)))
+            y += 24
+        pygame.display.flip()
+
+    def wait(self, startup, names=None, status="Initializing AI Modules...", fps=30):
+        """
+        Redraws until the given steps (or all) have finished.
+        Returns False if the window was closed or ESC was pressed meanwhile.
+        """
+        while not startup.done(names):
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                    return False
+            self.draw(startup, status)
+            self.clock.tick(fps)
+        self.draw(startup, status)
+        return True
@@ -0,0 +1,472 @@
+import time
+import base64
+import socket
+import struct
+import hashlib
+import threading
+from urllib.parse import urlsplit
+
+import numpy as np
+
+try:
+    from landmarks import LandmarkFrame, NUM_POSE, NUM_HAND, NUM_FACE
+    from pipeline import LatestQueue, StageStats
+except ImportError:
+    from src.landmarks import LandmarkFrame, NUM_POSE, NUM_HAND, NUM_FACE
+    from src.pipeline import LatestQueue, StageStats
+
+# Packet: header, then the present parts in order (pose, left hand, right hand, face).
+# Coordinates are quantized to int16 at 1/QUANT (about 0.1 px at 1280 wide). Each part
+# is either absent, absolute int16, or an int8/int16 delta against the packet `base`.
+# base = 0 marks a keyframe, which a receiver can always decode.
+MAGIC = b"SK"
+VERSION = 1
+HEADER = struct.Struct("<2sBBIIdBBB")  # magic, version, part codes, seq, base, timestamp, volume, blinks
+QUANT = 8192.0
+PART_ABSENT, PART_ABS, PART_DELTA8, PART_DELTA16 = range(4)
+PART_DTYPES = {PART_ABS: np.dtype("<i2"), PART_DELTA8: np.dtype("i1"), PART_DELTA16: np.dtype("<i2")}
+
+# Slices of the flat value vector: pose x/y/z/visibility, hands and face x/y/z
+_POSE_END = NUM_POSE * 4
+_HANDS_END = _POSE_END + 2 * NUM_HAND * 3
+PART_SLICES = (
+    slice(0, _POSE_END),
+    slice(_POSE_END, _POSE_END + NUM_HAND * 3),
+    slice(_POSE_END + NUM_HAND * 3, _HANDS_END),
+    slice(_HANDS_END, _HANDS_END + NUM_FACE * 3),
+)
+NUM_VALUES = PART_SLICES[-1].stop
+
+DEFAULT_PORT = 9870
+
+
+def _unit_byte(value):
+    return int(min(max(value, 0.0), 1.0) * 255 + 0.5)
+
+
+class LandmarkEncoder:
+    """
+    Turns LandmarkFrames into compact delta-encoded packets.
+    Sends a keyframe every `keyframe_interval` packets (or on request), so
+    receivers that lose a packet or join late recover quickly.
+    """
+    def __init__(self, keyframe_interval=30):
+        self.keyframe_interval = keyframe_interval
+        self.seq = 0
+        self._values = np.zeros(NUM_VALUES, dtype=np.float32)
+        self._q = np.zeros(NUM_VALUES, dtype=np.int32)
+        self._ref = np.zeros(NUM_VALUES, dtype=np.int32)
+        self._ref_present = [False] * 4
+        self._last_key = None
+        self._force_key = True
+
+    def request_keyframe(self):
+        self._force_key = True
+
+    def encode(self, frame, volume=0.0, timestamp=None):
+        """
+        Returns the packet (bytes) for a frame (None = no person tracked).
+        `timestamp` defaults to the frame's capture time, or now for an empty frame.
+        """
+        self.seq += 1
+        present = [False] * 4
+        blinks = (0, 0)
+        stamp = time.perf_counter()
+        if frame is not None and frame.has_pose:
+            values = self._values
+            values[PART_SLICES[0]] = frame.pose.ravel()
+            values[_POSE_END:_HANDS_END] = frame.hands.ravel()
+            values[PART_SLICES[3]] = frame.face.ravel()
+            np.clip(np.rint(values * QUANT), -32767, 32767, out=self._q, casting="unsafe")
+            present = [True, bool(frame.has_hands[0]), bool(frame.has_hands[1]), frame.has_face]
+            blinks = (_unit_byte(frame.left_blink), _unit_byte(frame.right_blink))
+            stamp = frame.timestamp or stamp
+        if timestamp is None:
+            timestamp = stamp
+
+        keyframe = self._force_key or self._last_key is None or self.seq - self._last_key >= self.keyframe_interval
+        if keyframe:
+            self._last_key = self.seq
+            self._force_key = False
+
+        codes = 0
+        chunks = []
+        for part, (sl, here) in enumerate(zip(PART_SLICES, present)):
+            if not here:
+                continue
+            current = self._q[sl]
+            code = PART_ABS
+            if not keyframe and self._ref_present[part]:
+                delta = current - self._ref[sl]
+                peak = np.abs(delta).max()
+                if peak <= 127:
+                    code, current = PART_DELTA8, delta
+                elif peak <= 32767:
+                    code, current = PART_DELTA16, delta
+            chunks.append(current.astype(PART_DTYPES[code]).tobytes())
+            codes |= code << (2 * part)
+
+        self._ref[:] = self._q
+        self._ref_present = present
+        header = HEADER.pack(MAGIC, VERSION, codes, self.seq, 0 if keyframe else self.seq - 1,
+                             timestamp, _unit_byte(volume), *blinks)
+        return header + b"".join(chunks)
+
+
+class LandmarkDecoder:
+    """
+    Decodes packets from LandmarkEncoder back into LandmarkFrames.
+    Delta packets whose base was not the last decoded packet are skipped
+    until the next keyframe.
+    """
+    def __init__(self):
+        self._ref = np.zeros(NUM_VALUES, dtype=np.int32)
+        self._ref_present = [False] * 4
+        self._ref_seq = None
+        self.skipped = 0
+
+    def decode(self, packet, out=None):
+        """
+        Returns (seq, timestamp, volume, LandmarkFrame or None), or None if
+        the packet is invalid or cannot be decoded yet. `out` is filled in place.
+        """
+        if len(packet) < HEADER.size:
+            return None
+        magic, version, codes, seq, base, timestamp, volume, left_blink, right_blink = HEADER.unpack_from(packet)
+        if magic != MAGIC or version != VERSION:
+            return None
+        if base and base != self._ref_seq:
+            self.skipped += 1
+            return None
+
+        offset = HEADER.size
+        present = [False] * 4
+        for part, sl in enumerate(PART_SLICES):
+            code = (codes >> (2 * part)) & 3
+            if code == PART_ABSENT:
+                continue
+            if code != PART_ABS and not self._ref_present[part]:
+                self.skipped += 1
+                return None
+            dtype = PART_DTYPES[code]
+            count = sl.stop - sl.start
+            chunk = np.frombuffer(packet, dtype=dtype, count=count, offset=offset)
+            offset += count * dtype.itemsize
+            if code == PART_ABS:
+                self._ref[sl] = chunk
+            else:
+                self._ref[sl] += chunk
+            present[part] = True
+        self._ref_present = present
+        self._ref_seq = seq
+
+        data = None
+        if present[0]:
+            data = LandmarkFrame() if out is None else out
+            values = self._ref / QUANT
+            data.pose[:] = values[PART_SLICES[0]].reshape(data.pose.shape)
+            data.hands[:] = values[_POSE_END:_HANDS_END].reshape(data.hands.shape)
+            data.face[:] = values[PART_SLICES[3]].reshape(data.face.shape)
+            data.has_pose = True
+            data.has_hands[:] = present[1:3]
+            data.has_face = present[3]
+            data.left_blink = left_blink / 255.0
+            data.right_blink = right_blink / 255.0
+            data.timestamp = timestamp
+            data.part_times[:] = timestamp
+            data.seq = seq
+        return seq, timestamp, volume / 255.0, data
+
+
+# --- Transports ---
+def parse_url(url, default_host="127.0.0.1"):
+    """'udp://host:port' or 'ws://host:port' -> (scheme, host, port)."""
+    parts = urlsplit(url)
+    if parts.scheme not in ("udp", "ws"):
+        raise ValueError(f"Unsupported stream URL '{url}', expected udp://host:port or ws://host:port")
+    return parts.scheme, parts.hostname or default_host, parts.port or DEFAULT_PORT
+
+
+class UDPPublisher:
+    """Sends one datagram per packet. Broadcast addresses (x.x.x.255) reach the whole LAN."""
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT):
+        self.address = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if host.endswith(".255"):
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+
+    def send(self, packet):
+        try:
+            self.sock.sendto(packet, self.address)
+        except OSError:
+            pass  # Nobody listening / network down: the stream is best effort
+
+    def close(self):
+        self.sock.close()
+
+
+_WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def _ws_accept_key(key):
+    return base64.b64encode(hashlib.sha1(key + _WS_GUID).digest())
+
+
+def _ws_frame(payload):
+    """Unmasked binary WebSocket frame (server to client)."""
+    n = len(payload)
+    if n < 126:
+        header = struct.pack("!BB", 0x82, n)
+    elif n < 65536:
+        header = struct.pack("!BBH", 0x82, 126, n)
+    else:
+        header = struct.pack("!BBQ", 0x82, 127, n)
+    return header + payload
+
+
+class WebSocketPublisher:
+    """
+    Minimal WebSocket server that pushes every packet to all connected
+    clients as a binary message. Clients that cannot keep up are dropped
+    rather than stalling the sender. `on_connect` runs for each new client.
+    """
+    def __init__(self, host="0.0.0.0", port=DEFAULT_PORT, on_connect=None):
+        self.on_connect = on_connect
+        self.server = socket.create_server((host, port), reuse_port=False)
+        self.server.settimeout(0.5)
+        self._clients = []
+        self._lock = threading.Lock()
+        self._running = True
+        self._thread = threading.Thread(target=self._accept_loop, name="ws-accept", daemon=True)
+        self._thread.start()
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                conn, _ = self.server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                conn.settimeout(2.0)
+                request = b""
+                while b"\r\n\r\n" not in request and len(request) < 8192:
+                    chunk = conn.recv(1024)
+                    if not chunk:
+                        raise OSError("closed during handshake")
+                    request += chunk
+                key = next(line.split(b":", 1)[1].strip() for line in request.split(b"\r\n")
+                           if line.lower().startswith(b"sec-websocket-key:"))
+                conn.sendall(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                             b"Connection: Upgrade\r\nSec-WebSocket-Accept: " + _ws_accept_key(key) + b"\r\n\r\n")
+                conn.setblocking(False)
+            except (OSError, StopIteration):
+                conn.close()
+                continue
+            with self._lock:
+                self._clients.append(conn)
+            if self.on_connect:
+                self.on_connect()
+
+    def send(self, packet):
+        frame = _ws_frame(packet)
+        with self._lock:
+            for conn in list(self._clients):
+                try:
+                    sent = conn.send(frame)
+                except OSError:
+                    sent = 0
+                if sent != len(frame):
+                    # Slow or gone; a partial frame would corrupt the stream
+                    self._clients.remove(conn)
+                    conn.close()
+
+    @property
+    def clients(self):
+        return len(self._clients)
+
+    def close(self):
+        self._running = False
+        self.server.close()
+        with self._lock:
+            for conn in self._clients:
+                conn.close()
+            self._clients = []
+
+
+class LandmarkPublisher:
+    """
+    Encodes frames and sends them over UDP or WebSocket (see parse_url).
+    UDP can lose packets, so it sends keyframes more often by default.
+    """
+    def __init__(self, url, keyframe_interval=None):
+        scheme, host, port = parse_url(url)
+        self.encoder = LandmarkEncoder(keyframe_interval or (15 if scheme == "udp" else 60))
+        if scheme == "udp":
+            self.transport = UDPPublisher(host, port)
+        else:
+            # New viewers need a keyframe to start decoding
+            self.transport = WebSocketPublisher(host, port, on_connect=self.encoder.request_keyframe)
+        self.packets = 0
+        self.bytes = 0
+
+    def publish(self, frame, volume=0.0, timestamp=None):
+        packet = self.encoder.encode(frame, volume, timestamp)
+        self.transport.send(packet)
+        self.packets += 1
+        self.bytes += len(packet)
+
+    def close(self):
+        self.transport.close()
+
+
+# --- Client ---
+class _WebSocketReader:
+    """Blocking reader for binary messages from a WebSocket server."""
+    def __init__(self, host, port, timeout=0.5):
+        self.sock = socket.create_connection((host, port), timeout=5.0)
+        key = base64.b64encode(np.random.bytes(16))
+        self.sock.sendall(b"GET / HTTP/1.1\r\nHost: " + f"{host}:{port}".encode() +
+                          b"\r\nUpgrade: websocket\r\nConnection: Upgrade\r\nSec-WebSocket-Version: 13\r\n"
+                          b"Sec-WebSocket-Key: " + key + b"\r\n\r\n")
+        response = b""
+        while b"\r\n\r\n" not in response:
+            chunk = self.sock.recv(1024)
+            if not chunk:
+                raise IOError("WebSocket handshake failed")
+            response += chunk
+        header, self._buffer = response.split(b"\r\n\r\n", 1)
+        if b" 101 " not in header.split(b"\r\n")[0] or _ws_accept_key(key) not in header:
+            raise IOError("WebSocket handshake rejected")
+        self.sock.settimeout(timeout)
+
+    def _fill(self, n):
+        """Buffers at least n bytes. On a timeout the bytes read so far stay buffered."""
+        while len(self._buffer) < n:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise IOError("WebSocket closed")
+            self._buffer += chunk
+
+    def recv(self):
+        """Next binary message, or None on timeout."""
+        try:
+            # Nothing is consumed until the whole frame is buffered, so a
+            # timeout mid-frame resumes at the same frame on the next call
+            self._fill(2)
+            b0, b1 = self._buffer[0], self._buffer[1]
+            n, start = b1 & 0x7F, 2
+            if n == 126:
+                self._fill(4)
+                n, start = struct.unpack_from("!H", self._buffer, 2)[0], 4
+            elif n == 127:
+                self._fill(10)
+                n, start = struct.unpack_from("!Q", self._buffer, 2)[0], 10
+            self._fill(start + n)
+        except socket.timeout:
+            return None
+        payload, self._buffer = self._buffer[start:start + n], self._buffer[start + n:]
+        if b0 & 0x0F == 0x8:
+            raise IOError("WebSocket closed")
+        return payload if b0 & 0x0F == 0x2 else None
+
+    def close(self):
+        self.sock.close()
+
+
+class LandmarkStreamClient:
+    """
+    Receives a landmark stream on a background thread.
+    Same interface as TrackingPipeline / ReplayPlayer (start, stop,
+    latest, stats, volume), so a remote performer renders like a local one.
+    Remote timestamps are mapped onto the local perf_counter clock.
+    """
+    def __init__(self, url, num_buffers=3):
+        self.scheme, self.host, self.port = parse_url(url, default_host="0.0.0.0")
+        self.decoder = LandmarkDecoder()
+        self.volume = 0.0
+        self.render_stats = StageStats()
+        self.receive_stats = StageStats()
+        self.queue = LatestQueue(maxsize=1)
+        self._buffers = [LandmarkFrame() for _ in range(num_buffers)]
+        self._next = 0
+        self._render_frame = LandmarkFrame()
+        self._clock_offset = None
+        self._running = False
+        self._thread = None
+        self._reader = None
+
+    def start(self):
+        if self.scheme == "udp":
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((self.host, self.port))
+            sock.settimeout(0.5)
+            self._reader = sock
+        else:
+            self._reader = _WebSocketReader(self.host, self.port)
+        self._running = True
+        self._thread = threading.Thread(target=self._receive_loop, name="stream-client", daemon=True)
+        self._thread.start()
+
+    def _recv(self):
+        if self.scheme == "udp":
+            try:
+                return self._reader.recv(65536)
+            except socket.timeout:
+                return None
+        return self._reader.recv()
+
+    def _receive_loop(self):
+        while self._running:
+            try:
+                packet = self._recv()
+            except (OSError, IOError):
+                break
+            if packet is None:
+                continue
+            received = time.perf_counter()
+            result = self.decoder.decode(packet, out=self._buffers[self._next])
+            if result is None:
+                continue
+            seq, stamp, volume, data = result
+            # Smallest observed offset ~ clock difference plus minimum network delay.
+            # A jump of over a second means the sender's clock restarted (e.g. a looped replay).
+            offset = received - stamp
+            if self._clock_offset is None or offset < self._clock_offset or offset - self._clock_offset > 1.0:
+                self._clock_offset = offset
+            stamp += self._clock_offset
+            if data is not None:
+                data.retime(stamp)
+                self._next = (self._next + 1) % len(self._buffers)
+            self.queue.put((seq, stamp, volume, data))
+            self.receive_stats.record(received, time.perf_counter())
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        if self._reader is not None:
+            self._reader.close()
+
+    def latest(self):
+        """Returns (seq, timestamp, None, data) for the newest received packet, or None."""
+        item = self.queue.get_latest()
+        if item is None:
+            return None
+        seq, stamp, self.volume, data = item
+        if data is not None:
+            data = self._render_frame.copy_from(data)
+        return seq, stamp, None, data
+
+    def stats(self):
+        return {
+            "capture_fps": 0.0,
+            "inference_fps": self.receive_stats.fps,
+            "inference_ms": 0.0,
+            "render_fps": self.render_stats.fps,
+            "frame_queue": 0,
+            "result_queue": len(self.queue),
+            "dropped_frames": self.queue.dropped + self.decoder.skipped,
+        }
@@ -0,0 +1,144 @@
+import socket
+
+import numpy as np
+
+try:
+    from landmarks import LandmarkFrame
+    from streaming import (LandmarkEncoder, LandmarkDecoder, HEADER, QUANT, PART_ABS, PART_DELTA8,
+                           _WebSocketReader, _ws_frame)
+except ImportError:
+    from src.landmarks import LandmarkFrame
+    from src.streaming import (LandmarkEncoder, LandmarkDecoder, HEADER, QUANT, PART_ABS, PART_DELTA8,
+                               _WebSocketReader, _ws_frame)
+
+
+def make_frame(rng, timestamp=1.0, hands=(True, False), face=True):
+    frame = LandmarkFrame()
+    frame.pose[:] = rng.uniform(-0.5, 1.5, frame.pose.shape)
+    frame.hands[:] = rng.uniform(0.0, 1.0, frame.hands.shape)
+    frame.face[:] = rng.uniform(0.0, 1.0, frame.face.shape)
+    frame.has_pose = True
+    frame.has_hands[:] = hands
+    frame.has_face = face
+    frame.left_blink, frame.right_blink = 0.2, 0.9
+    frame.timestamp = timestamp
+    return frame
+
+
+def move(frame, rng, step=0.005):
+    frame.pose += rng.uniform(-step, step, frame.pose.shape).astype(np.float32)
+    frame.hands += rng.uniform(-step, step, frame.hands.shape).astype(np.float32)
+    frame.face += rng.uniform(-step, step, frame.face.shape).astype(np.float32)
+    frame.timestamp += 1 / 30
+
+
+def part_codes(packet):
+    codes = HEADER.unpack_from(packet)[2]
+    return [(codes >> (2 * part)) & 3 for part in range(4)]
+
+
+def assert_close(decoded, frame):
+    # Rounding to the nearest step of 1/QUANT, plus float32 storage
+    bound = 0.5 / QUANT + 1e-6
+    assert np.abs(decoded.pose - frame.pose).max() <= bound
+    assert np.abs(decoded.face - frame.face).max() <= bound
+    for hand in range(2):
+        assert decoded.has_hands[hand] == frame.has_hands[hand]
+        if frame.has_hands[hand]:
+            assert np.abs(decoded.hands[hand] - frame.hands[hand]).max() <= bound
+    assert decoded.has_face == frame.has_face
+
+
+def test_keyframe_round_trip_within_quantization_error():
+    rng = np.random.default_rng(0)
+    frame = make_frame(rng, timestamp=12.25)
+    seq, timestamp, volume, decoded = LandmarkDecoder().decode(LandmarkEncoder().encode(frame, 0.5))
+    assert seq == 1 and timestamp == 12.25
+    assert abs(volume - 0.5) <= 1 / 255
+    assert decoded.has_pose and decoded.seq == 1
+    assert abs(decoded.left_blink - 0.2) <= 1 / 255 and abs(decoded.right_blink - 0.9) <= 1 / 255
+    assert_close(decoded, frame)
+
+
+def test_delta_chain_does_not_drift():
+    rng = np.random.default_rng(1)
+    encoder, decoder = LandmarkEncoder(keyframe_interval=100), LandmarkDecoder()
+    frame = make_frame(rng)
+    out = LandmarkFrame()
+    for i in range(60):
+        packet = encoder.encode(frame)
+        assert part_codes(packet)[0] == (PART_ABS if i == 0 else PART_DELTA8)
+        result = decoder.decode(packet, out=out)
+        assert result[3] is out
+        assert_close(out, frame)
+        move(frame, rng)
+    assert decoder.skipped == 0
+
+
+def test_part_appearing_mid_chain_is_sent_absolute():
+    rng = np.random.default_rng(2)
+    encoder, decoder = LandmarkEncoder(keyframe_interval=100), LandmarkDecoder()
+    frame = make_frame(rng, hands=(True, False))
+    decoder.decode(encoder.encode(frame))
+    move(frame, rng)
+    frame.has_hands[1] = True
+    packet = encoder.encode(frame)
+    assert part_codes(packet)[:3] == [PART_DELTA8, PART_DELTA8, PART_ABS]
+    assert_close(decoder.decode(packet)[3], frame)
+
+
+def test_resyncs_at_next_keyframe_after_dropped_packet():
+    rng = np.random.default_rng(3)
+    encoder, decoder = LandmarkEncoder(keyframe_interval=5), LandmarkDecoder()
+    frame = make_frame(rng)
+    decoded = []
+    for i in range(12):
+        packet = encoder.encode(frame)
+        # Packet 3 is lost; 4 and 5 are deltas against it, 6 is the next keyframe
+        if i != 2:
+            result = decoder.decode(packet)
+            decoded.append(result and result[0])
+            if result is not None:
+                assert_close(result[3], frame)
+        move(frame, rng)
+    assert decoded == [1, 2, None, None, 6, 7, 8, 9, 10, 11, 12]
+    assert decoder.skipped == 2
+
+
+def test_empty_frame_keeps_capture_timestamp():
+    seq, timestamp, volume, data = LandmarkDecoder().decode(LandmarkEncoder().encode(None, 0.0, 3.5))
+    assert (seq, timestamp, data) == (1, 3.5, None)
+
+
+class FakeSocket:
+    """Hands out the given chunks, one per recv(); None stands for a timeout."""
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    def recv(self, size):
+        chunk = self.chunks.pop(0)
+        if chunk is None:
+            raise socket.timeout()
+        return chunk
+
+
+def make_reader(chunks):
+    reader = _WebSocketReader.__new__(_WebSocketReader)
+    reader.sock = FakeSocket(chunks)
+    reader._buffer = b""
+    return reader
+
+
+def test_websocket_message_split_across_recv_calls():
+    rng = np.random.default_rng(4)
+    frame = make_frame(rng)
+    packet = LandmarkEncoder().encode(frame)
+    message = _ws_frame(packet)
+    assert len(packet) > 125  # Uses the 16-bit extended length
+    # Cut inside the extended length header and again inside the payload
+    reader = make_reader([message[:3], None, message[3:40], None, message[40:] + _ws_frame(b"next")])
+    assert reader.recv() is None
+    assert reader.recv() is None
+    assert reader.recv() == packet
+    assert reader.recv() == b"next"
+    assert_close(LandmarkDecoder().decode(packet)[3], frame)
@@ -1,139 +1,454 @@
 import mediapipe as mp
 import cv2
 import numpy as np
+import time
+
+try:
+    from landmarks import LandmarkFrame, FACE_INDICES, FACE_SLICES, PART_INDEX
+    from frame_pool import BufferPool, scaled_size
+except ImportError:
+    from src.landmarks import LandmarkFrame, FACE_INDICES, FACE_SLICES, PART_INDEX
+    from src.frame_pool import BufferPool, scaled_size
+
+FACE_IRIS_MAX = max(FACE_INDICES)
+# Face subset rows that exist without iris refinement
+FACE_NO_IRIS = np.array([row for row, i in enumerate(FACE_INDICES) if i < 468], dtype=np.intp)
+FACE_NO_IRIS_INDICES = [FACE_INDICES[row] for row in FACE_NO_IRIS]
+# (iris, eye) face slices: without refinement an iris is placed at its eye's center
+IRIS_FALLBACK = [(FACE_SLICES[name], FACE_SLICES[name[:-len("_iris")] + "_eye"])
+                 for name in FACE_SLICES if name.endswith("_iris")]
+
+
+def _fill_face(face, fl):
+    """Copies the face subset out of a MediaPipe face mesh (refined or not)."""
+    if len(fl) > FACE_IRIS_MAX:
+        face[:] = [(fl[i].x, fl[i].y, fl[i].z) for i in FACE_INDICES]
+    else:
+        # Unrefined mesh (no iris points): look straight ahead from the eye centers
+        face[FACE_NO_IRIS] = [(fl[i].x, fl[i].y, fl[i].z) for i in FACE_NO_IRIS_INDICES]
+        for iris, eye in IRIS_FALLBACK:
+            face[iris] = face[eye].mean(axis=0)
+
 
 class HolisticTracker:
-    def __init__(self, min_detection_confidence=0.5, min_tracking_confidence=0.5):
+    def __init__(self, min_detection_confidence=0.5, min_tracking_confidence=0.5,
+                 model_complexity=1, refine_face_landmarks=True,
+                 roi=False, roi_size=512, roi_padding=0.3):
         self.mp_holistic = mp.solutions.holistic
-        self.holistic = self.mp_holistic.Holistic(
-            min_detection_confidence=min_detection_confidence,
-            min_tracking_confidence=min_tracking_confidence,
-            refine_face_landmarks=True,  # CRITICAL for iris/lips
-            model_complexity=1  # Revert to 1 (Balanced) for better accuracy
+        self.min_detection_confidence = min_detection_confidence
+        self.min_tracking_confidence = min_tracking_confidence
+        self.model_complexity = model_complexity  # 1 (Balanced) for better accuracy
+        self.refine_face_landmarks = refine_face_landmarks  # CRITICAL for iris/lips
+        self.holistic = self._build()
+        self._frame = LandmarkFrame()
+        self._seq = 0
+        # Reused resize / RGB conversion outputs
+        self.pool = BufferPool()
+
+        # Region of interest from the previous frame's skeleton (normalized x0, y0, x1, y1).
+        # None means full-frame search.
+        self.roi = roi
+        self.roi_size = roi_size  # Long side of the crop fed to MediaPipe, in pixels
+        self.roi_padding = roi_padding
+        self._roi = None
+        # Maps the last processed image back to the full frame: x_full = ox + x * sx
+        self._crop = (0.0, 0.0, 1.0, 1.0)
+
+    def _build(self):
+        return self.mp_holistic.Holistic(
+            min_detection_confidence=self.min_detection_confidence,
+            min_tracking_confidence=self.min_tracking_confidence,
+            refine_face_landmarks=self.refine_face_landmarks,
+            model_complexity=self.model_complexity
         )
 
-    def process(self, frame):
+    def reconfigure(self, model_complexity=None, refine_face_landmarks=None):
+        """
+        Rebuilds the MediaPipe graph with new settings (no-op if unchanged).
+        Must be called from the thread that calls process().
+        """
+        if model_complexity is not None:
+            model_complexity = int(model_complexity)
+        changed = False
+        if model_complexity is not None and model_complexity != self.model_complexity:
+            self.model_complexity = model_complexity
+            changed = True
+        if refine_face_landmarks is not None and refine_face_landmarks != self.refine_face_landmarks:
+            self.refine_face_landmarks = refine_face_landmarks
+            changed = True
+        if changed:
+            self.holistic.close()
+            self.holistic = self._build()
+
+    def close(self):
+        self.holistic.close()
+
+    def warm_up(self, shape=(720, 1280, 3), scale=1.0):
+        """
+        Runs one inference on a blank frame the way InferenceStage would,
+        so model loading and graph start-up happen now, not on the first
+        camera frame.
+        """
+        if self.wants_full_frame:
+            self.process(np.zeros(shape, dtype=np.uint8), scale)
+        else:
+            width, height = scaled_size(shape, scale)
+            self.process(np.zeros((height, width, 3), dtype=np.uint8))
+
+    @property
+    def wants_full_frame(self):
+        """True if process() should get the full-resolution frame (it crops it itself)."""
+        return bool(self.roi)
+
+    def process(self, frame, scale=1.0):
         """
         Process a BGR frame and return the raw MediaPipe results.
+        With ROI mode on and a tracked person, only the region around the
+        previous skeleton is cropped, rescaled to roi_size and processed;
+        otherwise the whole frame is processed at `scale`.
         """
-        image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        return self._run(self.holistic, self._prepare(frame, scale))
+
+    def _run(self, graph, image_rgb):
         image_rgb.flags.writeable = False
-        results = self.holistic.process(image_rgb)
+        results = graph.process(image_rgb)
         image_rgb.flags.writeable = True
         return results
 
-    def _get_blink_ratio(self, eye_points, landmarks):
+    def _prepare(self, frame, scale):
+        """The RGB image MediaPipe sees: the ROI crop or the frame at `scale`."""
+        self._crop = (0.0, 0.0, 1.0, 1.0)
+        if self.roi and self._roi is not None:
+            h, w = frame.shape[:2]
+            x0, y0, x1, y1 = self._roi
+            px0, py0, px1, py1 = int(x0 * w), int(y0 * h), int(np.ceil(x1 * w)), int(np.ceil(y1 * h))
+            crop = frame[py0:py1, px0:px1]
+            fit = self.roi_size / max(crop.shape[:2])
+            # The ROI only changes size when it moves past its hysteresis, so the buffer is mostly reused
+            size = scaled_size(crop.shape, fit)
+            frame = cv2.resize(crop, size, dst=self.pool.get("scaled", (size[1], size[0], 3)),
+                               interpolation=cv2.INTER_AREA if fit < 1 else cv2.INTER_LINEAR)
+            self._crop = (px0 / w, py0 / h, (px1 - px0) / w, (py1 - py0) / h)
+        elif scale != 1.0:
+            size = scaled_size(frame.shape, scale)
+            frame = cv2.resize(frame, size, dst=self.pool.get("scaled", (size[1], size[0], 3)))
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self.pool.get("rgb", frame.shape))
+
+    def _uncrop(self, frame):
+        """Maps landmarks from the processed crop back to full-frame coordinates."""
+        ox, oy, sx, sy = self._crop
+        frame.pose[:, 0] = ox + frame.pose[:, 0] * sx
+        frame.pose[:, 1] = oy + frame.pose[:, 1] * sy
+        frame.pose[:, 2] *= sx
+        for points in (frame.hands, frame.face):
+            points[..., 0] = ox + points[..., 0] * sx
+            points[..., 1] = oy + points[..., 1] * sy
+            points[..., 2] *= sx
+
+    def _update_roi(self, frame):
+        """Padded bounding box of the tracked person, kept stable while they stay inside it."""
+        visible = frame.pose[frame.pose[:, 3] > 0.5, :2]
+        if not len(visible):
+            self._roi = None
+            return
+        parts = [visible]
+        parts.extend(frame.hands[side, :, :2] for side in range(2) if frame.has_hands[side])
+        lo = np.min([p.min(axis=0) for p in parts], axis=0)
+        hi = np.max([p.max(axis=0) for p in parts], axis=0)
+        pad = (hi - lo) * self.roi_padding + 0.05
+        x0, y0 = np.clip(lo - pad, 0.0, 1.0)
+        x1, y1 = np.clip(hi + pad, 0.0, 1.0)
+
+        # Moving the crop every frame unsettles MediaPipe's own tracking,
+        # so only move it when the person nears the edge or changes size a lot
+        if self._roi is not None:
+            ox0, oy0, ox1, oy1 = self._roi
+            inside = lo[0] >= ox0 and lo[1] >= oy0 and hi[0] <= ox1 and hi[1] <= oy1
+            old_area = (ox1 - ox0) * (oy1 - oy0)
+            new_area = (x1 - x0) * (y1 - y0)
+            if inside and 0.7 < new_area / max(old_area, 1e-6) < 1.3:
+                return
+        if x1 - x0 < 0.05 or y1 - y0 < 0.05:
+            self._roi = None
+            return
+        self._roi = (float(x0), float(y0), float(x1), float(y1))
+
+    def _get_blink_ratio(self, eye_points, landmarks=None):
         """Calculates Eye Aspect Ratio (EAR) to detect blinking."""
-        # Vertical distances
-        # indices: 0=left_corner, 1=top_right, 2=top_left, 3=right_corner, 4=bottom_left, 5=bottom_right
-        # mapped from the specific indices below
-        # We need to extract specific points.
-        # eye_indices layout in our extract_landmarks: 
+        # eye_points is a (6, 3) array ordered P1..P6:
+        # 0=left_corner, 1=top_right, 2=top_left, 3=right_corner, 4=bottom_left, 5=bottom_right
         # Left Eye: [33, 160, 158, 133, 153, 144] (approx)
-        # Let's use the raw points passed in.
-        
-        # P2-P6 (vertical 1)
-        p2 = np.array(eye_points[1])
-        p6 = np.array(eye_points[5])
-        # P3-P5 (vertical 2)
-        p3 = np.array(eye_points[2])
-        p5 = np.array(eye_points[4])
-        # P1-P4 (horizontal)
-        p1 = np.array(eye_points[0])
-        p4 = np.array(eye_points[3])
-
-        vertical_dist = np.linalg.norm(p2 - p6) + np.linalg.norm(p3 - p5)
-        horizontal_dist = np.linalg.norm(p1 - p4)
+        pts = eye_points[:, :2]
+        # P2-P6 and P3-P5 (vertical), P1-P4 (horizontal)
+        d = pts[[1, 2, 0]] - pts[[5, 4, 3]]
+        dist = np.sqrt((d * d).sum(axis=1))
         
+        horizontal_dist = dist[2]
         if horizontal_dist == 0: return 0.0
-        return vertical_dist / (2.0 * horizontal_dist)
+        return float((dist[0] + dist[1]) / (2.0 * horizontal_dist))
 
-    def extract_landmarks(self, results):
+    def extract_landmarks(self, results, out=None):
         """
-        Parses the MediaPipe results into a structured dictionary.
+        Parses the MediaPipe results into a LandmarkFrame, filled in place.
+        Reuses the tracker's own frame unless `out` is given.
         Returns None if no pose is detected.
         """
         if not results.pose_landmarks:
+            # Tracking lost: search the whole frame next time
+            self._roi = None
             return None
 
-        data = {
-            "pose": {},
-            "face": {},
-            "left_hand": {},
-            "right_hand": {}
-        }
+        frame = self._frame if out is None else out
+        frame.clear()
+        self._seq += 1
+        frame.seq = self._seq
+        frame.timestamp = time.perf_counter()
 
         # --- POSE ---
-        pl = results.pose_landmarks.landmark
-        mp_pose = mp.solutions.pose.PoseLandmark
-        
-        def get_lm(idx):
-            lm = pl[idx]
-            return (lm.x, lm.y, lm.z, lm.visibility)
-
-        data["pose"] = {
-            "nose": get_lm(mp_pose.NOSE),
-            "left_shoulder": get_lm(mp_pose.LEFT_SHOULDER),
-            "right_shoulder": get_lm(mp_pose.RIGHT_SHOULDER),
-            "left_elbow": get_lm(mp_pose.LEFT_ELBOW),
-            "right_elbow": get_lm(mp_pose.RIGHT_ELBOW),
-            "left_wrist": get_lm(mp_pose.LEFT_WRIST),
-            "right_wrist": get_lm(mp_pose.RIGHT_WRIST),
-            "left_hip": get_lm(mp_pose.LEFT_HIP),
-            "right_hip": get_lm(mp_pose.RIGHT_HIP),
-            "left_knee": get_lm(mp_pose.LEFT_KNEE),
-            "right_knee": get_lm(mp_pose.RIGHT_KNEE),
-            "left_ankle": get_lm(mp_pose.LEFT_ANKLE),
-            "right_ankle": get_lm(mp_pose.RIGHT_ANKLE),
-            "left_foot_index": get_lm(mp_pose.LEFT_FOOT_INDEX),
-            "right_foot_index": get_lm(mp_pose.RIGHT_FOOT_INDEX),
-            # Add neck approximation
-            "neck": tuple(np.mean([np.array(get_lm(mp_pose.LEFT_SHOULDER)), np.array(get_lm(mp_pose.RIGHT_SHOULDER))], axis=0))
-        }
+        frame.pose[:] = [(lm.x, lm.y, lm.z, lm.visibility) for lm in results.pose_landmarks.landmark]
+        frame.has_pose = True
 
         # --- HANDS ---
-        def extract_hand(hand_landmarks):
-            if not hand_landmarks:
-                return None
-            landmarks = []
-            for lm in hand_landmarks.landmark:
-                landmarks.append((lm.x, lm.y, lm.z))
-            return landmarks
-
-        data["left_hand"] = extract_hand(results.left_hand_landmarks)
-        data["right_hand"] = extract_hand(results.right_hand_landmarks)
+        for side, hand_landmarks in enumerate((results.left_hand_landmarks, results.right_hand_landmarks)):
+            if hand_landmarks:
+                frame.hands[side] = [(lm.x, lm.y, lm.z) for lm in hand_landmarks.landmark]
+                frame.has_hands[side] = True
 
         # --- FACE ---
         if results.face_landmarks:
-            fl = results.face_landmarks.landmark
-            
-            # Detailed Lip Indices (Outer and Inner for better shape)
-            # Outer: 61, 146, 91, 181, 84, 17, 314, 405, 321, 375, 291, 308, 324, 318, 402, 317, 14, 87, 178, 88, 95
-            lips_indices = [61, 146, 91, 181, 84, 17, 314, 405, 321, 375, 291, 308, 324, 318, 402, 317, 14, 87, 178, 88, 95]
-            
-            # Eye Indices (Ordered for Blink Ratio)
-            # P1, P2, P3, P4, P5, P6
-            left_eye_indices = [33, 160, 158, 133, 153, 144]
-            right_eye_indices = [362, 385, 387, 263, 373, 380]
-            
-            left_iris_indices = [468, 469, 470, 471]
-            right_iris_indices = [473, 474, 475, 476]
-            
-            def get_face_lms(indices):
-                return [(fl[i].x, fl[i].y, fl[i].z) for i in indices]
-
-            left_eye_pts = get_face_lms(left_eye_indices)
-            right_eye_pts = get_face_lms(right_eye_indices)
-
-            data["face"] = {
-                "lips": get_face_lms(lips_indices),
-                "left_eye": left_eye_pts,
-                "right_eye": right_eye_pts,
-                "left_iris": get_face_lms(left_iris_indices),
-                "right_iris": get_face_lms(right_iris_indices),
-                "jaw": [(fl[152].x, fl[152].y, fl[152].z)],
-                "left_blink": self._get_blink_ratio(left_eye_pts, fl),
-                "right_blink": self._get_blink_ratio(right_eye_pts, fl)
-            }
-        
-        return data
+            _fill_face(frame.face, results.face_landmarks.landmark)
+            frame.has_face = True
+
+        if self._crop != (0.0, 0.0, 1.0, 1.0):
+            self._uncrop(frame)
+        if self.roi:
+            self._update_roi(frame)
+
+        if frame.has_face:
+            frame.left_blink = self._get_blink_ratio(frame.face[FACE_SLICES["left_eye"]])
+            frame.right_blink = self._get_blink_ratio(frame.face[FACE_SLICES["right_eye"]])
+
+        # Every part comes from the same graph run
+        frame.part_times[:] = frame.timestamp
+        return frame
+
+
+# --- Multi-rate per-part tracking ---
+TRACKED_PARTS = ("pose", "hands", "face")
+DEFAULT_PART_RATES = {"pose": 0.0, "hands": 0.0, "face": 15.0}
+# Pose landmarks around each hand (wrist, pinky, index, thumb) and the elbows
+HAND_POSE_POINTS = ((15, 17, 19, 21), (16, 18, 20, 22))
+ELBOWS = (13, 14)
+# Pose landmarks on the head (nose, eyes, ears, mouth)
+HEAD_POSE_POINTS = slice(0, 11)
+LEFT_EAR, RIGHT_EAR = 7, 8
+
+
+class _PartGraphs:
+    """The separate MediaPipe graphs of a PartTracker; only enabled parts are built."""
+    def __init__(self, tracker):
+        confidence = dict(min_detection_confidence=tracker.min_detection_confidence,
+                          min_tracking_confidence=tracker.min_tracking_confidence)
+        self.pose = mp.solutions.pose.Pose(model_complexity=tracker.model_complexity, **confidence)
+        self.hands = []
+        if "hands" in tracker.parts:
+            # One single-hand graph per side, each following its own crop
+            self.hands = [mp.solutions.hands.Hands(max_num_hands=1, model_complexity=min(tracker.model_complexity, 1),
+                                                   **confidence) for _ in range(2)]
+        self.face = None
+        if "face" in tracker.parts:
+            self.face = mp.solutions.face_mesh.FaceMesh(max_num_faces=1,
+                                                        refine_landmarks=tracker.refine_face_landmarks, **confidence)
+
+    def close(self):
+        for graph in [self.pose, self.face] + self.hands:
+            if graph is not None:
+                graph.close()
+
+
+class PartTracker(HolisticTracker):
+    """
+    Runs separate MediaPipe pose, hands and face-mesh solutions instead of
+    Holistic, each at its own rate (Hz, 0 = every frame). Hands and face
+    are tracked in full-resolution crops placed from the latest pose, and
+    parts that are not enabled are never built or run.
+    Results are merged into one LandmarkFrame whose part_times say when
+    each part was measured; a part measured before the latest pose is
+    moved along with the joint it hangs from.
+    """
+    def __init__(self, parts=TRACKED_PARTS, rates=None, crop_size=256, **settings):
+        self.parts = tuple(parts)
+        unknown = set(self.parts) - set(TRACKED_PARTS)
+        if unknown:
+            raise ValueError(f"Unknown tracked parts: {', '.join(sorted(unknown))}")
+        self.rates = dict(DEFAULT_PART_RATES, **(rates or {}))
+        self.crop_size = crop_size  # Long side of the hand / face crops fed to MediaPipe
+        super().__init__(**settings)
+        # Latest result of every part, in full-frame coordinates
+        self._parts = LandmarkFrame()
+        self._next_run = dict.fromkeys(TRACKED_PARTS, 0.0)
+        # Pose position of each part's anchor joint (left wrist, right wrist, nose) when it was measured
+        self._anchors = np.zeros((3, 2), dtype=np.float32)
+        self._process_time = 0.0
+
+    def _build(self):
+        return _PartGraphs(self)
+
+    @property
+    def wants_full_frame(self):
+        return True
+
+    def _due(self, part, now):
+        rate = self.rates.get(part) or 0.0
+        if rate <= 0:
+            return True
+        next_run = self._next_run[part]
+        if now < next_run:
+            return False
+        # Keep to the schedule despite frame jitter, unless it fell a whole period behind
+        period = 1.0 / rate
+        self._next_run[part] = next_run + period if now - next_run < period else now + period
+        return True
+
+    def process(self, frame, scale=1.0):
+        """
+        Runs whichever parts are due on a full-resolution BGR frame and
+        returns the merged results (the tracker's own LandmarkFrame).
+        """
+        now = time.perf_counter()
+        self._process_time = now
+        parts = self._parts
+        if self._due("pose", now):
+            self._store_pose(self._run(self.holistic.pose, self._prepare(frame, scale)), now)
+        if not parts.has_pose:
+            return parts
+        if self.holistic.hands and self._due("hands", now):
+            for side in range(2):
+                self._track_hand(frame, side, now)
+        if self.holistic.face is not None and self._due("face", now):
+            self._track_face(frame, now)
+        return parts
+
+    def _store_pose(self, results, now):
+        parts = self._parts
+        if not results.pose_landmarks:
+            # Tracking lost: hands and face are placed from the pose, so they go too
+            parts.clear()
+            self._roi = None
+            return
+        ox, oy, sx, sy = self._crop
+        parts.pose[:] = [(lm.x, lm.y, lm.z, lm.visibility) for lm in results.pose_landmarks.landmark]
+        parts.pose[:, 0] = ox + parts.pose[:, 0] * sx
+        parts.pose[:, 1] = oy + parts.pose[:, 1] * sy
+        parts.pose[:, 2] *= sx
+        parts.has_pose = True
+        parts.part_times[PART_INDEX["pose"]] = now
+        if self.roi:
+            self._update_roi(parts)
+
+    def _square(self, center, side, shape):
+        """Pixel box (x0, y0, x1, y1) of a square around center, clipped to the frame, or None."""
+        h, w = shape[:2]
+        half = side * 0.5
+        x0, y0 = max(int(center[0] - half), 0), max(int(center[1] - half), 0)
+        x1, y1 = min(int(center[0] + half), w), min(int(center[1] + half), h)
+        if x1 - x0 < 16 or y1 - y0 < 16:
+            return None
+        return x0, y0, x1, y1
+
+    def _run_crop(self, graph, frame, box, name):
+        x0, y0, x1, y1 = box
+        crop = frame[y0:y1, x0:x1]
+        fit = self.crop_size / max(crop.shape[:2])
+        size = scaled_size(crop.shape, fit)
+        image = cv2.resize(crop, size, dst=self.pool.get(name, (size[1], size[0], 3)),
+                           interpolation=cv2.INTER_AREA if fit < 1 else cv2.INTER_LINEAR)
+        return self._run(graph, cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=self.pool.get(name + "_rgb", image.shape)))
+
+    def _map_crop(self, points, box, shape):
+        """Maps (N, 3) crop-normalized points in place to full-frame coordinates."""
+        h, w = shape[:2]
+        x0, y0, x1, y1 = box
+        points[:, 0] = (x0 + points[:, 0] * (x1 - x0)) / w
+        points[:, 1] = (y0 + points[:, 1] * (y1 - y0)) / h
+        points[:, 2] *= (x1 - x0) / w
+
+    def _track_hand(self, frame, side, now):
+        parts = self._parts
+        parts.has_hands[side] = False
+        points = parts.pose[list(HAND_POSE_POINTS[side])]
+        if points[0, 3] < 0.5:
+            return
+        scale = np.array(frame.shape[1::-1], dtype=np.float32)
+        pixels = points[:, :2] * scale
+        center = pixels.mean(axis=0)
+        forearm = np.linalg.norm((parts.pose[ELBOWS[side], :2] - points[0, :2]) * scale)
+        box = self._square(center, max(1.5 * forearm, 4.0 * np.abs(pixels - center).max()), frame.shape)
+        if box is None:
+            return
+        results = self._run_crop(self.holistic.hands[side], frame, box, "hand")
+        if not results.multi_hand_landmarks:
+            return
+        hand = parts.hands[side]
+        hand[:] = [(lm.x, lm.y, lm.z) for lm in results.multi_hand_landmarks[0].landmark]
+        self._map_crop(hand, box, frame.shape)
+        parts.has_hands[side] = True
+        parts.part_times[PART_INDEX["left_hand"] + side] = now
+        self._anchors[side] = points[0, :2]
+
+    def _track_face(self, frame, now):
+        parts = self._parts
+        parts.has_face = False
+        head = parts.pose[HEAD_POSE_POINTS]
+        if head[0, 3] < 0.5:
+            return
+        scale = np.array(frame.shape[1::-1], dtype=np.float32)
+        ears = np.linalg.norm((head[LEFT_EAR, :2] - head[RIGHT_EAR, :2]) * scale)
+        # The head landmarks sit around eye level; the face extends further down
+        center = head[:, :2].mean(axis=0) * scale + (0.0, 0.15 * ears)
+        box = self._square(center, 2.2 * ears, frame.shape)
+        if box is None:
+            return
+        results = self._run_crop(self.holistic.face, frame, box, "face")
+        if not results.multi_face_landmarks:
+            return
+        _fill_face(parts.face, results.multi_face_landmarks[0].landmark)
+        self._map_crop(parts.face, box, frame.shape)
+        parts.has_face = True
+        parts.part_times[PART_INDEX["face"]] = now
+        self._anchors[2] = head[0, :2]
+
+    def extract_landmarks(self, results, out=None):
+        """
+        Copies the merged part results into a LandmarkFrame (the tracker's
+        own unless `out` is given). Returns None if no pose is tracked.
+        """
+        if not results.has_pose:
+            return None
+        frame = self._frame if out is None else out
+        frame.copy_from(results)
+        self._seq += 1
+        frame.seq = self._seq
+        frame.timestamp = self._process_time
+
+        # Parts measured before the latest pose follow their anchor joint
+        pose_time = frame.part_times[PART_INDEX["pose"]]
+        for side in range(2):
+            if frame.has_hands[side] and frame.part_times[PART_INDEX["left_hand"] + side] < pose_time:
+                frame.hands[side, :, :2] += frame.pose[HAND_POSE_POINTS[side][0], :2] - self._anchors[side]
+        if frame.has_face and frame.part_times[PART_INDEX["face"]] < pose_time:
+            frame.face[:, :2] += frame.pose[0, :2] - self._anchors[2]
+
+        if frame.has_face:
+            frame.left_blink = self._get_blink_ratio(frame.face[FACE_SLICES["left_eye"]])
+            frame.right_blink = self._get_blink_ratio(frame.face[FACE_SLICES["right_eye"]])
+        return frame
+
+
+def create_tracker(mode="holistic", **settings):
+    """Builds the tracker for a tracker_settings dict: "holistic" or "parts" (PartTracker)."""
+    if mode == "parts":
+        return PartTracker(**settings)
+    if mode != "holistic":
+        raise ValueError(f"Unknown tracker mode '{mode}'")
+    return HolisticTracker(**settings)
@@ -0,0 +1,338 @@
+import time
+import queue
+import collections
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+try:
+    from landmarks import LandmarkFrame, PARTS, RECORD_DTYPE, pack_frame, unpack_frame
+    from pipeline import PipelineStage
+    from frame_pool import ObjectPool
+except ImportError:
+    from src.landmarks import LandmarkFrame, PARTS, RECORD_DTYPE, pack_frame, unpack_frame
+    from src.pipeline import PipelineStage
+    from src.frame_pool import ObjectPool
+
+# Landmark record plus how old each part was when the frame was tracked
+RESULT_DTYPE = np.dtype(RECORD_DTYPE.descr + [("part_age", "<f4", (len(PARTS),))])
+
+
+class SharedArray:
+    """A NumPy array backed by multiprocessing.shared_memory."""
+    def __init__(self, shape, dtype, name=None):
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape)) * dtype.itemsize
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _worker_main(worker_id, ring_name, result_name, frame_shape, slots, tasks, done, tracker_settings, scale):
+    """
+    Worker process: runs its own tracker on frames read straight
+    from the shared ring and writes landmark records into the shared
+    result array. Only slot indices and sequence numbers cross the queues.
+    """
+    from tracker import create_tracker
+
+    ring = SharedArray((slots,) + tuple(frame_shape), np.uint8, name=ring_name)
+    results = SharedArray((slots,), RESULT_DTYPE, name=result_name)
+    tracker = create_tracker(**tracker_settings)
+    # Load the model before reporting ready, not on the first real frame
+    tracker.process(np.zeros(frame_shape, dtype=np.uint8), scale=scale)
+    frame = LandmarkFrame()
+    done.put(("ready", worker_id, 0, 0))
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            if task[0] == "config":
+                tracker.reconfigure(**task[1])
+                continue
+            _, slot, seq, stamp, scale = task
+            data = tracker.extract_landmarks(tracker.process(ring.array[slot], scale=scale), out=frame)
+            rec = results.array[slot]
+            rec["seq"] = seq
+            rec["timestamp"] = stamp
+            pack_frame(rec, data)
+            if data is not None:
+                rec["part_age"] = data.timestamp - data.part_times
+            done.put(("done", worker_id, slot, seq))
+    finally:
+        tracker.close()
+        ring.close()
+        results.close()
+
+
+class ProcessTrackerPool:
+    """
+    Runs tracker instances (see tracker.create_tracker) in worker processes.
+    Frames are copied once into a shared-memory ring (no pickling) and
+    results come back through a shared array of fixed-layout landmark
+    records. Results are released strictly in submission order.
+    A worker that dies is restarted (up to max_restarts times in total);
+    the frames it had in flight are dropped.
+    """
+    def __init__(self, frame_shape, workers=2, slots=None, tracker_settings=None, scale=1.0, max_restarts=3):
+        self.frame_shape = tuple(frame_shape)
+        self.workers = workers
+        self.slots = slots or 2 * workers + 1
+        self.ring = SharedArray((self.slots,) + self.frame_shape, np.uint8)
+        self.results = SharedArray((self.slots,), RESULT_DTYPE)
+        self._free = list(range(self.slots))
+        self._slot_seq = {}
+        self._pending = collections.deque()   # Submitted sequence numbers, in order
+        self._completed = {}      # seq -> slot
+        self._busy = [0] * workers
+        self.dropped = 0
+        self.max_restarts = max_restarts
+        self.restarts = 0
+        # Last worker failure, e.g. "tracker worker 1 exited with code -9"
+        self.error = None
+        # Sequence numbers dropped with a dead worker, for the caller to forget
+        self.lost = []
+        self._settings = dict(tracker_settings or {})
+        self._scale = scale
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._done = self._ctx.Queue()
+        self._tasks = [None] * workers
+        self._procs = [None] * workers
+        self._worker_ready = [False] * workers
+        for worker in range(workers):
+            self._start_worker(worker)
+
+    def _start_worker(self, worker):
+        # A fresh task queue: the old one may hold work for the dead process
+        self._tasks[worker] = self._ctx.Queue()
+        self._procs[worker] = self._ctx.Process(
+            target=_worker_main, name=f"tracker-{worker}", daemon=True,
+            args=(worker, self.ring.name, self.results.name, self.frame_shape, self.slots,
+                  self._tasks[worker], self._done, self._settings, self._scale))
+        self._procs[worker].start()
+        self._worker_ready[worker] = False
+
+    def _check_workers(self):
+        """Drops the frames of workers that died and restarts them while restarts are left."""
+        for worker, proc in enumerate(self._procs):
+            if proc is None or proc.exitcode is None:
+                continue
+            lost = [slot for slot, (_, owner) in self._slot_seq.items() if owner == worker]
+            for slot in lost:
+                seq, _ = self._slot_seq.pop(slot)
+                self._pending.remove(seq)
+                self._free.append(slot)
+                self.lost.append(seq)
+            self.dropped += len(lost)
+            self._busy[worker] = 0
+            self.error = f"tracker worker {worker} exited with code {proc.exitcode}"
+            if self.restarts < self.max_restarts:
+                self.restarts += 1
+                print(f"Warning: {self.error}; restarting it")
+                self._start_worker(worker)
+            else:
+                print(f"Warning: {self.error}; restart limit reached, continuing without it")
+                self._procs[worker] = None
+                self._worker_ready[worker] = False
+        if not any(self._procs):
+            raise RuntimeError(f"Every tracker worker failed ({self.error})")
+
+    @property
+    def ready(self):
+        """True once every running worker has loaded its model."""
+        return all(ready for ready, proc in zip(self._worker_ready, self._procs) if proc is not None)
+
+    def wait_ready(self, timeout=60.0):
+        """
+        Blocks until every worker has loaded and warmed up its model.
+        Only call it before frames are submitted (it drains the result queue).
+        """
+        deadline = time.perf_counter() + timeout
+        while not self.ready and time.perf_counter() < deadline:
+            self.poll(timeout=0.05)
+        return self.ready
+
+    def submit(self, frame, seq, stamp, scale=1.0):
+        """
+        Copies a frame into a free ring slot and hands it to the least busy
+        worker. Returns False (frame dropped) if every slot is in flight.
+        """
+        if not self._free or frame.shape != self.frame_shape:
+            self.dropped += 1
+            return False
+        slot = self._free.pop()
+        np.copyto(self.ring.array[slot], frame)
+        worker = min((w for w, proc in enumerate(self._procs) if proc is not None), key=self._busy.__getitem__)
+        self._busy[worker] += 1
+        self._slot_seq[slot] = (seq, worker)
+        self._pending.append(seq)
+        self._tasks[worker].put(("track", slot, seq, stamp, scale))
+        return True
+
+    def configure(self, **tracker_settings):
+        """Sends new tracker settings (model complexity, refinement) to every worker."""
+        self._settings.update(tracker_settings)
+        for tasks in self._tasks:
+            tasks.put(("config", tracker_settings))
+
+    def poll(self, out=None, timeout=0.0):
+        """
+        Collects finished work. Returns (seq, timestamp, LandmarkFrame or None)
+        for the next result in submission order, or None if it is not ready.
+        `out` receives the landmarks.
+        """
+        block = timeout > 0
+        while True:
+            try:
+                kind, worker, slot, seq = self._done.get(timeout=timeout) if block else self._done.get_nowait()
+            except queue.Empty:
+                break
+            # Only the first message is waited for; the rest are drained
+            block = False
+            if kind == "ready":
+                self._worker_ready[worker] = True
+                continue
+            if self._slot_seq.get(slot) != (seq, worker):
+                # Sent by a worker that has since died; its slot was already reclaimed
+                continue
+            del self._slot_seq[slot]
+            self._busy[worker] -= 1
+            self._completed[seq] = slot
+        self._check_workers()
+
+        if not self._pending or self._pending[0] not in self._completed:
+            return None
+        seq = self._pending.popleft()
+        slot = self._completed.pop(seq)
+        rec = self.results.array[slot]
+        stamp = float(rec["timestamp"])
+        data = unpack_frame(rec, out)
+        if data is not None:
+            data.seq = seq
+            data.part_times[:] = stamp - rec["part_age"]
+        self._free.append(slot)
+        return seq, stamp, data
+
+    def close(self):
+        for tasks in self._tasks:
+            tasks.put(None)
+        for proc in self._procs:
+            if proc is None:
+                continue
+            proc.join(timeout=2.0)
+            if proc.is_alive():
+                proc.terminate()
+        self.ring.close()
+        self.results.close()
+
+
+class PoolInferenceStage(PipelineStage):
+    """
+    Inference stage backed by a ProcessTrackerPool.
+    Keeps one frame in flight per worker and forwards results, in capture
+    order, to the render queue. The pool is started on the first frame,
+    once the camera resolution is known. Camera frames that are not
+    forwarded are released back to `frames` (the capture FramePool).
+    """
+    def __init__(self, in_queue, out_queue, workers=2, scale=0.5, tracker_settings=None,
+                 num_buffers=3, profiler=None, min_interval=0.0, frames=None):
+        super().__init__("inference")
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.workers = workers
+        self.scale = scale
+        self.tracker_settings = dict(tracker_settings or {})
+        self.profiler = profiler
+        self.error = None
+        # Minimum time between submitted frames (throttles inference below the camera rate)
+        self.min_interval = min_interval
+        self._last_submit = 0.0
+        self.pool = None
+        self._in_flight = {}  # seq -> (camera frame, submit time)
+        self.frames = frames
+        # Landmark frames come back once the render loop has copied them
+        self.landmarks = ObjectPool(LandmarkFrame, num_buffers)
+
+    def configure(self, scale=None, **tracker_settings):
+        """Requests new settings; the pool forwards tracker settings to every worker."""
+        if scale is not None:
+            self.scale = scale
+        if tracker_settings:
+            self.tracker_settings.update(tracker_settings)
+            if self.pool is not None:
+                self.pool.configure(**tracker_settings)
+
+    def start_pool(self, frame_shape):
+        """Starts the worker pool for frames of `frame_shape` (otherwise done on the first frame)."""
+        self.pool = ProcessTrackerPool(frame_shape, self.workers, tracker_settings=self.tracker_settings,
+                                       scale=self.scale)
+        return self.pool
+
+    def step(self):
+        item = None
+        due = time.perf_counter() >= self._last_submit + self.min_interval
+        if len(self._in_flight) < self.workers and due:
+            item = self.in_queue.get(timeout=0.005 if self._in_flight else 0.1)
+        if item is not None:
+            seq, stamp, frame = item
+            if self.pool is not None and self.pool.frame_shape != frame.shape and not self._in_flight:
+                # The camera delivered another size than the pool was started for
+                self.close()
+            if self.pool is None:
+                self.start_pool(frame.shape)
+            if self.pool.submit(frame, seq, stamp, self.scale):
+                self._last_submit = time.perf_counter()
+                self._in_flight[seq] = (frame, self._last_submit)
+            else:
+                self._release_frame(frame)
+        if self.pool is None:
+            return False
+
+        produced = False
+        while True:
+            out = self.landmarks.acquire()
+            try:
+                result = self.pool.poll(out=out, timeout=0.0 if produced or item else 0.005)
+            except RuntimeError as e:
+                print(f"Error: {e}; tracking stopped")
+                self.error = e
+                self.stop()
+                return produced
+            for seq in self.pool.lost:
+                lost = self._in_flight.pop(seq, None)
+                if lost is not None:
+                    self._release_frame(lost[0])
+            self.pool.lost.clear()
+            if result is None or result[2] is None:
+                self.landmarks.release(out)
+            if result is None:
+                return produced
+            seq, stamp, data = result
+            frame, submitted = self._in_flight.pop(seq)
+            if self.profiler:
+                # Round trip through the pool: queueing, copy and inference
+                self.profiler.record("process", submitted, time.perf_counter())
+            self.out_queue.put((seq, stamp, frame, data))
+            produced = True
+
+    def _release_frame(self, frame):
+        if self.frames is not None:
+            self.frames.release(frame)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
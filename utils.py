@@ -31,3 +31,122 @@ class EMASmoother:
         smoothed = self.state[key] * (1 - self.alpha) + target * self.alpha
         self.state[key] = smoothed
         return smoothed
+
+class BatchSmoother:
+    """
+    Vectorized smoother for a fixed set of points.
+    All state lives in contiguous (N, D) arrays and every point is updated
+    in a single call.
+
+    Modes:
+      "ema"      - fixed-alpha exponential moving average.
+      "one_euro" - speed-adaptive low-pass (One Euro filter): little jitter
+                   at rest, little lag in fast motion.
+      "kalman"   - constant-velocity Kalman filter per coordinate.
+    """
+    MODES = ("ema", "one_euro", "kalman")
+
+    def __init__(self, num_points, dims=2, mode="one_euro", alpha=0.6,
+                 min_cutoff=1.0, beta=20.0, d_cutoff=1.0,
+                 process_noise=50.0, measurement_noise=1e-5):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown smoothing mode '{mode}', expected one of {self.MODES}")
+        self.mode = mode
+        self.alpha = alpha
+        # One Euro parameters (cutoffs in Hz, beta scales speed in normalized units/s)
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        # Kalman parameters (acceleration noise and measurement variance)
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+
+        shape = (num_points, dims)
+        self.value = np.zeros(shape, dtype=np.float32)
+        self.velocity = np.zeros(shape, dtype=np.float32)
+        self.p00 = np.zeros(shape, dtype=np.float32)
+        self.p01 = np.zeros(shape, dtype=np.float32)
+        self.p11 = np.zeros(shape, dtype=np.float32)
+        self.initialized = np.zeros(num_points, dtype=bool)
+        self.last_time = None
+
+    def reset(self, mask=None):
+        """Forgets the state of all points (or of the points selected by mask)."""
+        if mask is None:
+            self.initialized[:] = False
+        else:
+            self.initialized[mask] = False
+
+    def update(self, values, timestamp, mask=None):
+        """
+        Smooths a new (N, D) measurement taken at `timestamp` (seconds).
+        `mask` is an optional (N,) bool array of points present this frame;
+        absent points keep their last value and restart from scratch when
+        they come back.
+        Returns the smoothed (N, D) array (a view of internal state).
+        """
+        values = np.asarray(values, dtype=np.float32)
+        present = np.ones(len(self.value), dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+
+        dt = 1.0 / 30.0 if self.last_time is None else max(timestamp - self.last_time, 1e-4)
+        self.last_time = timestamp
+
+        live = present & self.initialized
+        # Points appearing this frame start exactly at the measurement
+        fresh = present & ~self.initialized
+        if fresh.any():
+            self.value[fresh] = values[fresh]
+            self.velocity[fresh] = 0.0
+            self.p00[fresh] = self.measurement_noise
+            self.p01[fresh] = 0.0
+            self.p11[fresh] = 1.0
+        self.initialized[:] = present
+
+        if live.any():
+            if self.mode == "ema":
+                self._update_ema(values, live)
+            elif self.mode == "one_euro":
+                self._update_one_euro(values, live, dt)
+            else:
+                self._update_kalman(values, live, dt)
+        return self.value
+
+    @staticmethod
+    def _smoothing_factor(cutoff, dt):
+        tau = 1.0 / (2.0 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def _update_ema(self, values, live):
+        x = self.value[live]
+        self.value[live] = x + (values[live] - x) * self.alpha
+
+    def _update_one_euro(self, values, live, dt):
+        x = self.value[live]
+        target = values[live]
+        # Filtered speed drives the cutoff of the position filter
+        a_d = self._smoothing_factor(self.d_cutoff, dt)
+        dx = self.velocity[live]
+        dx += ((target - x) / dt - dx) * a_d
+        speed = np.sqrt((dx * dx).sum(axis=1, keepdims=True))
+        a = self._smoothing_factor(self.min_cutoff + self.beta * speed, dt)
+        self.velocity[live] = dx
+        self.value[live] = x + (target - x) * a
+
+    def _update_kalman(self, values, live, dt):
+        x, v = self.value[live], self.velocity[live]
+        p00, p01, p11 = self.p00[live], self.p01[live], self.p11[live]
+        q = self.process_noise
+        # Predict (constant velocity, white-noise acceleration)
+        x = x + v * dt
+        p00 = p00 + dt * (2.0 * p01 + dt * p11) + q * dt ** 4 / 4.0
+        p01 = p01 + dt * p11 + q * dt ** 3 / 2.0
+        p11 = p11 + q * dt ** 2
+        # Correct with the new measurement
+        s = p00 + self.measurement_noise
+        k0, k1 = p00 / s, p01 / s
+        innovation = values[live] - x
+        self.value[live] = x + k0 * innovation
+        self.velocity[live] = v + k1 * innovation
+        self.p00[live] = (1.0 - k0) * p00
+        self.p01[live] = (1.0 - k0) * p01
+        self.p11[live] = p11 - k1 * p01